@@ -1,6 +1,40 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+
+        from api.authentication import (forbid_snapshot_save, invalidate_token,
+                                        invalidate_user_tokens)
+        from foodgram.db import check_connections
+        from foodgram.invalidation import connect_signals
+        from foodgram.storage import connect_signals as connect_storage
+        from users.models import User
+
+        request_started.connect(
+            check_connections,
+            dispatch_uid='check_db_connections'
+        )
+        pre_save.connect(
+            forbid_snapshot_save,
+            sender=User,
+            dispatch_uid='forbid_auth_snapshot_save'
+        )
+        post_save.connect(
+            invalidate_user_tokens,
+            sender=User,
+            dispatch_uid='invalidate_user_tokens'
+        )
+        post_delete.connect(
+            invalidate_token,
+            sender=Token,
+            dispatch_uid='invalidate_token'
+        )
+        connect_signals()
+        connect_storage()
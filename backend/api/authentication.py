@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram.constants import (TOKEN_CACHE_TIMEOUT, TOKEN_LOCAL_CACHE_SIZE,
+                                TOKEN_LOCAL_CACHE_TIMEOUT)
+from users.models import User
+
+# Поля снимка пользователя в кеше, включая флаги для проверок прав.
+# Хеш пароля и профиль в кеш не попадают, остальные поля снимка
+# загружаются из базы при обращении. Порядок совпадает с порядком полей
+# модели: в нем значения ожидает Model.from_db.
+USER_FIELDS = ('id', 'is_superuser', 'is_staff', 'is_active', 'username')
+
+
+class LocalCache:
+    """LRU-кеш в памяти процесса с ограниченным временем жизни записей."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            expires_at, value = self._data.get(key, (0, None))
+            if expires_at < monotonic():
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+local_cache = LocalCache(TOKEN_LOCAL_CACHE_SIZE, TOKEN_LOCAL_CACHE_TIMEOUT)
+
+
+def get_token_cache_key(key):
+    """Возвращает ключ кеша для токена, не раскрывая сам токен.
+
+    Префикс меняется вместе с составом USER_FIELDS, чтобы не читать
+    снимки прежнего формата.
+    """
+    return 'auth_token_user:v2:' + sha256(key.encode()).hexdigest()
+
+
+def invalidate_tokens(keys):
+    """Удаляет токены из локального и общего кеша."""
+    cache_keys = [get_token_cache_key(key) for key in keys]
+    cache.delete_many(cache_keys)
+    for cache_key in cache_keys:
+        local_cache.delete(cache_key)
+
+
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает кеш токенов пользователя при изменении полей снимка.
+
+    Сохранения только других полей, например last_login при каждом
+    входе, кеш не сбрасывают.
+    """
+    if update_fields is not None and not update_fields & set(USER_FIELDS):
+        return
+    invalidate_tokens(
+        Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    )
+
+
+def forbid_snapshot_save(sender, instance, **kwargs):
+    """Запрещает сохранять снимок пользователя из кеша аутентификации.
+
+    Поля снимка могут устареть за время жизни кеша, и сохранение
+    вернуло бы в базу, например, отмененную деактивацию.
+    """
+    if getattr(instance, '_auth_snapshot', False):
+        raise RuntimeError(
+            'Снимок пользователя из кеша аутентификации нельзя сохранять, '
+            'перечитайте пользователя из базы.'
+        )
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """Сбрасывает кеш удаленного токена, в том числе при выходе."""
+    invalidate_tokens([instance.key])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к базе на каждый вызов.
+
+    Снимок пользователя (USER_FIELDS) хранится в общем кеше на
+    TOKEN_CACHE_TIMEOUT секунд и в LRU процесса на
+    TOKEN_LOCAL_CACHE_TIMEOUT секунд. Изменение полей снимка или удаление
+    токена сбрасывает оба кеша этого процесса и общий кеш; локальные
+    кеши других процессов устаревают не дольше TOKEN_LOCAL_CACHE_TIMEOUT.
+    Снимок только для чтения: перед изменением пользователь
+    перечитывается из базы.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        values = local_cache.get(cache_key)
+        if values is None:
+            values = cache.get(cache_key)
+            if values is None:
+                values = Token.objects.filter(key=key).values_list(
+                    *(f'user__{name}' for name in USER_FIELDS)
+                ).first()
+                if values is None:
+                    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+                cache.set(cache_key, values, TOKEN_CACHE_TIMEOUT)
+            local_cache.set(cache_key, values)
+
+        user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, values)
+        user._auth_snapshot = True
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return user, Token(key=key, user=user)
@@ -1,6 +1,7 @@
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
 
 
 class IngredientFilter(FilterSet):
@@ -32,6 +33,10 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='filter_search',
+        label='Поиск по названию, описанию и ингредиентам'
+    )
 
     class Meta:
         model = Recipe
@@ -39,7 +44,8 @@ class RecipeFilter(FilterSet):
             'author',
             'tags',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search'
         )
 
     def filter_is_favorited(self, queryset, name, value):
@@ -53,3 +59,9 @@ class RecipeFilter(FilterSet):
         if not value or not self.request.user.is_authenticated:
             return queryset
         return queryset.filter(shoppingcarts__user=self.request.user)
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск рецептов с сортировкой по релевантности."""
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
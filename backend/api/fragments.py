@@ -0,0 +1,101 @@
+from api.prefetch import plan_queryset
+from api.serializers import RecipeFragmentSerializer
+from api.utils import get_subscribed_author_ids
+from foodgram.caching import get_many_or_compute
+from foodgram.constants import RECIPE_FRAGMENT_CACHE_TIMEOUT
+from foodgram.invalidation import get_versions
+from recipes.models import Recipe
+
+# Поля, без которых нельзя найти фрагмент и дополнить его данными
+# пользователя запроса.
+FRAGMENT_KEY_FIELDS = ('id', 'author', 'updated_at')
+
+
+def get_fragment_key(request, recipe, versions):
+    """Возвращает ключ фрагмента версии рецепта.
+
+    Версия определяется временем изменения рецепта и версиями тегов,
+    ингредиентов и автора в шине инвалидации. Хост входит в ключ из-за
+    абсолютных ссылок на изображения.
+    """
+    return (
+        f'recipe_fragment:{request.get_host()}:{recipe.id}:'
+        f'{recipe.updated_at.isoformat()}:{versions[recipe.author_id]}'
+    )
+
+
+def get_fragment_versions(recipes):
+    """Возвращает общую часть версии фрагментов по id автора."""
+    author_ids = list({recipe.author_id for recipe in recipes})
+    tag_version, ingredient_version, *author_versions = get_versions(
+        ('tag',),
+        ('ingredient',),
+        *(('user', author_id) for author_id in author_ids)
+    )
+    return {
+        author_id: f'{tag_version}:{ingredient_version}:{author_version}'
+        for author_id, author_version in zip(author_ids, author_versions)
+    }
+
+
+def get_recipe_fragments(recipes, request):
+    """Возвращает фрагменты рецептов по id.
+
+    Фрагменты читаются из кеша одним запросом, недостающие сериализуются
+    одной выборкой с защитой от одновременного пересчета.
+    """
+    versions = get_fragment_versions(recipes)
+    keys = {
+        get_fragment_key(request, recipe, versions): recipe.id
+        for recipe in recipes
+    }
+
+    def serialize(missing_keys):
+        data = RecipeFragmentSerializer(
+            plan_queryset(
+                Recipe.objects.filter(
+                    id__in=[keys[key] for key in missing_keys]
+                ),
+                RecipeFragmentSerializer
+            ),
+            many=True,
+            context={'request': request}
+        ).data
+        fresh = {fragment['id']: fragment for fragment in data}
+        return {
+            key: fresh[keys[key]]
+            for key in missing_keys if keys[key] in fresh
+        }
+
+    return {
+        keys[key]: fragment
+        for key, fragment in get_many_or_compute(
+            list(keys),
+            serialize,
+            RECIPE_FRAGMENT_CACHE_TIMEOUT
+        ).items()
+    }
+
+
+def render_recipes(recipes, request):
+    """Собирает ответ из фрагментов и данных пользователя запроса.
+
+    Рецепты должны содержать поля FRAGMENT_KEY_FIELDS и аннотации
+    is_favorited и is_in_shopping_cart.
+    """
+    fragments = get_recipe_fragments(recipes, request)
+    subscribed = (
+        get_subscribed_author_ids(request.user) if recipes else set()
+    )
+    return [
+        {
+            **fragments[recipe.id],
+            'author': {
+                **fragments[recipe.id]['author'],
+                'is_subscribed': recipe.author_id in subscribed,
+            },
+            'is_favorited': recipe.is_favorited,
+            'is_in_shopping_cart': recipe.is_in_shopping_cart,
+        }
+        for recipe in recipes if recipe.id in fragments
+    ]
@@ -0,0 +1,165 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from secrets import token_hex
+from statistics import median, quantiles
+from threading import Event, Thread
+from time import monotonic, sleep
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.constants import (BENCHMARK_LOGIN_CONCURRENCY,
+                                BENCHMARK_LOGIN_REQUESTS)
+from users.models import User
+
+LOGIN_PATH = '/api/auth/token/login/'
+PROBE_TIMEOUT = 30
+BASELINE_DURATION = 2
+
+
+def get_percentiles(latencies):
+    """Возвращает медиану и 95-й перцентиль задержек в мс."""
+    if len(latencies) < 2:
+        latency = latencies[0] * 1000 if latencies else 0
+        return latency, latency
+    return (
+        median(latencies) * 1000,
+        quantiles(latencies, n=20)[-1] * 1000
+    )
+
+
+class Probe(Thread):
+    """Поток, последовательно запрашивающий url до вызова stop."""
+
+    def __init__(self, url):
+        super().__init__(daemon=True)
+        self.url = url
+        self.latencies = []
+        self.errors = 0
+        self._stop_event = Event()
+
+    def run(self):
+        with requests.Session() as session:
+            while not self._stop_event.is_set():
+                started = monotonic()
+                try:
+                    session.get(
+                        self.url,
+                        timeout=PROBE_TIMEOUT
+                    ).raise_for_status()
+                except requests.RequestException:
+                    self.errors += 1
+                else:
+                    self.latencies.append(monotonic() - started)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Command(BaseCommand):
+    """Команда нагрузочной проверки входа по паролю."""
+
+    help = (
+        'Отправляет параллельные запросы входа на запущенный сервер и '
+        'измеряет пропускную способность входа и задержку остального API '
+        'во время всплеска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Адрес запущенного сервера'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=BENCHMARK_LOGIN_REQUESTS,
+            help='Количество запросов входа'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=BENCHMARK_LOGIN_CONCURRENCY,
+            help='Количество одновременных запросов входа'
+        )
+        parser.add_argument(
+            '--probe-path',
+            default='/api/tags/',
+            help='Адрес API, задержка которого измеряется во время входов'
+        )
+        parser.add_argument(
+            '--wrong-password',
+            action='store_true',
+            help='Входить с неверным паролем, как при подборе'
+        )
+
+    def login(self, email, password):
+        started = monotonic()
+        try:
+            response = requests.post(
+                self.login_url,
+                json={'email': email, 'password': password},
+                timeout=PROBE_TIMEOUT
+            )
+        except requests.RequestException:
+            return None, monotonic() - started
+        return response.status_code, monotonic() - started
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError(
+                'Количество запросов и параллельность должны быть больше нуля.'
+            )
+        base_url = options['url'].rstrip('/')
+        self.login_url = base_url + LOGIN_PATH
+        probe_url = base_url + options['probe_path']
+        password = token_hex(16)
+        user = User.objects.create_user(
+            email=f'benchmark-{token_hex(4)}@example.com',
+            username=f'benchmark-{token_hex(4)}',
+            password=password
+        )
+        if options['wrong_password']:
+            password = token_hex(16)
+        try:
+            baseline = Probe(probe_url)
+            baseline.start()
+            sleep(BASELINE_DURATION)
+            baseline.stop()
+
+            under_load = Probe(probe_url)
+            under_load.start()
+            started = monotonic()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                results = list(executor.map(
+                    lambda _: self.login(user.email, password),
+                    range(options['requests'])
+                ))
+            elapsed = monotonic() - started
+            under_load.stop()
+        finally:
+            user.delete()
+
+        statuses = Counter(status or 'ошибка' for status, _ in results)
+        self.stdout.write('Ответы входа: ' + ', '.join(
+            f'{status}: {count}' for status, count in statuses.most_common()
+        ))
+        login_p50, login_p95 = get_percentiles(
+            [latency for _, latency in results]
+        )
+        self.stdout.write(
+            f'Вход: {len(results) / elapsed:.1f} запр/с, '
+            f'p50 {login_p50:.0f} мс, p95 {login_p95:.0f} мс'
+        )
+        for title, probe in (
+            ('без нагрузки', baseline),
+            ('во время входов', under_load),
+        ):
+            probe_p50, probe_p95 = get_percentiles(probe.latencies)
+            self.stdout.write(
+                f'{options["probe_path"]} {title}: '
+                f'p50 {probe_p50:.0f} мс, p95 {probe_p95:.0f} мс, '
+                f'запросов {len(probe.latencies)}, ошибок {probe.errors}'
+            )
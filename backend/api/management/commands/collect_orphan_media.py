@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.storage import collect_orphans
+
+
+class Command(BaseCommand):
+    """Команда удаления медиафайлов без ссылок из базы."""
+
+    help = (
+        'Удаляет из каталогов загрузки файлы, на которые не ссылается '
+        'ни одна запись.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько файлов будет удалено'
+        )
+
+    def handle(self, *args, **options):
+        count, size = collect_orphans(dry_run=options['dry_run'])
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов без ссылок: {count}, '
+            f'{size / 1024 / 1024:.1f} МБ'
+        ))
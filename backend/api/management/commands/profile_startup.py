@@ -0,0 +1,108 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.constants import STARTUP_PROFILE_RUNS, STARTUP_TIME_BUDGET
+
+STARTUP_SCRIPT = (
+    'import time\n'
+    'started = time.perf_counter()\n'
+    'import {module}\n'
+    'print(time.perf_counter() - started)\n'
+)
+IMPORT_TIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def run_startup(module, import_time=False):
+    """Загружает приложение в новом интерпретаторе.
+
+    Возвращает время загрузки в секундах и вывод -X importtime.
+    """
+    command = [sys.executable]
+    if import_time:
+        command += ['-X', 'importtime']
+    command += ['-c', STARTUP_SCRIPT.format(module=module)]
+    result = subprocess.run(
+        command,
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+        capture_output=True,
+        text=True
+    )
+    if result.returncode:
+        raise CommandError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def get_package_times(import_log):
+    """Суммирует собственное время импорта модулей по пакетам, мкс."""
+    times = defaultdict(int)
+    for self_time, _, _, name in IMPORT_TIME_RE.findall(import_log):
+        times[name.split('.')[0]] += int(self_time)
+    return times
+
+
+class Command(BaseCommand):
+    """Команда измерения времени запуска воркера."""
+
+    help = (
+        'Измеряет время загрузки приложения в новом процессе, показывает '
+        'самые дорогие при импорте пакеты и проверяет бюджет запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module',
+            default='foodgram.wsgi',
+            help='Модуль приложения, который загружает воркер'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=STARTUP_PROFILE_RUNS,
+            help='Количество замеров, учитывается лучший'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Количество пакетов в отчете'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=STARTUP_TIME_BUDGET,
+            help='Допустимое время загрузки, с; 0 отключает проверку'
+        )
+
+    def handle(self, *args, **options):
+        module = options['module']
+        _, import_log = run_startup(module, import_time=True)
+        package_times = get_package_times(import_log)
+        total = sum(package_times.values())
+        self.stdout.write('Пакет                          Импорт, мс     Доля')
+        for package, package_time in sorted(
+            package_times.items(),
+            key=lambda item: item[1],
+            reverse=True
+        )[:options['top']]:
+            self.stdout.write(
+                f'{package:<30} {package_time / 1000:>10.1f} '
+                f'{package_time / total:>8.1%}'
+            )
+
+        elapsed = min(
+            run_startup(module)[0] for _ in range(max(options['runs'], 1))
+        )
+        message = (
+            f'Загрузка {module}: {elapsed:.3f} с '
+            f'(бюджет {options["budget"]:.3f} с)'
+        )
+        if options['budget'] and elapsed > options['budget']:
+            raise CommandError(f'Бюджет запуска превышен. {message}')
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,89 @@
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.warmup import get_warm_hosts, get_warm_paths, warm_caches
+from foodgram.caching import is_cache_local
+from foodgram.constants import (WARM_CACHES_BUDGET, WARM_CACHES_WORKERS,
+                                WARM_RECIPE_PAGES, WARM_TAG_COMBINATIONS)
+
+
+class Command(BaseCommand):
+    """Команда прогрева кешей после развертывания."""
+
+    help = (
+        'Заполняет кеши справочников и первых страниц рецептов '
+        'анонимными запросами к API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            action='append',
+            dest='hosts',
+            help='Значение заголовка Host, можно указать несколько раз'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=WARM_RECIPE_PAGES,
+            help='Количество первых страниц списка рецептов'
+        )
+        parser.add_argument(
+            '--tag-combinations',
+            type=int,
+            default=WARM_TAG_COMBINATIONS,
+            help='Количество сочетаний тегов для первой страницы'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=WARM_CACHES_BUDGET,
+            help='Ограничение времени прогрева, с'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=WARM_CACHES_WORKERS,
+            help='Количество параллельных запросов'
+        )
+
+    def handle(self, *args, **options):
+        hosts = options['hosts'] or get_warm_hosts()
+        if not hosts:
+            raise CommandError(
+                'Укажите хост через --host или WARM_CACHES_HOSTS.'
+            )
+        if options['workers'] < 1:
+            raise CommandError('Количество запросов должно быть больше нуля.')
+        if is_cache_local():
+            raise CommandError(
+                'Кеш хранится в памяти процесса, и ответы, прогретые '
+                'командой, не увидят воркеры gunicorn. Задайте '
+                'CACHE_LOCATION; при кеше в памяти воркеры прогреваются '
+                'сами при запуске.'
+            )
+        started = monotonic()
+        results = warm_caches(
+            hosts,
+            get_warm_paths(options['pages'], options['tag_combinations']),
+            budget=options['budget'],
+            workers=options['workers']
+        )
+        for result in results:
+            if result.skipped:
+                continue
+            target = f'{result.host}{result.path}'
+            elapsed = f'{result.elapsed * 1000:.0f} мс'
+            if result.error:
+                self.stderr.write(f'{target}: {result.error} ({elapsed})')
+            else:
+                self.stdout.write(f'{result.status} {target} ({elapsed})')
+
+        skipped = sum(result.skipped for result in results)
+        failed = sum(result.error is not None for result in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето адресов: {len(results) - skipped - failed}, '
+            f'ошибок: {failed}, пропущено по бюджету: {skipped}, '
+            f'время: {monotonic() - started:.1f} с'
+        ))
@@ -1,7 +1,112 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.caching import get_or_compute
+from foodgram.constants import MAX_FEED_PAGE_SIZE, RECIPE_PAGE_CACHE_TIMEOUT
 
 
 class LimitPagination(PageNumberPagination):
     """Кастомная пагинация с поддержкой параметра 'limit'."""
 
     page_size_query_param = 'limit'
+
+    def get_page(self, paginator, request):
+        page_number = request.query_params.get(self.page_query_param, 1)
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            return paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number,
+                message=str(exc)
+            ))
+
+    def paginate_ids(self, queryset, request, cache_key):
+        """Возвращает id объектов страницы.
+
+        Общее число объектов и id страницы кешируются по cache_key с
+        защитой от одновременного пересчета, поэтому при попадании в кеш
+        запрос с фильтрами и сортировкой не выполняется.
+        """
+        page_size = self.get_page_size(request)
+
+        def compute():
+            paginator = self.django_paginator_class(
+                queryset.values_list('id', flat=True),
+                page_size
+            )
+            try:
+                ids = list(self.get_page(paginator, request))
+            except NotFound:
+                ids = None
+            return paginator.count, ids
+
+        count, ids = get_or_compute(
+            cache_key,
+            compute,
+            RECIPE_PAGE_CACHE_TIMEOUT
+        )
+        paginator = self.django_paginator_class((), page_size)
+        paginator.count = count
+        self.page = self.get_page(paginator, request)
+        self.page.object_list = ids
+        self.request = request
+        return ids
+
+
+class FeedPagination(BasePagination):
+    """Keyset-пагинация ленты по убыванию id рецептов.
+
+    Параметр 'before' содержит id последнего рецепта предыдущей страницы,
+    поэтому глубина страницы не влияет на стоимость запроса.
+    """
+
+    cursor_query_param = 'before'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = MAX_FEED_PAGE_SIZE
+
+    def _get_positive_int(self, request, param, default=None):
+        try:
+            value = int(request.query_params[param])
+        except (KeyError, ValueError):
+            return default
+        return value if value > 0 else default
+
+    def paginate_ids(self, get_ids, request):
+        """Возвращает id страницы, запрашивая у get_ids на один больше."""
+        self.request = request
+        before = self._get_positive_int(request, self.cursor_query_param)
+        limit = min(
+            self._get_positive_int(
+                request,
+                self.page_size_query_param,
+                self.page_size
+            ),
+            self.max_page_size
+        )
+        ids = get_ids(before, limit + 1)
+        self.has_next = len(ids) > limit
+        ids = ids[:limit]
+        self.last_id = ids[-1] if ids else None
+        return ids
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.last_id
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
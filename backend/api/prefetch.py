@@ -0,0 +1,168 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+from rest_framework.fields import SerializerMethodField
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+class QueryPlan:
+    """Поля и связи модели, которые читает сериализатор."""
+
+    def __init__(self, model):
+        self.model = model
+        self.only = {model._meta.pk.name}
+        self.select = set()
+        self.prefetch = {}
+
+    def get_prefetch(self, path, model):
+        """Возвращает план для связи, загружаемой отдельным запросом."""
+        if path not in self.prefetch:
+            self.prefetch[path] = QueryPlan(model)
+        return self.prefetch[path]
+
+    def apply(self, queryset, prefetch_querysets=None):
+        """Добавляет в запрос select_related, prefetch_related и only.
+
+        prefetch_querysets задает исходные запросы связей по их пути.
+        """
+        prefetch_querysets = prefetch_querysets or {}
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        return queryset.prefetch_related(*(
+            Prefetch(
+                path,
+                queryset=plan.apply(prefetch_querysets.get(
+                    path,
+                    plan.model._default_manager.all()
+                ))
+            )
+            for path, plan in sorted(self.prefetch.items())
+        )).only(*sorted(self.only))
+
+
+def get_hints(serializer):
+    """Собирает подсказки для SerializerMethodField из Meta по MRO.
+
+    Meta.prefetch_hints сопоставляет имени поля None, если методу не
+    нужны данные модели, путь source или пару (source, сериализатор).
+    Сериализатор можно указать строкой импорта.
+    """
+    hints = {}
+    for klass in reversed(type(serializer).__mro__):
+        hints.update(
+            getattr(getattr(klass, 'Meta', None), 'prefetch_hints', {})
+        )
+    return hints
+
+
+def add_all_fields(plan, model, prefix):
+    plan.only.update(
+        prefix + field.name for field in model._meta.concrete_fields
+    )
+
+
+def plan_serializer(plan, serializer, model, prefix):
+    """Добавляет в план поля сериализатора."""
+    hints = get_hints(serializer)
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, SerializerMethodField):
+            if name not in hints:
+                # Метод может читать любое поле модели.
+                add_all_fields(plan, model, prefix)
+                continue
+            hint = hints[name]
+            if hint is None:
+                continue
+            source, serializer_class = (
+                (hint, None) if isinstance(hint, str) else hint
+            )
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            plan_source(
+                plan,
+                model,
+                prefix,
+                source.split('.'),
+                serializer_class and serializer_class()
+            )
+        elif field.source == '*':
+            if isinstance(field, BaseSerializer):
+                plan_serializer(plan, field, model, prefix)
+        else:
+            plan_source(plan, model, prefix, field.source_attrs, field)
+
+
+def plan_target(plan, model, prefix, field):
+    """Добавляет в план объект связи, который выводит поле."""
+    if isinstance(field, ListSerializer):
+        field = field.child
+    if isinstance(field, BaseSerializer):
+        plan_serializer(plan, field, model, prefix)
+    elif isinstance(field, ManyRelatedField):
+        plan_target(plan, model, prefix, field.child_relation)
+    elif field is not None and not isinstance(field, PrimaryKeyRelatedField):
+        add_all_fields(plan, model, prefix)
+
+
+def plan_source(plan, model, prefix, attrs, field):
+    """Разбирает путь source поля по связям модели."""
+    for index, attr in enumerate(attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # Аннотация запроса или свойство модели.
+            return
+        path = prefix + attr
+        if not model_field.is_relation:
+            plan.only.add(path)
+            return
+        if model_field.many_to_many or model_field.one_to_many:
+            related_plan = plan.get_prefetch(path, model_field.related_model)
+            if model_field.one_to_many:
+                related_plan.only.add(model_field.field.name)
+            plan_source(
+                related_plan,
+                model_field.related_model,
+                '',
+                attrs[index + 1:],
+                field
+            )
+            return
+        if model_field.concrete:
+            plan.only.add(path)
+            if index == len(attrs) - 1 and isinstance(
+                field,
+                PrimaryKeyRelatedField
+            ):
+                return
+        plan.select.add(path)
+        model = model_field.related_model
+        prefix = path + '__'
+    plan_target(plan, model, prefix, field)
+
+
+@lru_cache(maxsize=None)
+def get_plan(serializer_class, model):
+    """Строит план запроса для сериализатора."""
+    plan = QueryPlan(model)
+    plan_serializer(plan, serializer_class(), model, '')
+    return plan
+
+
+def plan_queryset(queryset, serializer_class, prefetch_querysets=None):
+    """Загружает в запросе только данные, которые выводит сериализатор.
+
+    Вложенные сериализаторы и связи в source превращаются в
+    select_related для одиночных связей и в Prefetch с собственным
+    планом для множественных, а набор полей ограничивается через only.
+    prefetch_querysets позволяет отфильтровать загружаемые связи.
+    """
+    return get_plan(serializer_class, queryset.model).apply(
+        queryset,
+        prefetch_querysets
+    )
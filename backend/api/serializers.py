@@ -1,14 +1,21 @@
-from djoser.serializers import UserCreateSerializer, UserSerializer
+from django.contrib.auth import authenticate
+from djoser.conf import settings as djoser_settings
+from djoser.serializers import (TokenCreateSerializer, UserCreateSerializer,
+                                UserSerializer)
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
-
-from api.utils import Base64ImageField
-from foodgram.constants import (MAX_VALUE_COOKING_TIME,
-                                MIN_VALUE_COOKING_TIME,
-                                MIN_VALUE_INGREDIENT_AMOUNT)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from users.models import Subscription, User
+
+from api.utils import (Base64ImageField, get_recipes_limit,
+                       get_subscribed_author_ids)
+from foodgram.constants import (DIRECT_UPLOAD_CONTENT_TYPES,
+                                MAX_MATCH_INGREDIENTS, MAX_VALUE_COOKING_TIME,
+                                MAX_VALUE_SERVINGS, MIN_VALUE_COOKING_TIME,
+                                MIN_VALUE_INGREDIENT_AMOUNT,
+                                MIN_VALUE_SERVINGS)
+from recipes.matching import ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import format_headline, get_headline
+from recipes.tasks import schedule_search_index_update
+from users.models import User
 from users.validators import validation_password_length, validation_username
 
 
@@ -36,6 +43,26 @@ class UserCreateSerializer(UserCreateSerializer):
         return validation_username(value)
 
 
+class TokenCreateSerializer(TokenCreateSerializer):
+    """Сериализатор входа, проверяющий пароль один раз.
+
+    Сериализатор djoser при неверном пароле проверяет его повторно, а
+    каждая проверка стоит полного вычисления хеша. authenticate
+    отклоняет и неактивных пользователей.
+    """
+
+    def validate(self, attrs):
+        login_field = djoser_settings.LOGIN_FIELD
+        self.user = authenticate(
+            request=self.context.get('request'),
+            password=attrs.get('password'),
+            **{login_field: attrs.get(login_field)}
+        )
+        if self.user is None:
+            self.fail('invalid_credentials')
+        return attrs
+
+
 class UserGetSerializer(UserSerializer):
     """Сериализатор для получения данных о пользователе."""
 
@@ -52,15 +79,22 @@ class UserGetSerializer(UserSerializer):
             'avatar',
             'is_subscribed'
         )
+        prefetch_hints = {'is_subscribed': None}
 
     def get_is_subscribed(self, obj):
-        """Проверяет подписку текущего пользователя."""
+        """Проверяет подписку текущего пользователя.
+
+        Подписки загружаются один раз на весь ответ и хранятся в общем
+        контексте вложенных сериализаторов.
+        """
         request = self.context.get('request')
-        return (
-            request
-            and not request.user.is_anonymous
-            and request.user.follower.filter(author=obj).exists()
-        )
+        if not request or request.user.is_anonymous:
+            return False
+        if 'subscribed_author_ids' not in self.context:
+            self.context['subscribed_author_ids'] = (
+                get_subscribed_author_ids(request.user)
+            )
+        return obj.id in self.context['subscribed_author_ids']
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -73,39 +107,6 @@ class AvatarSerializer(serializers.ModelSerializer):
         fields = ('avatar',)
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-    """Сериализатор добавления/удаления подписки."""
-
-    class Meta:
-        model = Subscription
-        fields = (
-            'user',
-            'author'
-        )
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=('user', 'author'),
-                message='Вы уже подписаны на этого автора.'
-            )
-        ]
-
-    def validate_author(self, value):
-        """Проверяет валидность подписки на себя."""
-        if self.context['request'].user == value:
-            raise serializers.ValidationError(
-                'Нельзя оформить подписку на себя.'
-            )
-        return value
-
-    def to_representation(self, instance):
-        """Возвращает детальную информацию о подписке."""
-        return SubscriptionDetailSerializer(
-            instance.author,
-            context=self.context
-        ).data
-
-
 class SubscriptionDetailSerializer(UserGetSerializer):
     """Сериализатор списка подписок."""
 
@@ -120,21 +121,17 @@ class SubscriptionDetailSerializer(UserGetSerializer):
             'recipes_count'
         )
         read_only_fields = fields
+        # Число рецептов аннотирует представление списка подписок.
+        prefetch_hints = {
+            'recipes': ('recipes', 'api.serializers.RecipeShortSerializer'),
+            'recipes_count': None,
+        }
 
     def get_recipes(self, obj):
         """Возвращает список рецептов автора."""
         request = self.context.get('request')
-        recipes_limit = None
-        if request:
-            recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            try:
-                recipes_limit = int(recipes_limit)
-                if recipes_limit <= 0:
-                    raise ValueError('Должно быть положительное число!')
-            except (ValueError, TypeError):
-                recipes_limit = None
         recipes = obj.recipes.all()
+        recipes_limit = get_recipes_limit(request)
         if recipes_limit is not None:
             recipes = recipes[:recipes_limit]
         return RecipeShortSerializer(
@@ -145,6 +142,8 @@ class SubscriptionDetailSerializer(UserGetSerializer):
 
     def get_recipes_count(self, obj):
         """Возвращает общее количество рецептов автора."""
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -259,6 +258,85 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         )
 
 
+class AuthorFragmentSerializer(UserGetSerializer):
+    """Сериализатор автора без полей, зависящих от пользователя запроса."""
+
+    class Meta(UserGetSerializer.Meta):
+        fields = tuple(
+            field for field in UserGetSerializer.Meta.fields
+            if field != 'is_subscribed'
+        )
+
+
+class RecipeFragmentSerializer(RecipeGetSerializer):
+    """Сериализатор кешируемой части рецепта.
+
+    Не содержит полей, зависящих от пользователя запроса: они
+    добавляются к фрагменту при формировании ответа.
+    """
+
+    author = AuthorFragmentSerializer(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = tuple(
+            field for field in RecipeGetSerializer.Meta.fields
+            if field not in ('is_favorited', 'is_in_shopping_cart')
+        )
+        read_only_fields = fields
+
+
+class RecipeSearchSerializer(RecipeGetSerializer):
+    """Сериализатор результатов поиска рецептов."""
+
+    headline = serializers.SerializerMethodField()
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + ('headline',)
+        read_only_fields = fields
+        prefetch_hints = {'headline': 'text'}
+
+    def get_headline(self, obj):
+        """Возвращает фрагмент описания с выделенными словами запроса."""
+        if hasattr(obj, 'search_headline'):
+            return format_headline(obj.search_headline)
+        return get_headline(
+            obj.text,
+            self.context['request'].query_params.get('search', '')
+        )
+
+
+class RecipeMatchParamsSerializer(serializers.Serializer):
+    """Сериализатор параметров подбора рецептов по ингредиентам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_MATCH_INGREDIENTS
+    )
+    tags = serializers.ListField(
+        child=serializers.SlugField(),
+        required=False
+    )
+    max_cooking_time = serializers.IntegerField(
+        min_value=MIN_VALUE_COOKING_TIME,
+        required=False
+    )
+
+
+class RecipeMatchSerializer(RecipeGetSerializer):
+    """Сериализатор рецептов, подобранных по ингредиентам."""
+
+    coverage = serializers.FloatField(read_only=True)
+    matched_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + (
+            'coverage',
+            'matched_ingredients'
+        )
+        read_only_fields = fields
+
+
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и обновления рецептов."""
 
@@ -352,6 +430,8 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=user, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        schedule_search_index_update([recipe.id])
+        ingredient_index.update([recipe.id])
         return recipe
 
     def update(self, instance, validated_data):
@@ -364,6 +444,8 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         RecipeIngredient.objects.filter(recipe=instance).delete()
         self.create_ingredients(ingredients_data, instance)
         instance.save()
+        schedule_search_index_update([instance.id])
+        ingredient_index.update([instance.id])
         return instance
 
     def to_representation(self, instance):
@@ -384,49 +466,19 @@ class RecipeShortSerializer(serializers.ModelSerializer):
         )
 
 
-class BaseAuthorRecipeSerializer(serializers.ModelSerializer):
-    """Абстрактный сериализатор для избранного и списка покупок."""
-
-    _added_to: str = ''
-
-    class Meta:
-        abstract = True
-        fields = '__all__'
-
-    def validate(self, attrs):
-        """Проверяет, не добавлен ли рецепт уже в указанное место."""
-        if self.Meta.model.objects.filter(**attrs).exists():
-            raise serializers.ValidationError(
-                f'Рецепт уже добавлен в {self._added_to}.'
-            )
-        return attrs
-
-    def to_representation(self, instance):
-        """Преобразует рецепт в удобный для вывода формат."""
-        if isinstance(instance, Recipe):
-            return RecipeShortSerializer(
-                instance,
-                context=self.context
-            ).data
-        return RecipeShortSerializer(
-            instance.recipe,
-            context=self.context
-        ).data
-
-
-class FavoriteRecipeSerializer(BaseAuthorRecipeSerializer):
-    """Сериализатор избранных рецептов."""
-
-    _added_to = 'избранное'
-
-    class Meta(BaseAuthorRecipeSerializer.Meta):
-        model = Favorite
+class ShoppingCartServingsSerializer(serializers.Serializer):
+    """Сериализатор количества порций рецепта в списке покупок."""
 
+    servings = serializers.IntegerField(
+        min_value=MIN_VALUE_SERVINGS,
+        max_value=MAX_VALUE_SERVINGS,
+        default=MIN_VALUE_SERVINGS
+    )
 
-class ShoppingCartSerializer(BaseAuthorRecipeSerializer):
-    """Сериализатор списка покупок."""
 
-    _added_to = 'список покупок'
+class UploadSerializer(serializers.Serializer):
+    """Сериализатор запроса на прямую загрузку изображения."""
 
-    class Meta(BaseAuthorRecipeSerializer.Meta):
-        model = ShoppingCart
+    content_type = serializers.ChoiceField(
+        choices=tuple(DIRECT_UPLOAD_CONTENT_TYPES)
+    )
@@ -0,0 +1,25 @@
+from django.conf import settings
+
+from api.utils import get_shopping_cart_text
+from foodgram.caching import is_cache_local
+from foodgram.constants import JOB_LOW_PRIORITY
+from jobs.queue import task
+from users.models import User
+
+
+@task(priority=JOB_LOW_PRIORITY)
+def warm_shopping_cart(user_id):
+    """Заранее собирает список покупок пользователя в кеш."""
+    user = User.objects.filter(pk=user_id).only('username').first()
+    if user is not None:
+        get_shopping_cart_text(user)
+
+
+def schedule_shopping_cart_warmup(user_id):
+    # Воркер run_workers заполнил бы только собственный кеш в памяти.
+    if is_cache_local() and not settings.JOBS_EAGER:
+        return
+    warm_shopping_cart.schedule(
+        args=(user_id,),
+        key=f'warm_shopping_cart:{user_id}'
+    )
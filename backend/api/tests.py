@@ -0,0 +1,238 @@
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import CachedTokenAuthentication
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+RECIPES_PER_AUTHOR = 3
+
+
+class QueryCountTests(APITestCase):
+    """Число запросов к базе основных ответов API.
+
+    В ответах по несколько рецептов и авторов, поэтому запросы на каждый
+    объект увеличили бы счетчики. Кеш очищается перед каждым тестом:
+    сначала ответ строится без прогретых фрагментов, затем из кеша.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            email='reader@example.com',
+            username='reader',
+            first_name='Читатель',
+            last_name='Читатель',
+            password='reader-password'
+        )
+        tags = [
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'соль')
+        ]
+        cls.authors = []
+        for number in range(2):
+            author = User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}',
+                first_name='Автор',
+                last_name='Автор',
+                password='author-password'
+            )
+            cls.authors.append(author)
+            Subscription.objects.create(user=cls.reader, author=author)
+            for index in range(RECIPES_PER_AUTHOR):
+                recipe = Recipe.objects.create(
+                    author=author,
+                    name=f'Рецепт {number}-{index}',
+                    text='Описание',
+                    cooking_time=10,
+                    image='recipes/images/test.png'
+                )
+                recipe.tags.set(tags)
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient=ingredient,
+                        amount=10
+                    )
+                    for ingredient in ingredients
+                )
+                Favorite.objects.create(user=cls.reader, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+        cls.recipe = recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.reader)
+
+    def assertResponseQueries(self, cold, warm, path):
+        """Проверяет запросы к path без кеша и с прогретым кешем."""
+        for queries in (cold, warm):
+            with self.assertNumQueries(queries):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recipe_list(self):
+        response = self.assertResponseQueries(7, 1, '/api/recipes/')
+        self.assertEqual(response.data['count'], 2 * RECIPES_PER_AUTHOR)
+
+    def test_recipe_list_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertResponseQueries(6, 1, '/api/recipes/')
+
+    def test_recipe_list_viewer_filter(self):
+        response = self.assertResponseQueries(
+            6,
+            2,
+            '/api/recipes/?is_favorited=1'
+        )
+        self.assertEqual(response.data['count'], 2 * RECIPES_PER_AUTHOR)
+
+    def test_recipe_retrieve(self):
+        self.assertResponseQueries(5, 1, f'/api/recipes/{self.recipe.id}/')
+
+    def test_subscriptions(self):
+        response = self.assertResponseQueries(
+            4,
+            3,
+            '/api/users/subscriptions/'
+        )
+        self.assertEqual(response.data['count'], len(self.authors))
+
+    def test_subscriptions_recipes_limit(self):
+        response = self.assertResponseQueries(
+            4,
+            3,
+            '/api/users/subscriptions/?recipes_limit=1'
+        )
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), 1)
+            self.assertEqual(author['recipes_count'], RECIPES_PER_AUTHOR)
+
+    def test_download_shopping_cart(self):
+        self.assertResponseQueries(
+            2,
+            1,
+            '/api/recipes/download_shopping_cart/'
+        )
+
+    def test_add_to_shopping_cart(self):
+        ShoppingCart.objects.filter(recipe=self.recipe).delete()
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                f'/api/recipes/{self.recipe.id}/shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+
+class NonNumericIdTests(APITestCase):
+    """Нечисловой id в адресе действия дает 404, а не ошибку сервера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Пользователь',
+            last_name='Пользователь',
+            password='user-password'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def assertNotFound(self, method, path, **kwargs):
+        response = getattr(self.client, method)(path, **kwargs)
+        self.assertEqual(response.status_code, 404, f'{method} {path}')
+
+    def test_favorite(self):
+        for method in ('post', 'delete'):
+            self.assertNotFound(method, '/api/recipes/abc/favorite/')
+
+    def test_shopping_cart(self):
+        for method in ('post', 'delete'):
+            self.assertNotFound(method, '/api/recipes/abc/shopping_cart/')
+        self.assertNotFound(
+            'patch',
+            '/api/recipes/abc/shopping_cart/',
+            data={'servings': 2},
+            format='json'
+        )
+
+    def test_subscribe(self):
+        for method in ('post', 'delete'):
+            self.assertNotFound(method, '/api/users/abc/subscribe/')
+
+    def test_get_link(self):
+        self.assertNotFound('get', '/api/recipes/abc/get-link/')
+
+
+class TokenSnapshotTests(APITestCase):
+    """Права администратора при аутентификации по кешированному токену."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            first_name='Админ',
+            last_name='Админ',
+            password='admin-password'
+        )
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Автор',
+            password='author-password'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/test.png'
+            )
+            for number in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_superuser_flags_are_cached(self):
+        response = self.client.delete(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        # Флаги входят в снимок и не дочитываются из базы.
+        user, _ = CachedTokenAuthentication().authenticate_credentials(
+            Token.objects.get(user=self.admin).key
+        )
+        self.assertFalse(
+            {'is_staff', 'is_superuser'} & user.get_deferred_fields()
+        )
+
+    def test_snapshot_fields(self):
+        self.client.get('/api/users/me/')
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['username'], self.admin.username)
+        self.admin.is_active = False
+        self.admin.save(update_fields=('is_active',))
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_revoked_superuser_loses_access(self):
+        self.client.get('/api/tags/')
+        self.admin.is_superuser = False
+        self.admin.save(update_fields=('is_superuser',))
+        response = self.client.delete(f'/api/recipes/{self.recipes[1].id}/')
+        self.assertEqual(response.status_code, 403)
@@ -1,18 +1,28 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (IngredientViewSet, RecipeViewSet,
-                       TagViewSet, UserViewSet)
+from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                       UploadViewSet, UserViewSet, token_login)
 
 router_v1 = DefaultRouter()
 router_v1.register('users', UserViewSet, basename='users')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('tags', TagViewSet, basename='tags')
+router_v1.register('uploads', UploadViewSet, basename='uploads')
+
+auth_urls = [path('auth/', include('djoser.urls.authtoken'))]
+if settings.SERVER_MODE == 'asgi':
+    # Адрес стоит раньше маршрутов djoser и заменяет их представление.
+    auth_urls.insert(
+        0,
+        re_path(r'^auth/token/login/?$', token_login, name='login')
+    )
 
 
 urlpatterns = [
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
-    path('auth/', include('djoser.urls.authtoken')),
+    *auth_urls,
 ]
@@ -1,19 +1,102 @@
 import base64
+import re
 
+from django.core.cache import cache
 from django.core.files.base import ContentFile
-from django.db.models import Sum
+from django.db import connections, router
+from django.db.models import (Case, CharField, Count, F, FloatField, Max, Sum,
+                              Value, When)
 from django.http import HttpResponse
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.serializers import ImageField, ValidationError
 
-from recipes.models import RecipeIngredient
+from foodgram import s3
+from foodgram.constants import (DIRECT_UPLOAD_CONTENT_TYPES,
+                                DIRECT_UPLOAD_MAX_SIZE, DIRECT_UPLOAD_PREFIX,
+                                SHOPPING_CART_CACHE_TIMEOUT,
+                                SUBSCRIPTIONS_CACHE_TIMEOUT, UNIT_CONVERSIONS)
+from foodgram.invalidation import get_version, record_instance
+
+
+def parse_pk(value):
+    """Приводит id из адреса к числу, для нечислового id отвечает 404.
+
+    Нужна там, где id попадает в запрос без get_object_or_404 DRF.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise NotFound()
+
+
+def get_recipes_limit(request):
+    """Возвращает положительный recipes_limit из запроса или None."""
+    if request is None:
+        return None
+    try:
+        recipes_limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return recipes_limit if recipes_limit > 0 else None
+
+
+def get_upload_key_re(user):
+    extensions = '|'.join(
+        re.escape(extension)
+        for extension in DIRECT_UPLOAD_CONTENT_TYPES.values()
+    )
+    return re.compile(
+        rf'{re.escape(DIRECT_UPLOAD_PREFIX)}{user.id}/[0-9a-f]{{32}}'
+        rf'({extensions})'
+    )
+
+
+def confirm_upload(key, user):
+    """Проверяет объект, загруженный пользователем напрямую в хранилище.
+
+    Содержимое не читается: проверяются принадлежность ключа, наличие
+    объекта, его размер и тип. Отклоненный объект удаляется.
+    """
+    if (
+        not s3.is_enabled()
+        or user is None
+        or not get_upload_key_re(user).fullmatch(key)
+    ):
+        raise ValidationError('Неизвестный ключ загрузки.')
+    try:
+        headers = s3.head_object(key)
+    except s3.S3Error:
+        raise ValidationError('Хранилище недоступно, повторите попытку.')
+    if headers is None:
+        raise ValidationError('Файл не загружен в хранилище.')
+    error = None
+    if int(headers.get('Content-Length', 0)) > DIRECT_UPLOAD_MAX_SIZE:
+        error = 'Файл слишком большой.'
+    elif headers.get('Content-Type') not in DIRECT_UPLOAD_CONTENT_TYPES:
+        error = 'Недопустимый тип файла.'
+    if error:
+        try:
+            s3.delete_object(key)
+        except s3.S3Error:
+            # Объект останется сиротой и будет удален collect_orphans.
+            pass
+        raise ValidationError(error)
+    return key
 
 
 class Base64ImageField(ImageField):
-    """Поле для декодировки изображений в формате Base64."""
+    """Поле для декодировки изображений в формате Base64.
+
+    Вместо изображения можно передать ключ объекта, загруженного
+    клиентом напрямую в хранилище по адресу из /api/uploads/.
+    """
 
     def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith(DIRECT_UPLOAD_PREFIX):
+            request = self.context.get('request')
+            return confirm_upload(data, request and request.user)
         if isinstance(data, str) and data.startswith('data:image'):
             try:
                 img_format, img_str = data.split(';base64,')
@@ -29,29 +112,158 @@ class Base64ImageField(ImageField):
         return super().to_internal_value(data)
 
 
-def get_shopping_cart(request):
-    """Генерирует файл со списком покупок для текущего пользователя."""
-    user = request.user
-    if not user.shoppingcarts.exists():
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+def insert_ignore_conflict(model, exists=None, **fields):
+    """Добавляет запись одним запросом INSERT ... ON CONFLICT DO NOTHING.
+
+    С queryset exists запись вставляется, только если он не пуст.
+    Возвращает True, если запись создана, и False, если такая запись
+    уже существует или exists пуст.
+    """
+    connection = connections[router.db_for_write(model)]
+    obj = model(**fields)
+    opts = model._meta
+    insert_fields = [
+        field for field in opts.concrete_fields
+        if field is not opts.pk
+    ]
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in insert_fields
+    )
+    placeholders = ', '.join(['%s'] * len(insert_fields))
+    params = [
+        field.get_db_prep_save(field.pre_save(obj, add=True), connection)
+        for field in insert_fields
+    ]
+    values = f'VALUES ({placeholders})'
+    if exists is not None:
+        exists_sql, exists_params = exists.values('pk').query.get_compiler(
+            connection=connection
+        ).as_sql()
+        values = f'SELECT {placeholders} WHERE EXISTS ({exists_sql})'
+        params.extend(exists_params)
+    sql = (
+        f'INSERT INTO {connection.ops.quote_name(opts.db_table)} '
+        f'({columns}) {values} '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {connection.ops.quote_name(opts.pk.column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        created = cursor.fetchone() is not None
+    if created:
+        # Запрос выполняется в обход сигналов post_save.
+        record_instance(model, obj)
+    return created
+
+
+def format_amount(amount):
+    """Форматирует количество без лишних нулей после запятой."""
+    return f'{amount:.2f}'.rstrip('0').rstrip('.')
 
-    ingredients = (
-        RecipeIngredient.objects.filter(
-            recipe__shoppingcarts__user=request.user
-        ).select_related('ingredient').values(
-            'ingredient__name',
-            'ingredient__measurement_unit',
-        ).annotate(
-            ingredient_amount=Sum('amount')
+
+def get_subscribed_author_ids(user):
+    """Возвращает id авторов, на которых подписан пользователь.
+
+    Список кешируется до изменения подписок пользователя.
+    """
+    if user.is_anonymous:
+        return set()
+    cache_key = (
+        f'subscribed_authors:{user.id}:'
+        f'{get_version("subscription", user.id)}'
+    )
+    author_ids = cache.get(cache_key)
+    if author_ids is None:
+        author_ids = set(
+            user.follower.values_list('author_id', flat=True)
         )
+        cache.set(cache_key, author_ids, SUBSCRIPTIONS_CACHE_TIMEOUT)
+    return author_ids
+
+
+def get_shopping_cart_version(user):
+    """Возвращает ключ кеша, меняющийся при любом изменении корзины.
+
+    Учитывает число позиций, изменение позиций, изменение рецептов и
+    версию ингредиентов: переименование ингредиента или смена единицы
+    измерения не меняет рецепты.
+    """
+    version = user.shoppingcarts.aggregate(
+        items=Count('id'),
+        cart_updated=Max('updated_at'),
+        recipes_updated=Max('recipe__updated_at')
+    )
+    if not version['items']:
+        return None
+    return (
+        f'shopping_cart:{user.id}:{version["items"]}:'
+        f'{version["cart_updated"].timestamp()}:'
+        f'{version["recipes_updated"].timestamp()}:'
+        f'{get_version("ingredient")}'
+    )
+
+
+def aggregate_shopping_cart(user):
+    """Суммирует ингредиенты корзины одним запросом.
+
+    Количество умножается на число порций позиции корзины и переводится
+    в базовую единицу измерения по таблице UNIT_CONVERSIONS.
+    """
+    unit = 'recipe__recipe_ingredients__ingredient__measurement_unit'
+    base_unit = Case(
+        *(
+            When(**{unit: name}, then=Value(base))
+            for name, (base, _) in UNIT_CONVERSIONS.items()
+        ),
+        default=F(unit),
+        output_field=CharField()
     )
-    shopping_cart = f'Список покупок пользователя {user}:\n'
+    factor = Case(
+        *(
+            When(**{unit: name}, then=Value(multiplier))
+            for name, (_, multiplier) in UNIT_CONVERSIONS.items()
+        ),
+        default=Value(1.0),
+        output_field=FloatField()
+    )
+    return user.shoppingcarts.values(
+        name=F('recipe__recipe_ingredients__ingredient__name'),
+        unit=base_unit
+    ).annotate(
+        amount=Sum(
+            F('recipe__recipe_ingredients__amount') * F('servings') * factor,
+            output_field=FloatField()
+        )
+    ).order_by('name', 'unit')
+
+
+def get_shopping_cart_text(user):
+    """Возвращает список покупок пользователя или None для пустой корзины.
+
+    Список кешируется до следующего изменения корзины.
+    """
+    cache_key = get_shopping_cart_version(user)
+    if cache_key is None:
+        return None
+
+    shopping_cart = cache.get(cache_key)
+    if shopping_cart is None:
+        shopping_cart = f'Список покупок пользователя {user}:\n'
+        for ingredient in aggregate_shopping_cart(user):
+            name = ingredient['name']
+            unit = ingredient['unit']
+            amount = format_amount(ingredient['amount'])
+            shopping_cart += f'\n{name} - {amount}/{unit}'
+        cache.set(cache_key, shopping_cart, SHOPPING_CART_CACHE_TIMEOUT)
+    return shopping_cart
 
-    for ingredient in ingredients:
-        name = ingredient['ingredient__name']
-        unit = ingredient['ingredient__measurement_unit']
-        amount = ingredient['ingredient_amount']
-        shopping_cart += f'\n{name} - {amount}/{unit}'
+
+def get_shopping_cart(request):
+    """Генерирует файл со списком покупок для текущего пользователя."""
+    user = request.user
+    shopping_cart = get_shopping_cart_text(user)
+    if shopping_cart is None:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
     file_name = f'{user}_shopping_cart.txt'
     response = HttpResponse(shopping_cart, content_type='text/plain')
@@ -1,26 +1,59 @@
-from django.db.models import Exists, OuterRef, Value
-from django_filters.rest_framework import DjangoFilterBackend
+import json
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery, Value
+from django.http import HttpResponseNotAllowed, JsonResponse
 from django.urls import reverse
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from djoser.conf import settings as djoser_settings
+from djoser.utils import login_user
 from djoser.views import UserViewSet as UV
-from rest_framework import status, viewsets
+from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import get_object_or_404
 from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
 from api.filters import IngredientFilter, RecipeFilter
+from api.fragments import FRAGMENT_KEY_FIELDS, render_recipes
+from api.pagination import FeedPagination
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (AvatarSerializer, FavoriteRecipeSerializer,
-                             IngredientSerializer,
-                             RecipeCreateUpdateSerializer,
-                             RecipeGetSerializer, ShoppingCartSerializer,
-                             SubscriptionDetailSerializer,
-                             SubscriptionSerializer, TagSerializer,
-                             UserGetSerializer)
-from api.utils import get_shopping_cart
+from api.prefetch import plan_queryset
+from api.serializers import (AvatarSerializer, IngredientSerializer,
+                             RecipeCreateUpdateSerializer, RecipeGetSerializer,
+                             RecipeMatchParamsSerializer,
+                             RecipeMatchSerializer, RecipeSearchSerializer,
+                             RecipeShortSerializer,
+                             ShoppingCartServingsSerializer,
+                             SubscriptionDetailSerializer, TagSerializer,
+                             UploadSerializer, UserGetSerializer)
+from api.tasks import schedule_shopping_cart_warmup
+from api.utils import (get_recipes_limit, get_shopping_cart,
+                       insert_ignore_conflict, parse_pk)
+from foodgram import s3
+from foodgram.caching import get_cache_key, get_or_compute
+from foodgram.constants import (CATALOG_CACHE_TIMEOUT,
+                                DIRECT_UPLOAD_CONTENT_TYPES,
+                                DIRECT_UPLOAD_MAX_SIZE, DIRECT_UPLOAD_PREFIX,
+                                S3_PRESIGN_EXPIRES)
+from foodgram.hashers import (PasswordHashingBusy, acheck_password,
+                              ahash_password)
+from foodgram.invalidation import get_version, get_versions
+from recipes.feed import (clear_feed, fill_feed, get_feed_recipe_ids,
+                          has_fan_out_capacity, lock_author)
+from recipes.matching import ingredient_index
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.recommendations import (get_recommended_recipe_ids,
+                                     get_similar_recipe_ids)
+from recipes.short_links import get_short_code
+from recipes.tasks import schedule_similarities_rebuild
 from users.models import Subscription, User
 
 
@@ -31,6 +64,35 @@ class UserViewSet(UV):
     serializer_class = UserGetSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = LimitOffsetPagination
+    # Действия, которые читают профиль текущего пользователя или
+    # сохраняют его.
+    current_user_actions = (
+        'me',
+        'avatar',
+        'delete_avatar',
+        'set_password',
+        'set_username',
+    )
+
+    def initial(self, request, *args, **kwargs):
+        """Перечитывает текущего пользователя для действий с профилем.
+
+        Аутентификация возвращает снимок из кеша с частью полей, который
+        нельзя сохранять.
+        """
+        super().initial(request, *args, **kwargs)
+        if (
+            self.action in self.current_user_actions
+            and request.user.is_authenticated
+        ):
+            request.user = User.objects.get(pk=request.user.pk)
+
+    def get_queryset(self):
+        """Загружает только поля и связи, которые выводит сериализатор."""
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            queryset = plan_queryset(queryset, self.get_serializer_class())
+        return queryset
 
     @action(
         detail=False,
@@ -53,6 +115,7 @@ class UserViewSet(UV):
         serializer = AvatarSerializer(
             instance=request.user,
             data=request.data,
+            context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -60,9 +123,13 @@ class UserViewSet(UV):
 
     @avatar.mapping.delete
     def delete_avatar(self, request, *args, **kwargs):
-        """Удаление аватара пользователя."""
+        """Удаление аватара пользователя.
+
+        Файл удаляется в фоне, когда на него не останется ссылок.
+        """
         user = self.request.user
-        user.avatar.delete()
+        user.avatar = None
+        user.save(update_fields=('avatar',))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -73,15 +140,25 @@ class UserViewSet(UV):
         url_name='subscriptions'
     )
     def subscriptions(self, request):
-        """Получение списка подписок текущего пользователя."""
+        """Получение списка подписок текущего пользователя.
+
+        Число рецептов авторов считает база, а загружаются только первые
+        recipes_limit рецептов каждого автора.
+        """
         user = request.user
-        queryset = User.objects.filter(
-            following__user=user
-        ).prefetch_related(
-            'recipes',
-            'recipes__tags',
-            'recipes__ingredients'
-        )
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        queryset = plan_queryset(
+            User.objects.filter(following__user=user),
+            SubscriptionDetailSerializer,
+            {'recipes': recipes}
+        ).annotate(recipes_count=Count('recipes'))
         pages = self.paginate_queryset(queryset)
         serializer = SubscriptionDetailSerializer(
             pages,
@@ -98,15 +175,31 @@ class UserViewSet(UV):
     def subscribe(self, request, id=None):
         """Добавление/удаление подписки на автора."""
         user = request.user
-        author = get_object_or_404(User, id=id)
+        id = parse_pk(id)
 
         if self.request.method == 'POST':
-            serializer = SubscriptionSerializer(
-                data={'user': user.id, 'author': author.id},
-                context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                author = lock_author(id)
+                if author is None:
+                    raise NotFound()
+                if user == author:
+                    return Response(
+                        {'detail': 'Нельзя оформить подписку на себя.'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                fan_out = has_fan_out_capacity(author.id)
+                if not insert_ignore_conflict(
+                    Subscription,
+                    user_id=user.id,
+                    author_id=author.id,
+                    fan_out=fan_out
+                ):
+                    return Response(
+                        {'detail': 'Вы уже подписаны на этого автора.'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            if fan_out:
+                fill_feed(user.id, author.id)
             serializer_detail = SubscriptionDetailSerializer(
                 author,
                 context={'request': request}
@@ -116,15 +209,16 @@ class UserViewSet(UV):
                 status=status.HTTP_201_CREATED
             )
 
-        subscription = Subscription.objects.filter(
+        deleted, _ = Subscription.objects.filter(
             user=user,
-            author=author
-        )
-        if not subscription.exists():
+            author_id=id
+        ).delete()
+        if not deleted:
+            get_object_or_404(User, id=id)
             return Response(
                 status=status.HTTP_400_BAD_REQUEST
             )
-        subscription.delete()
+        clear_feed(user.id, id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -136,6 +230,14 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Список тегов из кеша."""
+        return Response(get_or_compute(
+            f'tags:{get_version("tag")}',
+            lambda: super(TagViewSet, self).list(request).data,
+            CATALOG_CACHE_TIMEOUT
+        ))
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
@@ -148,29 +250,63 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        """Список ингредиентов из кеша по версии и параметрам запроса."""
+        return Response(get_or_compute(
+            get_cache_key(
+                'ingredients',
+                get_version('ingredient'),
+                sorted(request.query_params.lists())
+            ),
+            lambda: super(IngredientViewSet, self).list(request).data,
+            CATALOG_CACHE_TIMEOUT
+        ))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для работы с рецептами."""
 
+    # Фильтры, результат которых зависит от пользователя запроса.
+    viewer_filters = ('is_favorited', 'is_in_shopping_cart')
+
     permission_classes = (IsAuthorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('created_at', 'name')
 
     def get_serializer_class(self):
         """Выбор сериализатора."""
-        if self.action in ('get-link', 'list', 'retrieve'):
+        if self.action == 'list' and self.request.query_params.get('search'):
+            return RecipeSearchSerializer
+        if self.action == 'match':
+            return RecipeMatchSerializer
+        if self.action in (
+            'get-link',
+            'list',
+            'retrieve',
+            'feed',
+            'similar',
+            'recommended'
+        ):
             return RecipeGetSerializer
         return RecipeCreateUpdateSerializer
 
     def get_queryset(self):
-        """Переопределение ."""
+        """Переопределение .
+
+        Для чтения связи и поля рецептов загружаются по плану
+        сериализатора. При изменении рецепта связи не кешируются, чтобы
+        ответ строился по новым ингредиентам. Ответы RecipeGetSerializer
+        собираются из кешированных фрагментов, поэтому для них
+        загружаются только поля ключа фрагмента.
+        """
         user = self.request.user
-        queryset = Recipe.objects.select_related(
-            'author'
-        ).prefetch_related(
-            'tags',
-            'ingredients'
-        )
+        queryset = Recipe.objects.defer('search_vector')
+        serializer_class = self.get_serializer_class()
+        if serializer_class is RecipeGetSerializer:
+            queryset = queryset.only(*FRAGMENT_KEY_FIELDS)
+        elif self.request.method in SAFE_METHODS:
+            queryset = plan_queryset(queryset, serializer_class)
 
         if user.is_authenticated:
             queryset = queryset.annotate(
@@ -194,6 +330,119 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """Список рецептов из кешированных фрагментов.
+
+        Если результат не зависит от пользователя, id рецептов страницы
+        кешируются до изменения рецептов или тегов.
+        """
+        if self.get_serializer_class() is not RecipeGetSerializer:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if any(name in request.query_params for name in self.viewer_filters):
+            page = self.paginate_queryset(queryset)
+        else:
+            page = self.get_recipes_in_order(self.paginator.paginate_ids(
+                queryset,
+                request,
+                get_cache_key(
+                    'recipe_page',
+                    get_versions(('recipe',), ('tag',)),
+                    sorted(request.query_params.lists())
+                )
+            ))
+        return self.get_paginated_response(render_recipes(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из кешированного фрагмента."""
+        return Response(render_recipes([self.get_object()], request)[0])
+
+    def perform_destroy(self, instance):
+        """Удаление рецепта из индекса подбора по ингредиентам."""
+        recipe_id = instance.id
+        instance.delete()
+        ingredient_index.update([recipe_id])
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(AllowAny,)
+    )
+    def match(self, request):
+        """Подбор рецептов по имеющимся ингредиентам."""
+        params = RecipeMatchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        matches = self.paginate_queryset(
+            ingredient_index.match(**params.validated_data)
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, _, recipe_id in matches]
+        )
+        page = []
+        for coverage, matched, recipe_id in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = coverage
+            recipe.matched_ingredients = matched
+            page.append(recipe)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_recipes_in_order(self, recipe_ids):
+        """Возвращает рецепты в порядке переданных id."""
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        return [recipes[pk] for pk in recipe_ids if pk in recipes]
+
+    @action(
+        detail=True,
+        methods=['GET'],
+        permission_classes=(AllowAny,)
+    )
+    def similar(self, request, pk=None):
+        """Рецепты, которые часто добавляют вместе с этим рецептом."""
+        get_object_or_404(Recipe, pk=pk)
+        return Response(render_recipes(
+            self.get_recipes_in_order(get_similar_recipe_ids(pk)),
+            request
+        ))
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,)
+    )
+    def recommended(self, request):
+        """Рекомендации на основе избранного пользователя."""
+        recipe_ids = self.paginate_queryset(
+            get_recommended_recipe_ids(request.user)
+        )
+        return self.get_paginated_response(render_recipes(
+            self.get_recipes_in_order(recipe_ids),
+            request
+        ))
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь."""
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_ids(
+            lambda before, limit: get_feed_recipe_ids(
+                request.user,
+                before,
+                limit
+            ),
+            request
+        )
+        return paginator.get_paginated_response(render_recipes(
+            self.get_recipes_in_order(recipe_ids),
+            request
+        ))
+
     @action(
         detail=True,
         methods=['GET'],
@@ -203,47 +452,60 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def get_link(self, request, pk=None):
         """Получение короткой ссылки на рецепт."""
-        recipe = get_object_or_404(Recipe, pk=pk)
         rev_link = reverse(
             'get_short_link',
-            args=[recipe.pk]
+            args=[get_short_code(pk)]
         )
         return Response(
             {'short-link': request.build_absolute_uri(rev_link)},
             status=status.HTTP_200_OK
         )
 
-    def check_recipe_action(self, request, model, recipe, serializer_class):
+    def on_recipe_action(self, model, user):
+        """Планирует фоновые задачи после изменения избранного или корзины."""
+        schedule_similarities_rebuild()
+        if model is ShoppingCart:
+            schedule_shopping_cart_warmup(user.id)
+
+    def check_recipe_action(self, request, model, pk, **fields):
         """Обработка действий с рецептом (добавление/удаление)."""
         user = request.user
-        queryset = model.objects.select_related(
-            'user',
-            'recipe'
-        ).filter(user=user, recipe=recipe)
+        pk = parse_pk(pk)
 
         if request.method == 'POST':
-            data = {
-                'user': user.id,
-                'recipe': recipe.id
-            }
-            serializer = serializer_class(
-                data=data,
+            # Рецепт проверяется в том же запросе, что и вставка, поэтому
+            # удаление рецепта между ними не приводит к ошибке внешнего
+            # ключа.
+            if not insert_ignore_conflict(
+                model,
+                exists=Recipe.objects.filter(pk=pk),
+                user_id=user.id,
+                recipe_id=pk,
+                **fields
+            ):
+                get_object_or_404(Recipe, pk=pk)
+                return Response(
+                    {'detail': f'Рецепт уже добавлен в {model._added_to}.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            self.on_recipe_action(model, user)
+            serializer = RecipeShortSerializer(
+                get_object_or_404(Recipe, pk=pk),
                 context={'request': request}
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-
             return Response(
                 serializer.data,
                 status=status.HTTP_201_CREATED
             )
 
-        if not queryset.exists():
+        deleted, _ = model.objects.filter(user=user, recipe_id=pk).delete()
+        if not deleted:
+            get_object_or_404(Recipe, pk=pk)
             return Response(
                 {'detail': f'Рецепт не найден в {model.__name__.lower()}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        queryset.delete()
+        self.on_recipe_action(model, user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -253,13 +515,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, pk=None):
         """Добавление/удаление рецепта из избранного."""
-        recipe = self.get_object()
-        return self.check_recipe_action(
-            request,
-            Favorite,
-            recipe,
-            FavoriteRecipeSerializer
-        )
+        return self.check_recipe_action(request, Favorite, pk)
 
     @action(
         detail=True,
@@ -268,13 +524,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk=None):
         """Добавление/удаление рецепта из списка покупок."""
-        recipe = self.get_object()
+        if request.method == 'DELETE':
+            return self.check_recipe_action(request, ShoppingCart, pk)
+        serializer = ShoppingCartServingsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         return self.check_recipe_action(
             request,
             ShoppingCart,
-            recipe,
-            ShoppingCartSerializer
+            pk,
+            **serializer.validated_data
+        )
+
+    @shopping_cart.mapping.patch
+    def update_shopping_cart(self, request, pk=None):
+        """Изменение количества порций рецепта в списке покупок."""
+        serializer = ShoppingCartServingsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        pk = parse_pk(pk)
+        updated = ShoppingCart.objects.filter(
+            user=request.user,
+            recipe_id=pk
+        ).update(
+            updated_at=timezone.now(),
+            **serializer.validated_data
         )
+        if not updated:
+            get_object_or_404(Recipe, pk=pk)
+            return Response(
+                {'detail': 'Рецепт не найден в shoppingcart'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        schedule_shopping_cart_warmup(request.user.id)
+        return Response(serializer.data)
 
     @action(
         detail=False,
@@ -284,3 +565,115 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         """Скачивание списка покупок."""
         return get_shopping_cart(request)
+
+
+class UploadViewSet(viewsets.ViewSet):
+    """Выдача подписанных адресов для прямой загрузки изображений.
+
+    Клиент загружает файл запросом POST multipart/form-data по
+    выданному адресу с полями fields и файлом в поле file, затем передает
+    ключ вместо изображения в поле image рецепта или avatar.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def create(self, request):
+        if not s3.is_enabled():
+            raise NotFound('Прямая загрузка не настроена.')
+        serializer = UploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        content_type = serializer.validated_data['content_type']
+        key = (
+            f'{DIRECT_UPLOAD_PREFIX}{request.user.id}/{uuid4().hex}'
+            f'{DIRECT_UPLOAD_CONTENT_TYPES[content_type]}'
+        )
+        url, fields = s3.presign_upload(
+            key,
+            content_type,
+            DIRECT_UPLOAD_MAX_SIZE
+        )
+        return Response(
+            {
+                'key': key,
+                'method': 'POST',
+                'url': url,
+                'fields': fields,
+                'expires_in': S3_PRESIGN_EXPIRES,
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+
+# Как JSONRenderer DRF: кириллица в ответе без экранирования.
+LOGIN_JSON_PARAMS = {'ensure_ascii': False}
+
+
+def get_login_data(request):
+    if request.content_type == 'application/json':
+        data = json.loads(request.body or b'{}')
+        if not isinstance(data, dict):
+            raise ValueError('Ожидается объект JSON.')
+        return data
+    return request.POST
+
+
+async def token_login(request):
+    """Получение токена по email и паролю.
+
+    Асинхронная замена представления djoser для режима ASGI с тем же
+    форматом ответа: пароль проверяется в пуле хеширования, поэтому
+    всплеск входов не занимает потоки, обслуживающие остальное API.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = get_login_data(request)
+    except ValueError as error:
+        return JsonResponse(
+            {'detail': str(error)},
+            status=400,
+            json_dumps_params=LOGIN_JSON_PARAMS
+        )
+    login_field = djoser_settings.LOGIN_FIELD
+    login, password = data.get(login_field), data.get('password')
+
+    def set_password(raw_password):
+        user.set_password(raw_password)
+        user.save(update_fields=['password'])
+
+    try:
+        user = None
+        if login and password:
+            user = await sync_to_async(
+                User.objects.filter(**{login_field: login}).first
+            )()
+        if user is None:
+            # Как ModelBackend: время ответа не выдает наличие адреса.
+            await ahash_password(password or '')
+        elif await acheck_password(
+            password,
+            user.password,
+            set_password
+        ) and user.is_active:
+            token = await sync_to_async(login_user)(request, user)
+            return JsonResponse({'auth_token': token.key})
+    except PasswordHashingBusy as error:
+        return JsonResponse(
+            {'detail': str(error.detail)},
+            status=error.status_code,
+            headers={'Retry-After': str(error.wait)},
+            json_dumps_params=LOGIN_JSON_PARAMS
+        )
+    return JsonResponse(
+        {
+            'non_field_errors': [
+                djoser_settings.CONSTANTS.messages.INVALID_CREDENTIALS_ERROR
+            ]
+        },
+        status=400,
+        json_dumps_params=LOGIN_JSON_PARAMS
+    )
+
+
+# Django пропускает проверку CSRF, как и для представлений DRF.
+token_login.csrf_exempt = True
@@ -0,0 +1,165 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, combinations, islice
+from time import monotonic
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.test import RequestFactory
+from django.urls import resolve
+from rest_framework.settings import api_settings
+
+from foodgram.caching import is_cache_local
+from foodgram.constants import (WARM_CACHES_BUDGET, WARM_CACHES_WORKERS,
+                                WARM_RECIPE_PAGES, WARM_TAG_COMBINATIONS,
+                                WARM_WORKER_BUDGET)
+from recipes.matching import ingredient_index
+from recipes.models import Tag
+from recipes.search import is_postgresql, search_index
+
+# Адреса, по которым воркер заполняет кеши URL-резолвера.
+RESOLVER_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/1/',
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/users/me/',
+    '/s/warmup/',
+)
+
+
+class WarmResult:
+    """Результат прогрева одного адреса."""
+
+    def __init__(self, host, path, status=None, error=None, elapsed=0.0):
+        self.host = host
+        self.path = path
+        self.status = status
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def skipped(self):
+        return self.status is None and self.error is None
+
+
+def get_warm_hosts():
+    """Возвращает хосты для прогрева без шаблонов ALLOWED_HOSTS."""
+    return settings.WARM_CACHES_HOSTS or [
+        host for host in settings.ALLOWED_HOSTS
+        if host and host != '*' and not host.startswith('.')
+    ]
+
+
+def get_recipes_path(page, slugs=()):
+    """Адрес списка рецептов с параметрами в порядке фронтенда."""
+    query = f'page={page}&limit={api_settings.PAGE_SIZE}'
+    query += ''.join(f'&tags={slug}' for slug in slugs)
+    return f'/api/recipes/?{query}'
+
+
+def get_warm_paths(pages=WARM_RECIPE_PAGES,
+                   tag_combinations=WARM_TAG_COMBINATIONS):
+    """Возвращает адреса для прогрева в порядке убывания важности.
+
+    Сначала справочники, затем первые страницы рецептов, затем первые
+    страницы для сочетаний тегов, начиная с одиночных.
+    """
+    slugs = list(Tag.objects.values_list('slug', flat=True))
+    tag_sets = chain.from_iterable(
+        combinations(slugs, size) for size in range(1, len(slugs) + 1)
+    )
+    return [
+        '/api/tags/',
+        '/api/ingredients/',
+        *(get_recipes_path(page) for page in range(1, pages + 1)),
+        *(
+            get_recipes_path(1, tag_set)
+            for tag_set in islice(tag_sets, tag_combinations)
+        ),
+    ]
+
+
+def fetch(path, host):
+    """Выполняет анонимный GET-запрос к API без HTTP-сервера."""
+    request = RequestFactory().get(path, HTTP_HOST=host)
+    match = resolve(request.path_info)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response.status_code
+
+
+def warm_caches(hosts, paths, budget=WARM_CACHES_BUDGET,
+                workers=WARM_CACHES_WORKERS):
+    """Запрашивает адреса для всех хостов параллельно.
+
+    Запросы заполняют кеши ответов, фрагментов и версий, а также
+    буферы базы данных. Адреса, до которых очередь не дошла за budget
+    секунд, пропускаются.
+    """
+    deadline = monotonic() + budget
+
+    def warm(target):
+        host, path = target
+        if monotonic() > deadline:
+            return WarmResult(host, path)
+        started = monotonic()
+        try:
+            status = fetch(path, host)
+        except Exception as error:
+            return WarmResult(
+                host,
+                path,
+                error=f'{type(error).__name__}: {error}',
+                elapsed=monotonic() - started
+            )
+        finally:
+            connections.close_all()
+        return WarmResult(host, path, status, elapsed=monotonic() - started)
+
+    targets = [(host, path) for path in paths for host in hosts]
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(warm, targets))
+
+
+def warm_process():
+    """Строит индексы и кеши, которые хранятся в памяти процесса."""
+    try:
+        ingredient_index.warm()
+        if not is_postgresql():
+            search_index.warm()
+        hosts = get_warm_hosts()
+        # Кеш в памяти процесса warm_caches заполнить не может, поэтому
+        # ответы строятся в каждом воркере.
+        if is_cache_local() and hosts:
+            warm_caches(
+                hosts,
+                get_warm_paths(),
+                budget=WARM_WORKER_BUDGET,
+                workers=1
+            )
+    finally:
+        connections.close_all()
+
+
+def warm_worker():
+    """Готовит процесс воркера gunicorn к первым запросам.
+
+    Открывает соединения со всеми базами и заполняет кеши
+    URL-резолвера. Остальное готовится в фоновом потоке, чтобы воркер не
+    превысил таймаут запуска.
+    """
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            # Недоступная база не должна мешать запуску воркера.
+            continue
+    for path in RESOLVER_PATHS:
+        resolve(path)
+    threading.Thread(
+        target=warm_process,
+        name='warmup',
+        daemon=True
+    ).start()
@@ -0,0 +1,98 @@
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+from foodgram.constants import ESTIMATED_COUNT_THRESHOLD
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, берущий число строк большой таблицы из статистики.
+
+    Для запросов без условий на PostgreSQL используется reltuples из
+    pg_class, если оценка не меньше ESTIMATED_COUNT_THRESHOLD. Иначе
+    выполняется обычный COUNT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+                estimate = int(cursor.fetchone()[0])
+            if estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """Фильтр по внешнему ключу с выбором значения через автодополнение.
+
+    В отличие от RelatedFieldListFilter не загружает все объекты
+    связанной модели: варианты запрашиваются у autocomplete_view,
+    поэтому у ее админки должны быть заданы search_fields.
+    """
+
+    template = 'admin/autocomplete_filter.html'
+
+    class Media:
+        """Скрипты select2 для страницы списка объектов."""
+
+        js = (
+            'admin/js/vendor/jquery/jquery.js',
+            'admin/js/vendor/select2/select2.full.js',
+            'admin/js/jquery.init.js',
+            'admin/js/autocomplete.js',
+        )
+        css = {
+            'screen': (
+                'admin/css/vendor/select2/select2.css',
+                'admin/css/autocomplete.css',
+            ),
+        }
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.attname}'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field,
+            request,
+            params,
+            model,
+            model_admin,
+            field_path
+        )
+        self.app_label = model._meta.app_label
+        self.model_name = model._meta.model_name
+        self.field_name = field.name
+        self.autocomplete_url = reverse(
+            f'{model_admin.admin_site.name}:autocomplete'
+        )
+        self.selected = None
+        if self.lookup_val:
+            self.selected = field.remote_field.model._default_manager.filter(
+                **{field.target_field.attname: self.lookup_val}
+            ).first()
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.query_string = changelist.get_query_string(
+            remove=[self.lookup_kwarg]
+        )
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': self.query_string,
+            'display': 'Все',
+        }
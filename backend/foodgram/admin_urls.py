@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+# При LAZY_ADMIN модули admin.py приложений подключаются здесь, а не
+# при запуске.
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
@@ -2,6 +2,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from foodgram.invalidation import check_shared_cache
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_asgi_application()
+
+# Версии инвалидации должны быть видны всем воркерам сервера.
+check_shared_cache()
@@ -0,0 +1,121 @@
+from hashlib import sha256
+from math import log
+from random import random
+from time import monotonic, sleep, time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from foodgram.constants import (CACHE_EARLY_RECOMPUTE_BETA,
+                                CACHE_LOCK_POLL_INTERVAL, CACHE_LOCK_TIMEOUT,
+                                CACHE_LOCK_WAIT, CACHE_STALE_TIMEOUT)
+
+
+def is_cache_local():
+    """Проверяет, хранится ли кеш в памяти процесса."""
+    return isinstance(caches['default'], LocMemCache)
+
+
+def get_cache_key(prefix, *parts):
+    """Возвращает ключ кеша с хешем произвольных частей.
+
+    Хеш делает ключ допустимым для memcached при любых параметрах
+    запроса.
+    """
+    digest = sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'{prefix}:{digest}'
+
+
+def get_lock_key(key):
+    return f'lock:{key}'
+
+
+def should_recompute(expires_at, duration, now):
+    """Решает, пересчитывать ли значение до истечения срока.
+
+    Вероятность пересчета растет по мере приближения к expires_at и
+    пропорциональна времени вычисления (алгоритм XFetch), поэтому
+    обычно значение обновляет один запрос, а не все сразу.
+    """
+    return (
+        now - duration * CACHE_EARLY_RECOMPUTE_BETA * log(1 - random())
+        >= expires_at
+    )
+
+
+def store(keys, compute, timeout):
+    """Вычисляет и сохраняет значения со сроком и временем вычисления."""
+    if not keys:
+        return {}
+    started = monotonic()
+    values = compute(keys)
+    duration = monotonic() - started
+    expires_at = time() + timeout
+    cache.set_many(
+        {
+            key: (value, expires_at, duration)
+            for key, value in values.items()
+        },
+        timeout + CACHE_STALE_TIMEOUT
+    )
+    return values
+
+
+def get_many_or_compute(keys, compute, timeout):
+    """Возвращает значения по ключам, вычисляя недостающие.
+
+    compute получает список ключей и возвращает словарь значений.
+    Значения хранятся еще CACHE_STALE_TIMEOUT секунд после истечения
+    срока: их пересчитывает запрос, захвативший блокировку ключа в
+    общем кеше, а остальные запросы тем временем получают устаревшее
+    значение. При отсутствии значения запросы без блокировки ждут
+    результата до CACHE_LOCK_WAIT секунд.
+    """
+    now = time()
+    entries = cache.get_many(keys)
+    values = {}
+    refresh = []
+    for key in keys:
+        entry = entries.get(key)
+        if entry is None:
+            refresh.append(key)
+            continue
+        value, expires_at, duration = entry
+        values[key] = value
+        if should_recompute(expires_at, duration, now):
+            refresh.append(key)
+    if not refresh:
+        return values
+
+    locked = [
+        key for key in refresh
+        if cache.add(get_lock_key(key), True, CACHE_LOCK_TIMEOUT)
+    ]
+    try:
+        values.update(store(locked, compute, timeout))
+    finally:
+        cache.delete_many([get_lock_key(key) for key in locked])
+
+    waiting = [
+        key for key in refresh if key not in values and key not in locked
+    ]
+    deadline = monotonic() + CACHE_LOCK_WAIT
+    while waiting and monotonic() < deadline:
+        sleep(CACHE_LOCK_POLL_INTERVAL)
+        entries = cache.get_many(waiting)
+        values.update(
+            (key, entry[0]) for key, entry in entries.items()
+        )
+        waiting = [key for key in waiting if key not in entries]
+    # Вычисление под чужой блокировкой не завершилось вовремя.
+    values.update(store(waiting, compute, timeout))
+    return values
+
+
+def get_or_compute(key, compute, timeout):
+    """Возвращает значение с защитой от одновременного пересчета."""
+    return get_many_or_compute(
+        [key],
+        lambda keys: {key: compute()},
+        timeout
+    )[key]
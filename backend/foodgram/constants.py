@@ -4,11 +4,131 @@ MAX_LENGTH_EMAILFIELD = 254
 MAX_LENGTH_INGREDIENT_NAME = 128
 MAX_LENGTH_MEASUREMENT_UNIT = 64
 MAX_LENGTH_RECIPE_NAME = 256
+MAX_LENGTH_SHORT_CODE = 16
 MAX_LENGTH_TAG_NAME = 32
 MAX_LENGTH_TAG_SLUG = 32
+MAX_LENGTH_JOB_NAME = 255
+MAX_LENGTH_JOB_KEY = 255
+MAX_LENGTH_JOB_STATUS = 16
 MAX_VALUE_COOKING_TIME = 10080
 
 MIN_VALUE_COOKING_TIME = 1
 MIN_VALUE_INGREDIENT_AMOUNT = 1
+MIN_VALUE_SERVINGS = 1
+MAX_VALUE_SERVINGS = 100
 
 INLINE_EXTRA_VALUE = 1
+ESTIMATED_COUNT_THRESHOLD = 100000
+CATALOG_BATCH_SIZE = 1000
+
+FEED_FAN_OUT_MAX_FOLLOWERS = 1000
+FEED_BACKFILL_RECIPES_LIMIT = 100
+FEED_BATCH_SIZE = 1000
+MAX_FEED_PAGE_SIZE = 100
+
+SEARCH_CONFIG = 'russian'
+SEARCH_HEADLINE_MAX_WORDS = 35
+SEARCH_MAX_RESULTS = 1000
+
+MATCH_INDEX_TTL = 300
+MATCH_INDEX_REBUILD_INTERVAL = 5
+MAX_MATCH_INGREDIENTS = 50
+
+SHORT_CODE_ALPHABET = (
+    'abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+)
+SHORT_CODE_LENGTH = 6
+SHORT_LINK_CACHE_SIZE = 10000
+
+TOKEN_CACHE_TIMEOUT = 5 * 60
+TOKEN_LOCAL_CACHE_TIMEOUT = 10
+TOKEN_LOCAL_CACHE_SIZE = 10000
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 10 * 60
+RECIPE_PAGE_CACHE_TIMEOUT = 5 * 60
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+CACHE_STALE_TIMEOUT = 60
+CACHE_EARLY_RECOMPUTE_BETA = 1.0
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 3
+CACHE_LOCK_POLL_INTERVAL = 0.05
+
+INVALIDATION_CHECK_INTERVAL = 1
+INVALIDATION_LOCAL_VERSIONS = 10000
+INVALIDATION_LISTEN_RETRY = 5
+# Предел сообщения NOTIFY PostgreSQL 8000 байт.
+INVALIDATION_NOTIFY_PAYLOAD_SIZE = 7000
+
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_LIMIT = 100
+RECOMMENDATIONS_MAX_USER_ITEMS = 500
+RECOMMENDATIONS_SHOPPING_CART_WEIGHT = 0.5
+# Пересчет похожих рецептов откладывается, чтобы объединить изменения.
+RECOMMENDATIONS_REBUILD_DELAY = 60
+# Запас для добавлений, зафиксированных после начала расчета, но с более
+# ранней датой создания.
+RECOMMENDATIONS_WATERMARK_OVERLAP = 60
+
+# Единица измерения: (базовая единица, множитель перевода в нее).
+UNIT_CONVERSIONS = {
+    'мг': ('г', 0.001),
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+    'ч. л.': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'стакан': ('мл', 250),
+    'капля': ('мл', 0.05),
+}
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60
+SUBSCRIPTIONS_CACHE_TIMEOUT = 60 * 60
+
+# Файлы моложе этого срока не удаляются: на них могут ссылаться
+# записи еще не зафиксированных транзакций.
+MEDIA_ORPHAN_GRACE = 60 * 60
+
+# Прямая загрузка изображений в S3-совместимое хранилище.
+DIRECT_UPLOAD_PREFIX = 'uploads/'
+DIRECT_UPLOAD_CONTENT_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+# Совпадает с client_max_body_size в конфигурации nginx.
+DIRECT_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+S3_PRESIGN_EXPIRES = 10 * 60
+S3_REQUEST_TIMEOUT = 5
+
+WARM_RECIPE_PAGES = 5
+WARM_TAG_COMBINATIONS = 15
+WARM_CACHES_BUDGET = 60
+WARM_CACHES_WORKERS = 4
+# Прогрев в воркере gunicorn идет в фоне и не должен конкурировать с
+# первыми запросами дольше этого времени.
+WARM_WORKER_BUDGET = 10
+
+JOB_DEFAULT_PRIORITY = 0
+JOB_HIGH_PRIORITY = 10
+JOB_LOW_PRIORITY = -10
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 10
+JOB_RETRY_MAX_DELAY = 60 * 60
+# Задача, не завершенная за это время, считается брошенной упавшим
+# воркером и выполняется повторно.
+JOB_LOCK_TIMEOUT = 15 * 60
+JOB_POLL_INTERVAL = 1.0
+JOB_WORKER_THREADS = 4
+
+# Время загрузки приложения в новом процессе, с. Проверяется в CI
+# командой profile_startup; лучший из STARTUP_PROFILE_RUNS замеров.
+STARTUP_TIME_BUDGET = 1.5
+STARTUP_PROFILE_RUNS = 3
+
+# Ожидающих хешей паролей на процесс; сверх этого вход отклоняется с
+# кодом 503, чтобы всплеск входов не занимал воркеры.
+PASSWORD_HASHING_QUEUE = 16
+PASSWORD_HASHING_NICE = 10
+PASSWORD_HASHING_RETRY_AFTER = 1
+BENCHMARK_LOGIN_REQUESTS = 200
+BENCHMARK_LOGIN_CONCURRENCY = 16
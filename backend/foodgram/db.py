@@ -0,0 +1,41 @@
+from time import monotonic
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def check_connections(**kwargs):
+    """Закрывает неработоспособные постоянные соединения перед запросом.
+
+    Проверка выполняется не чаще DATABASE_HEALTH_CHECK_INTERVAL секунд,
+    чтобы не добавлять лишний запрос к каждому обращению к API.
+    """
+    now = monotonic()
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        checked_at = getattr(conn, 'health_checked_at', None)
+        if (
+            checked_at is not None
+            and now - checked_at < settings.DATABASE_HEALTH_CHECK_INTERVAL
+        ):
+            continue
+        if not conn.is_usable():
+            conn.close()
+        conn.health_checked_at = now
+
+
+def stream(queryset, chunk_size=2000):
+    """Итерирует queryset серверным курсором.
+
+    При работе через пулер в режиме transaction использует отдельное
+    подключение и держит курсор внутри транзакции.
+    """
+    alias = queryset.db
+    if (
+        alias == DEFAULT_DB_ALIAS
+        and settings.STREAMING_DATABASE in settings.DATABASES
+    ):
+        alias = settings.STREAMING_DATABASE
+    with transaction.atomic(using=alias):
+        yield from queryset.using(alias).iterator(chunk_size=chunk_size)
@@ -0,0 +1,198 @@
+import asyncio
+import base64
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import (PBKDF2PasswordHasher, get_hasher,
+                                         identify_hasher, is_password_usable)
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+from rest_framework.exceptions import APIException
+
+from foodgram.constants import (PASSWORD_HASHING_NICE, PASSWORD_HASHING_QUEUE,
+                                PASSWORD_HASHING_RETRY_AFTER)
+
+
+class PasswordHashingBusy(APIException):
+    """Очередь хеширования паролей заполнена."""
+
+    status_code = 503
+    default_detail = 'Слишком много входов одновременно, повторите позже.'
+    default_code = 'password_hashing_busy'
+    # Передается клиенту в заголовке Retry-After.
+    wait = PASSWORD_HASHING_RETRY_AFTER
+
+
+class HashingPool:
+    """Пул процессов для хеширования паролей с ограниченной очередью.
+
+    Хеширование не занимает процессор воркера, процессы пула работают с
+    пониженным приоритетом. Когда ожидающих хешей больше queue_size,
+    новые сразу отклоняются PasswordHashingBusy, чтобы всплеск входов не
+    копил очередь. При workers=0 хеш считается в вызывающем потоке.
+    """
+
+    def __init__(self, workers, queue_size, nice):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.nice = nice
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = Lock()
+
+    def get_executor(self):
+        # После fork пул родительского процесса недоступен.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                initializer=os.nice,
+                initargs=(self.nice,)
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, func, *args):
+        with self._lock:
+            if self._pending >= self.queue_size:
+                raise PasswordHashingBusy()
+            self._pending += 1
+            try:
+                try:
+                    future = self.get_executor().submit(func, *args)
+                except BrokenProcessPool:
+                    # Процесс пула завершился аварийно, пул создается заново.
+                    self._executor = None
+                    future = self.get_executor().submit(func, *args)
+            except BaseException:
+                self._pending -= 1
+                raise
+        future.add_done_callback(self.release)
+        return future
+
+    def run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        if not self.workers:
+            return await sync_to_async(func, thread_sensitive=False)(*args)
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+
+pool = HashingPool(
+    settings.PASSWORD_HASHING_WORKERS,
+    PASSWORD_HASHING_QUEUE,
+    PASSWORD_HASHING_NICE
+)
+
+
+class OffloadedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256, вычисляемый в пуле процессов.
+
+    Формат хеша совпадает со стандартным pbkdf2_sha256. Число итераций
+    задает PASSWORD_HASH_ITERATIONS, хеши с другим числом пересчитываются
+    при успешном входе.
+    """
+
+    iterations = settings.PASSWORD_HASH_ITERATIONS
+
+    def get_arguments(self, password, salt, iterations):
+        assert password is not None
+        assert salt and '$' not in salt
+        return (
+            self.digest().name,
+            force_bytes(password),
+            force_bytes(salt),
+            iterations or self.iterations
+        )
+
+    def format(self, arguments, hash):
+        _, _, salt, iterations = arguments
+        hash = base64.b64encode(hash).decode('ascii').strip()
+        return f'{self.algorithm}${iterations}${salt.decode()}${hash}'
+
+    def encode(self, password, salt, iterations=None):
+        arguments = self.get_arguments(password, salt, iterations)
+        return self.format(
+            arguments,
+            pool.run(hashlib.pbkdf2_hmac, *arguments)
+        )
+
+    async def aencode(self, password, salt, iterations=None):
+        arguments = self.get_arguments(password, salt, iterations)
+        return self.format(
+            arguments,
+            await pool.arun(hashlib.pbkdf2_hmac, *arguments)
+        )
+
+    async def averify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = await self.aencode(
+            password,
+            decoded['salt'],
+            decoded['iterations']
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    async def aharden_runtime(self, password, encoded):
+        decoded = self.decode(encoded)
+        extra_iterations = self.iterations - decoded['iterations']
+        if extra_iterations > 0:
+            await self.aencode(password, decoded['salt'], extra_iterations)
+
+
+async def acheck_password(password, encoded, setter=None):
+    """Асинхронный аналог django.contrib.auth.hashers.check_password.
+
+    Хеш основного алгоритма вычисляется в пуле без занятия потока,
+    остальные алгоритмы — в потоке. setter вызывается в потоке, когда
+    хеш нужно пересчитать по текущей политике.
+    """
+    if password is None or not is_password_usable(encoded):
+        return False
+    preferred = get_hasher()
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    if isinstance(hasher, OffloadedPBKDF2PasswordHasher):
+        is_correct = await hasher.averify(password, encoded)
+        if not is_correct and not hasher_changed and must_update:
+            await hasher.aharden_runtime(password, encoded)
+    else:
+        def verify():
+            is_correct = hasher.verify(password, encoded)
+            if not is_correct and not hasher_changed and must_update:
+                hasher.harden_runtime(password, encoded)
+            return is_correct
+
+        is_correct = await sync_to_async(verify, thread_sensitive=False)()
+
+    if setter and is_correct and must_update:
+        await sync_to_async(setter)(password)
+    return is_correct
+
+
+async def ahash_password(password):
+    """Считает хеш, не сохраняя его, для выравнивания времени ответа."""
+    hasher = get_hasher()
+    if isinstance(hasher, OffloadedPBKDF2PasswordHasher):
+        return await hasher.aencode(password, hasher.salt())
+    return await sync_to_async(
+        hasher.encode,
+        thread_sensitive=False
+    )(password, hasher.salt())
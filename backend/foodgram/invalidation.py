@@ -0,0 +1,270 @@
+import json
+import select
+import threading
+from collections import OrderedDict
+from os import getpid
+from time import monotonic, sleep
+from uuid import uuid4
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from foodgram.caching import is_cache_local
+from foodgram.constants import (INVALIDATION_CHECK_INTERVAL,
+                                INVALIDATION_LISTEN_RETRY,
+                                INVALIDATION_LOCAL_VERSIONS,
+                                INVALIDATION_NOTIFY_PAYLOAD_SIZE)
+
+# Модель: (сущность, атрибут объекта с id версии). Для избранного,
+# корзины и подписок версия ведется по пользователю, которому они
+# принадлежат.
+TRACKED_MODELS = {
+    'recipes.Recipe': ('recipe', 'pk'),
+    'recipes.Tag': ('tag', 'pk'),
+    'recipes.Ingredient': ('ingredient', 'pk'),
+    'recipes.Favorite': ('favorite', 'user_id'),
+    'recipes.ShoppingCart': ('shoppingcart', 'user_id'),
+    'users.Subscription': ('subscription', 'user_id'),
+    'users.User': ('user', 'pk'),
+}
+
+# Поля, сохранение только которых не меняет закешированные ответы.
+UNTRACKED_FIELDS = {
+    'users.User': {'last_login'},
+}
+
+_state = threading.local()
+_versions = OrderedDict()
+_versions_lock = threading.Lock()
+
+
+def get_version_key(entity, pk=None):
+    if pk is None:
+        return f'version:{entity}'
+    return f'version:{entity}:{pk}'
+
+
+class InvalidationBatch:
+    """Изменения одной транзакции, публикуемые после ее фиксации."""
+
+    def __init__(self):
+        self.keys = set()
+
+    def __call__(self):
+        publish(self.keys)
+
+
+def record_change(entity, *pks):
+    """Отмечает изменение сущности и ее объектов с указанными id.
+
+    Изменения внутри транзакции объединяются и публикуются один раз
+    после фиксации, вне транзакции публикуются сразу.
+    """
+    keys = {get_version_key(entity)}
+    keys.update(get_version_key(entity, pk) for pk in pks)
+    connection = transaction.get_connection()
+    batch = getattr(_state, 'batch', None)
+    # После фиксации или отката транзакции Django очищает список
+    # on_commit, и изменения нужно собирать в новый пакет.
+    if batch is not None and any(
+        callback is batch for _, callback in connection.run_on_commit
+    ):
+        batch.keys.update(keys)
+        return
+    batch = _state.batch = InvalidationBatch()
+    batch.keys.update(keys)
+    transaction.on_commit(batch)
+
+
+def set_local_versions(versions, checked_at):
+    with _versions_lock:
+        for key, version in versions.items():
+            _versions[key] = (checked_at, version)
+            _versions.move_to_end(key)
+        while len(_versions) > INVALIDATION_LOCAL_VERSIONS:
+            _versions.popitem(last=False)
+
+
+def get_notify_payloads(versions):
+    """Делит версии на сообщения NOTIFY допустимого размера."""
+    payload = {}
+    for key, version in versions.items():
+        payload[key] = version
+        if len(json.dumps(payload)) > INVALIDATION_NOTIFY_PAYLOAD_SIZE:
+            del payload[key]
+            yield json.dumps(payload)
+            payload = {key: version}
+    if payload:
+        yield json.dumps(payload)
+
+
+def publish(keys):
+    """Записывает новые версии в общий кеш и рассылает их через NOTIFY."""
+    if not keys:
+        return
+    version = uuid4().hex[:16]
+    versions = dict.fromkeys(keys, version)
+    cache.set_many(versions, None)
+    set_local_versions(versions, monotonic())
+    connection = connections[DEFAULT_DB_ALIAS]
+    if settings.INVALIDATION_CHANNEL and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for payload in get_notify_payloads(versions):
+                cursor.execute(
+                    'SELECT pg_notify(%s, %s)',
+                    (settings.INVALIDATION_CHANNEL, payload)
+                )
+
+
+class InvalidationListener(threading.Thread):
+    """Получает версии из канала LISTEN/NOTIFY PostgreSQL.
+
+    Пока слушатель подключен, локальные версии обновляются сразу после
+    публикации и не перечитываются из общего кеша.
+    """
+
+    def __init__(self, channel):
+        super().__init__(name='invalidation-listener', daemon=True)
+        self.channel = channel
+        self.connected = False
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception:
+                self.connected = False
+                connections[DEFAULT_DB_ALIAS].close()
+                sleep(INVALIDATION_LISTEN_RETRY)
+
+    def listen(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LISTEN {connection.ops.quote_name(self.channel)}'
+            )
+        raw = connection.connection
+        # Версии, опубликованные до подписки, перечитываются из кеша.
+        with _versions_lock:
+            _versions.clear()
+        self.connected = True
+        while True:
+            if not select.select([raw], [], [], 60)[0]:
+                continue
+            raw.poll()
+            while raw.notifies:
+                set_local_versions(
+                    json.loads(raw.notifies.pop(0).payload),
+                    monotonic()
+                )
+
+
+_listener = {'pid': None, 'thread': None}
+
+
+def is_listening():
+    """Запускает слушателя в текущем процессе и сообщает его состояние."""
+    if (
+        not settings.INVALIDATION_CHANNEL
+        or connections[DEFAULT_DB_ALIAS].vendor != 'postgresql'
+    ):
+        return False
+    # После fork потоки родителя не существуют, поэтому слушатель
+    # запускается в каждом процессе.
+    if _listener['pid'] != getpid():
+        _listener['pid'] = getpid()
+        _listener['thread'] = InvalidationListener(
+            settings.INVALIDATION_CHANNEL
+        )
+        _listener['thread'].start()
+    return _listener['thread'].connected
+
+
+def get_versions(*keys):
+    """Возвращает версии по ключам (сущность, id) или (сущность,).
+
+    Версии хранятся в памяти процесса и перечитываются из общего кеша
+    одним запросом не чаще раза в INVALIDATION_CHECK_INTERVAL секунд.
+    """
+    version_keys = [get_version_key(*key) for key in keys]
+    now = monotonic()
+    listening = is_listening()
+    with _versions_lock:
+        local = {key: _versions.get(key) for key in version_keys}
+    stale = [
+        key for key, value in local.items()
+        if value is None or (
+            not listening and now - value[0] > INVALIDATION_CHECK_INTERVAL
+        )
+    ]
+    if stale:
+        fetched = cache.get_many(stale)
+        fetched = {key: fetched.get(key) for key in stale}
+        set_local_versions(fetched, now)
+        local.update((key, (now, value)) for key, value in fetched.items())
+    return [local[key][1] for key in version_keys]
+
+
+def get_version(entity, pk=None):
+    """Возвращает версию сущности или ее объекта."""
+    return get_versions((entity, pk))[0]
+
+
+def record_instance(sender, instance, update_fields=None, **kwargs):
+    """Отмечает изменение объекта отслеживаемой модели."""
+    label = sender._meta.label
+    if update_fields and update_fields <= UNTRACKED_FIELDS.get(label, set()):
+        return
+    entity, attribute = TRACKED_MODELS[label]
+    record_change(entity, getattr(instance, attribute))
+
+
+def record_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        record_change('recipe', instance.pk)
+    elif pk_set:
+        record_change('recipe', *pk_set)
+    else:
+        # При очистке со стороны тега pk_set не передается.
+        record_change('recipe')
+
+
+def check_shared_cache():
+    """Проверяет, что версии публикуются в кеш, общий для процессов.
+
+    Версии в кеше одного процесса не видят остальные воркеры, и они
+    молча отдавали бы устаревшие ответы, поэтому запуск сервера или
+    воркеров очереди без общего кеша прерывается. Кеш в памяти
+    допускается только явным CACHE_LOCATION=locmem для запуска одним
+    процессом. Команды управления кеш не проверяют.
+    """
+    if not settings.CACHE_LOCATION or (
+        is_cache_local() and settings.CACHE_LOCATION != 'locmem'
+    ):
+        raise ImproperlyConfigured(
+            'Инвалидации кешей нужен общий кеш: задайте CACHE_LOCATION '
+            '(адреса memcached) или locmem для запуска одним процессом.'
+        )
+
+
+def connect_signals():
+    """Подключает запись изменений отслеживаемых моделей."""
+    for label in TRACKED_MODELS:
+        model = apps.get_model(label)
+        for signal in (post_save, post_delete):
+            signal.connect(
+                record_instance,
+                sender=model,
+                dispatch_uid=f'invalidation_{label}'
+            )
+    m2m_changed.connect(
+        record_recipe_tags,
+        sender=apps.get_model('recipes.Recipe').tags.through,
+        dispatch_uid='invalidation_recipe_tags'
+    )
@@ -0,0 +1,179 @@
+import asyncio
+import random
+from contextvars import ContextVar
+from hashlib import sha256
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - '
+    'pg_last_xact_replay_timestamp()) END'
+)
+
+# Состояние маршрутизации текущего запроса. Вне запроса (команды
+# управления, фоновые задачи) все обращения идут в основную базу.
+_routing = ContextVar('replica_routing', default=None)
+_replica_lag = {}
+
+
+def get_replica_lag(alias):
+    """Возвращает отставание реплики в секундах.
+
+    Значение кешируется в процессе на REPLICA_LAG_CHECK_INTERVAL секунд.
+    Недоступная реплика считается бесконечно отстающей.
+    """
+    checked_at, lag = _replica_lag.get(alias, (None, None))
+    now = monotonic()
+    if (
+        checked_at is not None
+        and now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL
+    ):
+        return lag
+    conn = connections[alias]
+    lag = 0.0
+    if conn.vendor == 'postgresql':
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                lag = float(cursor.fetchone()[0] or 0)
+        except DatabaseError:
+            lag = float('inf')
+    _replica_lag[alias] = (now, lag)
+    return lag
+
+
+def choose_replica():
+    """Выбирает случайную реплику с допустимым отставанием."""
+    replicas = [
+        alias for alias in settings.REPLICA_DATABASES
+        if get_replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Направляет чтение безопасных запросов на реплики.
+
+    Запись и любое чтение после записи в рамках запроса идут в основную
+    базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state['primary']:
+            return DEFAULT_DB_ALIAS
+        if state['replica'] is None:
+            state['replica'] = choose_replica()
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state['primary'] = True
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def get_sticky_key(request):
+    """Возвращает ключ привязки клиента к основной базе.
+
+    Клиент определяется по заголовку Authorization или сессии, поэтому
+    ключ вычисляется без обращения к базе данных.
+    """
+    credentials = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return 'replica_sticky:' + sha256(credentials.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """Включает чтение с реплик для безопасных запросов.
+
+    После записи клиент на REPLICA_STICKY_SECONDS секунд читает из
+    основной базы, чтобы видеть свои изменения несмотря на отставание
+    реплик. Для работы привязки между процессами нужен общий кеш.
+    Поддерживает асинхронную цепочку, чтобы асинхронные представления
+    в режиме ASGI не выполнялись в потоке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django определяет асинхронный вызываемый объект.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def should_check_sticky(self, request, sticky_key):
+        # Привязку проверяют только запросы, которые могут читать реплики.
+        return bool(sticky_key) and request.method in SAFE_METHODS
+
+    def get_state(self, request, sticky):
+        return {
+            'primary': request.method not in SAFE_METHODS or bool(sticky),
+            'replica': None,
+            'wrote': False,
+        }
+
+    def must_stick(self, request, sticky_key, state):
+        return sticky_key and (
+            state['wrote'] or request.method not in SAFE_METHODS
+        )
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        sticky_key = get_sticky_key(request)
+        state = self.get_state(
+            request,
+            self.should_check_sticky(request, sticky_key)
+            and cache.get(sticky_key)
+        )
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if self.must_stick(request, sticky_key, state):
+            cache.set(sticky_key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+        sticky_key = get_sticky_key(request)
+        state = self.get_state(
+            request,
+            self.should_check_sticky(request, sticky_key)
+            and await sync_to_async(cache.get)(sticky_key)
+        )
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if self.must_stick(request, sticky_key, state):
+            await sync_to_async(cache.set)(
+                sticky_key,
+                True,
+                settings.REPLICA_STICKY_SECONDS
+            )
+        return response
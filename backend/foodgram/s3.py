@@ -0,0 +1,212 @@
+import base64
+import hmac
+import json
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+
+import requests
+from django.conf import settings
+
+from foodgram.constants import S3_PRESIGN_EXPIRES, S3_REQUEST_TIMEOUT
+
+ALGORITHM = 'AWS4-HMAC-SHA256'
+XML_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+
+class S3Error(Exception):
+    """Ошибка обращения к S3-совместимому хранилищу."""
+
+
+def is_enabled():
+    """Проверяет, настроена ли прямая загрузка в хранилище."""
+    return bool(settings.S3_BUCKET and settings.S3_ENDPOINT)
+
+
+def quote_value(value, safe='~'):
+    return quote(value, safe=safe)
+
+
+def hmac_sha256(key, message):
+    return hmac.new(key, message.encode(), sha256).digest()
+
+
+def get_signing_key(secret_key, date, region):
+    key = hmac_sha256(f'AWS4{secret_key}'.encode(), date)
+    key = hmac_sha256(key, region)
+    key = hmac_sha256(key, 's3')
+    return hmac_sha256(key, 'aws4_request')
+
+
+def presign(method, url, expires=S3_PRESIGN_EXPIRES, headers=None,
+            params=None, now=None, access_key=None, secret_key=None,
+            region=None):
+    """Подписывает URL по AWS Signature Version 4 в параметрах запроса.
+
+    Заголовки из headers входят в подпись и должны быть отправлены с
+    запросом без изменений. params добавляются к параметрам запроса.
+    Тело запроса не подписывается.
+    """
+    access_key = access_key or settings.S3_ACCESS_KEY
+    secret_key = secret_key or settings.S3_SECRET_KEY
+    region = region or settings.S3_REGION
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+    date = now.strftime('%Y%m%d')
+    scope = f'{date}/{region}/s3/aws4_request'
+
+    parts = urlsplit(url)
+    signed = {'host': parts.netloc}
+    signed.update(
+        (name.lower(), str(value).strip())
+        for name, value in (headers or {}).items()
+    )
+    signed_headers = ';'.join(sorted(signed))
+    query = {
+        'X-Amz-Algorithm': ALGORITHM,
+        'X-Amz-Credential': f'{access_key}/{scope}',
+        'X-Amz-Date': amz_date,
+        'X-Amz-Expires': str(expires),
+        'X-Amz-SignedHeaders': signed_headers,
+        **(params or {}),
+    }
+    canonical_query = '&'.join(
+        f'{quote_value(name)}={quote_value(value)}'
+        for name, value in sorted(query.items())
+    )
+    canonical_request = '\n'.join((
+        method,
+        quote_value(parts.path or '/', safe='/~'),
+        canonical_query,
+        ''.join(f'{name}:{signed[name]}\n' for name in sorted(signed)),
+        signed_headers,
+        'UNSIGNED-PAYLOAD',
+    ))
+    string_to_sign = '\n'.join((
+        ALGORITHM,
+        amz_date,
+        scope,
+        sha256(canonical_request.encode()).hexdigest(),
+    ))
+    signature = hmac.new(
+        get_signing_key(secret_key, date, region),
+        string_to_sign.encode(),
+        sha256
+    ).hexdigest()
+    return (
+        f'{parts.scheme}://{parts.netloc}'
+        f'{quote_value(parts.path or "/", safe="/~")}'
+        f'?{canonical_query}&X-Amz-Signature={signature}'
+    )
+
+
+def get_object_url(key, endpoint=None):
+    """Адрес объекта в стиле path: <endpoint>/<bucket>/<key>."""
+    endpoint = (endpoint or settings.S3_ENDPOINT).rstrip('/')
+    return f'{endpoint}/{settings.S3_BUCKET}/{key}'
+
+
+def get_public_url(key):
+    """Адрес объекта для браузера, объекты читаются без подписи."""
+    return get_object_url(key, settings.S3_PUBLIC_ENDPOINT)
+
+
+def presign_upload(key, content_type, max_size, expires=S3_PRESIGN_EXPIRES,
+                   now=None):
+    """Возвращает адрес и поля формы для загрузки объекта клиентом.
+
+    Клиент отправляет POST multipart/form-data с полями fields и файлом
+    в последнем поле file. Подписанная политика ограничивает ключ, тип и
+    размер файла, поэтому хранилище само отклоняет загрузку больше
+    max_size байт.
+    """
+    now = now or datetime.now(timezone.utc)
+    date = now.strftime('%Y%m%d')
+    fields = {
+        'key': key,
+        'Content-Type': content_type,
+        'x-amz-algorithm': ALGORITHM,
+        'x-amz-credential': (
+            f'{settings.S3_ACCESS_KEY}/{date}/{settings.S3_REGION}'
+            '/s3/aws4_request'
+        ),
+        'x-amz-date': now.strftime('%Y%m%dT%H%M%SZ'),
+    }
+    policy = {
+        'expiration': (now + timedelta(seconds=expires)).strftime(
+            '%Y-%m-%dT%H:%M:%SZ'
+        ),
+        'conditions': [
+            {'bucket': settings.S3_BUCKET},
+            *({name: value} for name, value in fields.items()),
+            ['content-length-range', 1, max_size],
+        ],
+    }
+    fields['policy'] = base64.b64encode(
+        json.dumps(policy).encode()
+    ).decode()
+    fields['x-amz-signature'] = hmac.new(
+        get_signing_key(settings.S3_SECRET_KEY, date, settings.S3_REGION),
+        fields['policy'].encode(),
+        sha256
+    ).hexdigest()
+    url = f'{settings.S3_PUBLIC_ENDPOINT.rstrip("/")}/{settings.S3_BUCKET}'
+    return url, fields
+
+
+def request(method, url, params=None):
+    try:
+        response = requests.request(
+            method,
+            presign(method, url, params=params),
+            timeout=S3_REQUEST_TIMEOUT
+        )
+    except requests.RequestException as error:
+        raise S3Error(str(error)) from error
+    if response.status_code >= 500:
+        raise S3Error(f'{method} {url}: {response.status_code}')
+    return response
+
+
+def head_object(key):
+    """Возвращает заголовки объекта или None, если его нет."""
+    response = request('HEAD', get_object_url(key))
+    if response.status_code == 404:
+        return None
+    if response.status_code != 200:
+        raise S3Error(f'HEAD {key}: {response.status_code}')
+    return response.headers
+
+
+def delete_object(key):
+    response = request('DELETE', get_object_url(key))
+    if response.status_code not in (200, 204, 404):
+        raise S3Error(f'DELETE {key}: {response.status_code}')
+
+
+def iter_objects(prefix):
+    """Итерирует ключ, время изменения и размер объектов постранично."""
+    params = {'list-type': '2', 'prefix': prefix}
+    while True:
+        response = request(
+            'GET',
+            f'{settings.S3_ENDPOINT.rstrip("/")}/{settings.S3_BUCKET}',
+            params
+        )
+        if response.status_code != 200:
+            raise S3Error(f'LIST {prefix}: {response.status_code}')
+        root = ElementTree.fromstring(response.content)
+        for item in root.iter(f'{XML_NAMESPACE}Contents'):
+            yield (
+                item.findtext(f'{XML_NAMESPACE}Key'),
+                datetime.strptime(
+                    item.findtext(f'{XML_NAMESPACE}LastModified')[:19],
+                    '%Y-%m-%dT%H:%M:%S'
+                ).replace(tzinfo=timezone.utc).timestamp(),
+                int(item.findtext(f'{XML_NAMESPACE}Size') or 0)
+            )
+        token = root.findtext(f'{XML_NAMESPACE}NextContinuationToken')
+        if not token:
+            return
+        params['continuation-token'] = token
@@ -13,8 +13,15 @@ DEBUG = os.getenv('DEBUG') == 'False'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', default='127.0.0.1, localhost').split(', ')
 
+# При LAZY_ADMIN модули админки загружаются при первом обращении к
+# /admin/, а не при запуске каждого воркера.
+LAZY_ADMIN = os.getenv('LAZY_ADMIN', 'True') == 'True'
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    (
+        'django.contrib.admin.apps.SimpleAdminConfig' if LAZY_ADMIN
+        else 'django.contrib.admin'
+    ),
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -27,6 +34,7 @@ INSTALLED_APPS = [
     'api',
     'recipes',
     'users',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -35,6 +43,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'foodgram.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -44,7 +53,7 @@ ROOT_URLCONF = 'foodgram.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'foodgram' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -66,10 +75,128 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'password'),
         'HOST': os.getenv('POSTGRES_DB_HOST', ''),
-        'PORT': os.getenv('POSTGRES_DB_PORT', 5432)
+        'PORT': os.getenv('POSTGRES_DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', 60)),
     }
 }
 
+# Интервал в секундах, после которого постоянное соединение проверяется
+# перед обработкой запроса.
+DATABASE_HEALTH_CHECK_INTERVAL = int(
+    os.getenv('POSTGRES_HEALTH_CHECK_INTERVAL', 30)
+)
+
+# Пулер соединений (например, PgBouncer) в режиме transaction не сохраняет
+# серверные курсоры между транзакциями. Для основного соединения они
+# отключаются, а потоковые выгрузки идут через отдельное подключение
+# внутри транзакции.
+DATABASE_POOLER_MODE = os.getenv('POSTGRES_POOLER_MODE', '')
+STREAMING_DATABASE = 'streaming'
+
+if DATABASE_POOLER_MODE == 'transaction':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    DATABASES[STREAMING_DATABASE] = {
+        **DATABASES['default'],
+        'DISABLE_SERVER_SIDE_CURSORS': False,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Реплики для чтения задаются списком host[:port] через запятую.
+# Безопасные запросы читают со случайной реплики, отставание которой
+# не больше REPLICA_MAX_LAG_SECONDS. После записи клиент на
+# REPLICA_STICKY_SECONDS секунд привязывается к основной базе.
+REPLICA_DATABASES = []
+for index, address in enumerate(
+    filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')),
+    start=1
+):
+    host, _, port = address.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+REPLICA_STICKY_SECONDS = int(os.getenv('POSTGRES_REPLICA_STICKY_SECONDS', 5))
+REPLICA_MAX_LAG_SECONDS = float(
+    os.getenv('POSTGRES_REPLICA_MAX_LAG_SECONDS', 2)
+)
+REPLICA_LAG_CHECK_INTERVAL = 5
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+# Адреса memcached через запятую. Кеш общий для воркеров gunicorn и
+# run_workers: в нем хранятся версии инвалидации, блокировки пересчета,
+# токены и прогретые ответы. Значение locmem включает кеш в памяти
+# процесса, допустимый только при запуске одним процессом. Без адресов
+# кеш в памяти тоже включается, чтобы работали команды управления
+# (migrate, test, collectstatic), а серверы gunicorn и run_workers
+# в этом случае не запускаются.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+if CACHE_LOCATION in ('', 'locmem'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_LOCATION.split(','),
+            'OPTIONS': {
+                'no_delay': True,
+                'use_pooling': True,
+                'connect_timeout': 1,
+                'timeout': 1,
+            },
+        }
+    }
+
+# Канал LISTEN/NOTIFY для рассылки версий кешей между процессами.
+# Без него версии перечитываются из общего кеша.
+INVALIDATION_CHANNEL = os.getenv('INVALIDATION_CHANNEL', '')
+
+# S3-совместимое хранилище для прямой загрузки изображений клиентом.
+# Прямая загрузка включена, если заданы S3_ENDPOINT и S3_BUCKET.
+# S3_PUBLIC_ENDPOINT — адрес хранилища, доступный браузеру.
+S3_ENDPOINT = os.getenv('S3_ENDPOINT', '')
+S3_PUBLIC_ENDPOINT = os.getenv('S3_PUBLIC_ENDPOINT', S3_ENDPOINT)
+S3_BUCKET = os.getenv('S3_BUCKET', '')
+S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY', '')
+S3_SECRET_KEY = os.getenv('S3_SECRET_KEY', '')
+
+# Значения заголовка Host, для которых warm_caches строит ответы.
+# Абсолютные ссылки на изображения зависят от хоста, поэтому кеш
+# фрагментов рецептов ведется для каждого хоста отдельно. По умолчанию
+# используются ALLOWED_HOSTS.
+WARM_CACHES_HOSTS = list(
+    filter(None, os.getenv('WARM_CACHES_HOSTS', '').split(', '))
+)
+
+# В режиме JOBS_EAGER фоновые задачи выполняются сразу при постановке
+# в очередь, без воркеров run_workers.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+
+# Первый алгоритм списка основной: хеши других алгоритмов и с другим
+# числом итераций пересчитываются при успешном входе. Алгоритмы Argon2 и
+# bcrypt требуют библиотек argon2-cffi и bcrypt в requirements.txt.
+PASSWORD_HASHERS = os.getenv(
+    'PASSWORD_HASHERS',
+    'foodgram.hashers.OffloadedPBKDF2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher'
+).split(',')
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 260000))
+# Размер пула процессов хеширования в каждом воркере, 0 — хеширование в
+# потоке запроса.
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', 1))
+
+# В режиме asgi вход по паролю обрабатывает асинхронное представление.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -100,6 +227,9 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Файлы называются по хешу содержимого, одинаковые загрузки хранятся
+# одним файлом.
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentAddressedStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -107,7 +237,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -125,6 +255,7 @@ DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.UserGetSerializer',
         'user_create': 'api.serializers.UserCreateSerializer',
+        'token_create': 'api.serializers.TokenCreateSerializer',
         'current_user': 'api.serializers.UserGetSerializer',
     },
     'PERMISSIONS': {
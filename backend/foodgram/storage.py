@@ -0,0 +1,298 @@
+import os
+import tempfile
+from hashlib import sha256
+from time import time
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import FileField, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from foodgram import s3
+from foodgram.constants import (DIRECT_UPLOAD_PREFIX, JOB_LOW_PRIORITY,
+                                MEDIA_ORPHAN_GRACE)
+from foodgram.db import stream
+from jobs.queue import task
+
+# Префикс временных файлов, которые еще не получили имя по хешу.
+TEMP_PREFIX = '.upload-'
+
+
+def is_direct_upload(name):
+    return bool(name) and name.startswith(DIRECT_UPLOAD_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по хешу содержимого.
+
+    Файл сохраняется в каталоге upload_to поля под именем
+    ab/cd/<sha256>.<расширение>, поэтому одинаковые загрузки дают один
+    файл, а каталоги остаются небольшими. Содержимое файла по имени
+    никогда не меняется.
+
+    Имена с префиксом DIRECT_UPLOAD_PREFIX указывают на объекты
+    S3-совместимого хранилища, которые клиент загрузил напрямую.
+    """
+
+    def url(self, name):
+        if is_direct_upload(name):
+            return s3.get_public_url(name)
+        return super().url(name)
+
+    def exists(self, name):
+        if is_direct_upload(name):
+            return s3.head_object(name) is not None
+        return super().exists(name)
+
+    def delete(self, name):
+        if is_direct_upload(name):
+            s3.delete_object(name)
+        else:
+            super().delete(name)
+
+    def get_hashed_name(self, name, content):
+        digest = sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(
+            directory,
+            digest[:2],
+            digest[2:4],
+            f'{digest}{extension}'
+        ).replace('\\', '/')
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым, одинаковое имя означает тот же
+        # файл, поэтому суффикс не добавляется.
+        return name
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return super().save(
+            self.get_hashed_name(name, content),
+            content,
+            max_length
+        )
+
+    def _save(self, name, content):
+        """Записывает файл атомарно или переиспользует существующий.
+
+        Время изменения существующего файла обновляется, чтобы сборщик
+        мусора не удалил его до фиксации ссылающейся записи.
+        """
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.utime(full_path)
+            return name
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            # Одновременная загрузка того же содержимого заменит файл
+            # идентичным.
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return name
+
+
+def get_tracked_fields():
+    """Возвращает пары (модель, поле) для файлов по хешу содержимого."""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.local_concrete_fields
+        if isinstance(field, FileField)
+        and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def get_reference_counts(names):
+    """Считает записи, ссылающиеся на каждый из файлов.
+
+    Одинаковые загрузки хранятся одним файлом, поэтому файл можно
+    удалить только когда на него не ссылается ни одна запись.
+    """
+    counts = dict.fromkeys(names, 0)
+    for model, field in get_tracked_fields():
+        for name in model._default_manager.filter(
+            **{f'{field.attname}__in': counts}
+        ).values_list(field.attname, flat=True):
+            counts[name] += 1
+    return counts
+
+
+def iter_referenced_names():
+    """Итерирует имена файлов из всех отслеживаемых полей."""
+    for model, field in get_tracked_fields():
+        yield from stream(
+            model._default_manager.exclude(
+                Q(**{f'{field.attname}__isnull': True})
+                | Q(**{field.attname: ''})
+            ).values_list(field.attname, flat=True).order_by()
+        )
+
+
+def is_expired(path, now):
+    """Проверяет, что файл не менялся дольше MEDIA_ORPHAN_GRACE секунд.
+
+    Свежие файлы могут принадлежать еще не зафиксированным записям.
+    """
+    try:
+        return now - os.path.getmtime(path) > MEDIA_ORPHAN_GRACE
+    except FileNotFoundError:
+        return False
+
+
+@task(priority=JOB_LOW_PRIORITY)
+def release_files(names):
+    """Удаляет файлы, на которые больше не ссылается ни одна запись."""
+    now = time()
+    for name, count in get_reference_counts(set(names)).items():
+        if count:
+            continue
+        # Ключ прямой загрузки выдается на одну загрузку и не
+        # переиспользуется другими записями.
+        if is_direct_upload(name) or is_expired(
+            default_storage.path(name),
+            now
+        ):
+            default_storage.delete(name)
+
+
+def iter_files(directory, prune=True):
+    """Обходит каталог, не загружая список файлов целиком.
+
+    Возвращает DirEntry файлов. С prune опустевшие после обхода
+    подкаталоги удаляются.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path, prune)
+                if not prune:
+                    continue
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    # В каталоге остались файлы.
+                    pass
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def collect_orphans(dry_run=False):
+    """Удаляет файлы каталогов upload_to, на которые нет ссылок.
+
+    Ссылки читаются из базы потоково, файлы обходятся без построения
+    списка, объекты прямой загрузки читаются из хранилища постранично.
+    Возвращает число и суммарный размер найденных сирот.
+    """
+    referenced = set(iter_referenced_names())
+    directories = {
+        default_storage.path(str(field.upload_to).split('%')[0])
+        for _, field in get_tracked_fields()
+        if isinstance(field.upload_to, str)
+    }
+    now = time()
+    count = size = 0
+    for directory in sorted(directories):
+        if not os.path.isdir(directory):
+            continue
+        for entry in iter_files(directory, prune=not dry_run):
+            name = os.path.relpath(
+                entry.path,
+                default_storage.location
+            ).replace('\\', '/')
+            if name in referenced or not is_expired(entry.path, now):
+                continue
+            count += 1
+            size += entry.stat(follow_symlinks=False).st_size
+            if not dry_run:
+                os.remove(entry.path)
+
+    if s3.is_enabled():
+        # Загрузки, ключ которых клиент так и не передал в API.
+        for key, modified, object_size in s3.iter_objects(
+            DIRECT_UPLOAD_PREFIX
+        ):
+            if key in referenced or now - modified <= MEDIA_ORPHAN_GRACE:
+                continue
+            count += 1
+            size += object_size
+            if not dry_run:
+                s3.delete_object(key)
+    return count, size
+
+
+def remember_files(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежние файлы объекта перед сохранением."""
+    if instance._state.adding:
+        return
+    attnames = [
+        field.attname for model, field in get_tracked_fields()
+        if model is sender
+        and (update_fields is None or field.name in update_fields)
+    ]
+    if attnames:
+        instance._previous_files = sender._default_manager.filter(
+            pk=instance.pk
+        ).values(*attnames).first() or {}
+
+
+def release_replaced_files(sender, instance, **kwargs):
+    """Освобождает файлы, замененные при сохранении объекта."""
+    previous = instance.__dict__.pop('_previous_files', {})
+    names = [
+        name for attname, name in previous.items()
+        if name and name != getattr(instance, attname).name
+    ]
+    if names:
+        transaction.on_commit(lambda: release_files.delay(names))
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    """Освобождает файлы удаленного объекта."""
+    names = [
+        getattr(instance, field.attname).name
+        for model, field in get_tracked_fields()
+        if model is sender and getattr(instance, field.attname)
+    ]
+    if names:
+        transaction.on_commit(lambda: release_files.delay(names))
+
+
+def connect_signals():
+    """Подключает освобождение файлов при замене и удалении."""
+    for model in {model for model, _ in get_tracked_fields()}:
+        label = model._meta.label
+        pre_save.connect(
+            remember_files,
+            sender=model,
+            dispatch_uid=f'storage_remember_{label}'
+        )
+        post_save.connect(
+            release_replaced_files,
+            sender=model,
+            dispatch_uid=f'storage_release_{label}'
+        )
+        post_delete.connect(
+            release_deleted_files,
+            sender=model,
+            dispatch_uid=f'storage_release_deleted_{label}'
+        )
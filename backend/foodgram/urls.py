@@ -1,15 +1,29 @@
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib import admin
-from django.urls import include, path
+from django.urls import URLResolver, include, path
+from django.urls.resolvers import RoutePattern
 
 from recipes.views import get_short_link
 
+if settings.LAZY_ADMIN:
+    # Модуль с адресами админки импортируется при первом разрешении
+    # адреса внутри /admin/.
+    admin_urls = URLResolver(
+        RoutePattern('admin/'),
+        'foodgram.admin_urls',
+        app_name='admin',
+        namespace='admin'
+    )
+else:
+    from django.contrib import admin
+
+    admin_urls = path('admin/', admin.site.urls)
+
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    admin_urls,
     path('api/', include('api.urls')),
-    path('s/<int:pk>/', get_short_link, name='get_short_link')
+    path('s/<str:code>/', get_short_link, name='get_short_link')
 ]
 
 if settings.DEBUG:
@@ -2,6 +2,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from foodgram.invalidation import check_shared_cache
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+# Версии инвалидации должны быть видны всем воркерам сервера.
+check_shared_cache()
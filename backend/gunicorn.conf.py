@@ -0,0 +1,45 @@
+import gc
+import os
+
+# Режим запуска: wsgi — синхронные воркеры, asgi — воркеры uvicorn.
+# В режиме asgi тело запроса принимается и ответ отправляется
+# асинхронно, поэтому медленные клиенты не занимают воркер целиком.
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+# Приложение загружается один раз в мастере до fork: воркеры стартуют
+# быстрее и делят страницы памяти с загруженным кодом.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+if server_mode == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def when_ready(server):
+    """Переносит объекты загруженного приложения в постоянное поколение.
+
+    Сборщик мусора не обходит их в воркерах и не трогает их счетчики,
+    поэтому страницы памяти после fork остаются общими.
+    """
+    if preload_app:
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    """Закрывает соединения мастера, чтобы воркеры не унаследовали их."""
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    """Прогревает воркер после fork, когда приложение уже загружено."""
+    from api.warmup import warm_worker
+
+    warm_worker()
@@ -0,0 +1,43 @@
+from django.contrib import admin
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Просмотр фоновых задач."""
+
+    list_display = (
+        'id',
+        'name',
+        'status',
+        'priority',
+        'attempts',
+        'run_at',
+        'created_at'
+    )
+    list_display_links = ('name',)
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('locked_at', 'created_at', 'last_error')
+    actions = ('retry',)
+
+    @admin.action(description='Повторить')
+    def retry(self, request, queryset):
+        """Возвращает задачи в очередь с новым набором попыток."""
+        retried = 0
+        for job in queryset.exclude(status=Job.QUEUED):
+            job.status = Job.QUEUED
+            job.attempts = 0
+            job.run_at = timezone.now()
+            job.locked_at = None
+            try:
+                with transaction.atomic():
+                    job.save()
+            except IntegrityError:
+                # Задача с тем же ключом уже в очереди.
+                continue
+            retried += 1
+        self.message_user(request, f'Возвращено в очередь: {retried}.')
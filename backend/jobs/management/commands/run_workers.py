@@ -0,0 +1,104 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from foodgram.constants import JOB_POLL_INTERVAL, JOB_WORKER_THREADS
+from foodgram.invalidation import check_shared_cache
+from jobs.queue import work
+
+
+def run_threads(threads, poll_interval, once):
+    """Запускает потоки воркеров и ждет их завершения.
+
+    SIGTERM и SIGINT останавливают потоки после текущей задачи.
+    """
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    workers = [
+        threading.Thread(
+            target=work,
+            args=(stop, poll_interval, once),
+            name=f'job-worker-{number}'
+        )
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+class Command(BaseCommand):
+    """Команда запуска воркеров фоновой очереди."""
+
+    help = 'Выполняет задачи фоновой очереди в пуле процессов и потоков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Количество процессов'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=JOB_WORKER_THREADS,
+            help='Количество потоков в каждом процессе'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=JOB_POLL_INTERVAL,
+            help='Пауза между проверками пустой очереди, с'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        threads = options['threads']
+        if processes < 1 or threads < 1:
+            raise CommandError(
+                'Количество процессов и потоков должно быть больше нуля.'
+            )
+        check_shared_cache()
+        worker_args = (threads, options['poll_interval'], options['once'])
+        self.stdout.write(
+            f'Воркеры запущены: процессов {processes}, '
+            f'потоков в процессе {threads}.'
+        )
+        if processes == 1:
+            run_threads(*worker_args)
+        else:
+            self.run_processes(processes, worker_args)
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены.'))
+
+    def run_processes(self, processes, worker_args):
+        """Запускает процессы воркеров и передает им сигналы остановки."""
+        # Соединения с базой не должны наследоваться дочерними процессами.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(target=run_threads, args=worker_args)
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+
+        def stop(*args):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, stop)
+        for child in children:
+            child.join()
@@ -0,0 +1,99 @@
+from django.db import models
+from django.utils import timezone
+
+from foodgram.constants import (JOB_DEFAULT_PRIORITY, JOB_MAX_ATTEMPTS,
+                                MAX_LENGTH_JOB_KEY, MAX_LENGTH_JOB_NAME,
+                                MAX_LENGTH_JOB_STATUS)
+
+
+class Job(models.Model):
+    """Модель задачи фоновой очереди.
+
+    Выполненные задачи удаляются, в таблице остаются ожидающие,
+    выполняемые и исчерпавшие попытки.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=MAX_LENGTH_JOB_NAME,
+        verbose_name='Задача'
+    )
+    args = models.JSONField(
+        default=list,
+        verbose_name='Позиционные аргументы'
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        verbose_name='Именованные аргументы'
+    )
+    key = models.CharField(
+        max_length=MAX_LENGTH_JOB_KEY,
+        null=True,
+        blank=True,
+        verbose_name='Ключ',
+        help_text='В очереди может быть только одна задача с этим ключом'
+    )
+    priority = models.SmallIntegerField(
+        default=JOB_DEFAULT_PRIORITY,
+        verbose_name='Приоритет'
+    )
+    status = models.CharField(
+        max_length=MAX_LENGTH_JOB_STATUS,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=JOB_MAX_ATTEMPTS,
+        verbose_name='Максимум попыток'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Выполнить после'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята воркером'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+
+    class Meta:
+        ordering = ('-priority', 'run_at', 'id')
+        indexes = [
+            models.Index(
+                fields=('status', '-priority', 'run_at'),
+                name='job_fetch_idx'
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(status='queued'),
+                name='unique_queued_job_key'
+            )
+        ]
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
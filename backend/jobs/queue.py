@@ -0,0 +1,182 @@
+import json
+import traceback
+from datetime import timedelta
+from functools import update_wrapper
+from random import uniform
+
+from django.conf import settings
+from django.db import (DatabaseError, IntegrityError, close_old_connections,
+                       connections, transaction)
+from django.db.models import F, Q
+from django.utils import timezone
+
+from foodgram.constants import (JOB_DEFAULT_PRIORITY, JOB_LOCK_TIMEOUT,
+                                JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_DELAY,
+                                JOB_RETRY_MAX_DELAY)
+from jobs.models import Job
+
+TASKS = {}
+
+
+class Task:
+    """Функция, которую воркеры run_workers выполняют в фоне."""
+
+    def __init__(self, func, priority, max_attempts):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Ставит задачу в очередь с указанными аргументами."""
+        return self.schedule(args, kwargs)
+
+    def schedule(self, args=(), kwargs=None, key=None, countdown=0,
+                 priority=None):
+        """Ставит задачу в очередь.
+
+        Пока в очереди есть задача с тем же key, новая не добавляется.
+        countdown откладывает выполнение на указанное число секунд.
+        Аргументы должны сериализоваться в JSON. В режиме JOBS_EAGER
+        задача выполняется сразу.
+        """
+        args = json.loads(json.dumps(list(args)))
+        kwargs = json.loads(json.dumps(kwargs or {}))
+        if settings.JOBS_EAGER:
+            self.func(*args, **kwargs)
+            return
+        Job.objects.bulk_create(
+            [
+                Job(
+                    name=self.name,
+                    args=args,
+                    kwargs=kwargs,
+                    key=key,
+                    priority=(
+                        self.priority if priority is None else priority
+                    ),
+                    max_attempts=self.max_attempts,
+                    run_at=timezone.now() + timedelta(seconds=countdown)
+                )
+            ],
+            ignore_conflicts=key is not None
+        )
+
+
+def task(priority=JOB_DEFAULT_PRIORITY, max_attempts=JOB_MAX_ATTEMPTS):
+    """Регистрирует функцию как фоновую задачу.
+
+    Задачи объявляются в модулях tasks.py приложений.
+    """
+    def decorator(func):
+        registered = Task(func, priority, max_attempts)
+        TASKS[registered.name] = registered
+        return registered
+
+    return decorator
+
+
+def get_retry_delay(attempts):
+    """Экспоненциальная задержка повтора со случайным разбросом."""
+    delay = min(JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+                JOB_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * uniform(0.5, 1.5))
+
+
+def fetch_job():
+    """Забирает из очереди готовую задачу с наибольшим приоритетом.
+
+    На PostgreSQL строки, заблокированные другими воркерами,
+    пропускаются через SELECT ... FOR UPDATE SKIP LOCKED. Захват
+    дополнительно проверяется по числу попыток, чтобы на базах без
+    блокировок строк задачу не взяли два воркера.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(
+                status=Job.RUNNING,
+                locked_at__lt=now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+            )
+        ).first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(
+            pk=job.pk,
+            attempts=job.attempts
+        ).update(
+            status=Job.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+    if not claimed:
+        return None
+    job.status = Job.RUNNING
+    job.locked_at = now
+    job.attempts += 1
+    return job
+
+
+def fail_job(job, error):
+    """Планирует повтор задачи или помечает ее как исчерпавшую попытки."""
+    if job.attempts >= job.max_attempts:
+        fields = {'status': Job.FAILED}
+    else:
+        fields = {
+            'status': Job.QUEUED,
+            'run_at': timezone.now() + get_retry_delay(job.attempts),
+        }
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                locked_at=None,
+                last_error=error,
+                **fields
+            )
+    except IntegrityError:
+        # В очереди уже есть задача с тем же ключом, она и выполнит работу.
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def run_job(job):
+    """Выполняет задачу и удаляет ее или планирует повтор."""
+    try:
+        registered = TASKS.get(job.name)
+        if registered is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована.')
+        registered.func(*job.args, **job.kwargs)
+    except Exception:
+        fail_job(job, traceback.format_exc())
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def work(stop, poll_interval, once=False):
+    """Выполняет задачи в текущем потоке, пока не установлен stop.
+
+    С once поток завершается, когда в очереди не остается готовых
+    задач.
+    """
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                job = fetch_job()
+            except DatabaseError:
+                connections.close_all()
+                stop.wait(poll_interval)
+                continue
+            if job is not None:
+                run_job(job)
+            elif once:
+                return
+            else:
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
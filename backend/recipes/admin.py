@@ -1,11 +1,22 @@
+import io
+
 from django import forms
 from django.contrib import admin, messages
-from django.http import HttpResponseRedirect
-from django.urls import reverse
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 
+from foodgram.admin import AutocompleteFilter, EstimatedCountPaginator
+from foodgram.constants import INLINE_EXTRA_VALUE
+from recipes.catalog import (CONTENT_TYPES, CatalogError, dump_records,
+                             export_records, get_file_format, import_records,
+                             load_records)
+from recipes.matching import ingredient_index
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
-from foodgram.constants import INLINE_EXTRA_VALUE
+from recipes.tasks import schedule_search_index_update
 
 
 class RecipeIngredientsInLine(admin.TabularInline):
@@ -13,6 +24,7 @@ class RecipeIngredientsInLine(admin.TabularInline):
 
     model = RecipeIngredient
     extra = INLINE_EXTRA_VALUE
+    autocomplete_fields = ('ingredient', 'recipe')
 
     def get_formset(self, request, obj=None, **kwargs):
         """Формсет для проверки ингредиентов рецепта."""
@@ -44,22 +56,126 @@ class RecipeIngredientsInLine(admin.TabularInline):
         return formset
 
 
-class ShoppingCartInline(admin.StackedInline):
+class UserRecipeInline(admin.StackedInline):
+    """Базовый инлайн связей пользователя с рецептом."""
+
+    autocomplete_fields = ('user',)
+
+    def get_queryset(self, request):
+        """Загрузка пользователей и рецептов одним запросом."""
+        return super().get_queryset(request).select_related('user', 'recipe')
+
+
+class ShoppingCartInline(UserRecipeInline):
     """Управление списком покупок."""
 
     model = ShoppingCart
 
 
-class FavoriteInline(admin.StackedInline):
+class FavoriteInline(UserRecipeInline):
     """Управление избранными рецептами."""
 
     model = Favorite
 
 
+class CatalogImportForm(forms.Form):
+    """Форма загрузки файла справочника."""
+
+    file = forms.FileField(label='Файл CSV или JSON Lines')
+
+    def clean_file(self):
+        """Проверка расширения файла."""
+        file = self.cleaned_data['file']
+        try:
+            get_file_format(file.name)
+        except CatalogError as error:
+            raise forms.ValidationError(str(error))
+        return file
+
+
+class CatalogAdminMixin:
+    """Миксин выгрузки и загрузки справочника в CSV и JSON Lines."""
+
+    catalog_entity = None
+    change_list_template = 'admin/catalog_change_list.html'
+    actions = ('export_csv', 'export_jsonl')
+
+    def export(self, queryset, file_format):
+        """Потоковая выгрузка выбранных записей."""
+        queryset = self.model.objects.filter(pk__in=queryset.values('pk'))
+        response = StreamingHttpResponse(
+            dump_records(
+                export_records(self.catalog_entity, queryset),
+                self.catalog_entity,
+                file_format
+            ),
+            content_type=CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={self.catalog_entity}.{file_format}'
+        )
+        return response
+
+    @admin.action(description='Выгрузить в CSV')
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv')
+
+    @admin.action(description='Выгрузить в JSON Lines')
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, 'jsonl')
+
+    def get_urls(self):
+        """Добавление страницы загрузки файла."""
+        opts = self.model._meta
+        return [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_view),
+                name=f'{opts.app_label}_{opts.model_name}_import'
+            ),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Загрузка справочника из файла."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        opts = self.model._meta
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            result = import_records(
+                self.catalog_entity,
+                load_records(
+                    lines,
+                    self.catalog_entity,
+                    get_file_format(upload.name)
+                )
+            )
+            self.message_user(request, f'Импорт завершен: {result}.')
+            for number, error in result.errors:
+                self.message_user(
+                    request,
+                    f'Строка {number}: {error}',
+                    level=messages.WARNING
+                )
+            return HttpResponseRedirect(
+                reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+            )
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': opts,
+            'form': form,
+            'title': f'Загрузка: {opts.verbose_name_plural}',
+        }
+        return TemplateResponse(request, 'admin/catalog_import.html', context)
+
+
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(CatalogAdminMixin, admin.ModelAdmin):
     """Управление ингредиентами."""
 
+    catalog_entity = 'ingredients'
     inlines = (
         RecipeIngredientsInLine,
     )
@@ -82,6 +198,10 @@ class IngredientAdmin(admin.ModelAdmin):
             )
             return
         super().save_model(request, obj, form, change)
+        if change and 'name' in form.changed_data:
+            schedule_search_index_update(
+                obj.recipes.values_list('id', flat=True)
+            )
 
     def response_add(self, request, obj):
         """Перенаправление на форму создания ингредиента."""
@@ -102,9 +222,10 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(CatalogAdminMixin, admin.ModelAdmin):
     """Управление тегами."""
 
+    catalog_entity = 'tags'
     list_display = (
         'id',
         'name',
@@ -115,9 +236,10 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(CatalogAdminMixin, admin.ModelAdmin):
     """Управление рецептами."""
 
+    catalog_entity = 'recipes'
     inlines = (
         RecipeIngredientsInLine,
         FavoriteInline,
@@ -130,6 +252,10 @@ class RecipeAdmin(admin.ModelAdmin):
         'in_favorite'
     )
     list_display_links = ('name',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fields = (
         'name',
         'author',
@@ -141,12 +267,31 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'author__username'
     )
-    list_filter = ('tags',)
-
-    @admin.display(description='Добавлено в избранное')
+    list_filter = (
+        'tags',
+        ('author', AutocompleteFilter)
+    )
+    Media = AutocompleteFilter.Media
+
+    def get_queryset(self, request):
+        """Подсчет добавлений в избранное одним запросом."""
+        return super().get_queryset(request).annotate(
+            favorites_count=Count('favorites')
+        )
+
+    def save_related(self, request, form, formsets, change):
+        """Обновление поискового индекса после сохранения ингредиентов."""
+        super().save_related(request, form, formsets, change)
+        schedule_search_index_update([form.instance.id])
+        ingredient_index.update([form.instance.id])
+
+    @admin.display(
+        description='Добавлено в избранное',
+        ordering='favorites_count'
+    )
     def in_favorite(self, obj):
         """Отображение кол-ва пользователей, добавивших рецепт в избранное."""
-        return f'{obj.favorites.count()} пользоват.'
+        return f'{obj.favorites_count} пользоват.'
 
 
 class AuthorRecipeAdminMixin:
@@ -161,7 +306,12 @@ class AuthorRecipeAdminMixin:
         'user__username',
         'recipe__name'
     )
-    list_filter = ('user',)
+    list_filter = (('user', AutocompleteFilter),)
+    Media = AutocompleteFilter.Media
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
     def check_recipe(self, obj):
@@ -1,7 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from recipes.models import Recipe
+        from recipes.tasks import deliver_new_recipe
+
+        post_save.connect(
+            deliver_new_recipe,
+            sender=Recipe,
+            dispatch_uid='deliver_new_recipe'
+        )
@@ -0,0 +1,499 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from foodgram.constants import (CATALOG_BATCH_SIZE, MAX_LENGTH_CHARFIELD_NAME,
+                                MAX_LENGTH_INGREDIENT_NAME,
+                                MAX_LENGTH_MEASUREMENT_UNIT,
+                                MAX_LENGTH_RECIPE_NAME, MAX_LENGTH_TAG_NAME,
+                                MAX_LENGTH_TAG_SLUG, MAX_VALUE_COOKING_TIME,
+                                MIN_VALUE_COOKING_TIME,
+                                MIN_VALUE_INGREDIENT_AMOUNT)
+from foodgram.db import stream
+from foodgram.invalidation import record_change
+from foodgram.storage import release_files
+from recipes.matching import ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import update_search_index
+from recipes.tasks import deliver_recipes, schedule_similarities_rebuild
+from users.models import User
+
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+FIELDS = {
+    'tags': ('name', 'slug'),
+    'ingredients': ('name', 'measurement_unit'),
+    'recipes': (
+        'author',
+        'name',
+        'text',
+        'cooking_time',
+        'image',
+        'tags',
+        'ingredients'
+    ),
+}
+MODELS = {
+    'tags': Tag,
+    'ingredients': Ingredient,
+    'recipes': Recipe,
+}
+
+
+class CatalogError(ValueError):
+    """Ошибка в записи импортируемого файла."""
+
+
+class ImportResult:
+    """Итоги импорта: число обработанных записей и ошибки по строкам."""
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def __str__(self):
+        return (
+            f'обработано {self.processed}, создано {self.created}, '
+            f'обновлено {self.updated}, ошибок {len(self.errors)}'
+        )
+
+
+def chunked(iterable, size):
+    """Разбивает итератор на списки длиной не больше size."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_file_format(file_name):
+    """Определяет формат файла по расширению."""
+    for extension, file_format in FORMATS.items():
+        if file_name.lower().endswith(extension):
+            return file_format
+    raise CatalogError(
+        f'Неизвестный формат файла "{file_name}", '
+        f'ожидается {", ".join(FORMATS)}.'
+    )
+
+
+def export_recipes(queryset, batch_size=CATALOG_BATCH_SIZE):
+    """Выгружает рецепты с тегами и ингредиентами.
+
+    Вложенные данные загружаются двумя запросами на каждую пачку.
+    """
+    recipes = stream(queryset.order_by('id').values_list(
+        'id',
+        'author__username',
+        'name',
+        'text',
+        'cooking_time',
+        'image'
+    ))
+    for chunk in chunked(recipes, batch_size):
+        recipe_ids = [row[0] for row in chunk]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list(
+            'recipe_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount'
+        ):
+            ingredients[recipe_id].append({
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+        for recipe_id, author, name, text, cooking_time, image in chunk:
+            yield {
+                'author': author,
+                'name': name,
+                'text': text,
+                'cooking_time': cooking_time,
+                'image': image,
+                'tags': tags[recipe_id],
+                'ingredients': ingredients[recipe_id],
+            }
+
+
+def export_records(entity, queryset=None):
+    """Выгружает записи справочника в виде словарей."""
+    if queryset is None:
+        queryset = MODELS[entity].objects.all()
+    if entity == 'recipes':
+        return export_recipes(queryset)
+    return stream(queryset.order_by('id').values(*FIELDS[entity]))
+
+
+def dump_records(records, entity, file_format):
+    """Построчно сериализует записи в CSV или JSON Lines."""
+    if file_format == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS[entity])
+    writer.writeheader()
+    for record in records:
+        if entity == 'recipes':
+            record = {
+                **record,
+                'tags': ','.join(record['tags']),
+                'ingredients': json.dumps(
+                    record['ingredients'],
+                    ensure_ascii=False
+                ),
+            }
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def load_records(lines, entity, file_format):
+    """Читает строки файла, возвращая пары (номер строки, запись).
+
+    Строка заголовка CSV необязательна. Записи JSON Lines не разбираются
+    здесь, чтобы ошибка в одной строке не прерывала чтение файла.
+    """
+    if file_format == 'jsonl':
+        for number, line in enumerate(lines, start=1):
+            if line.strip():
+                yield number, line
+        return
+    fields = FIELDS[entity]
+    reader = csv.DictReader(lines, fieldnames=fields)
+    for record in reader:
+        if tuple(record.get(field) for field in fields) == fields:
+            continue
+        yield reader.line_num, record
+
+
+def get_text(record, field, max_length=None):
+    """Возвращает непустое строковое поле записи."""
+    value = record.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise CatalogError(f'Поле "{field}" должно быть непустой строкой.')
+    value = value.strip()
+    if max_length is not None and len(value) > max_length:
+        raise CatalogError(
+            f'Поле "{field}" длиннее {max_length} символов.'
+        )
+    return value
+
+
+def get_number(record, field, min_value, max_value=None):
+    """Возвращает целое поле записи в допустимом диапазоне."""
+    try:
+        value = int(record.get(field))
+    except (TypeError, ValueError):
+        raise CatalogError(f'Поле "{field}" должно быть целым числом.')
+    if value < min_value or (max_value is not None and value > max_value):
+        raise CatalogError(f'Недопустимое значение поля "{field}": {value}.')
+    return value
+
+
+def clean_tag(record):
+    """Проверяет запись тега."""
+    return {
+        'name': get_text(record, 'name', MAX_LENGTH_TAG_NAME),
+        'slug': get_text(record, 'slug', MAX_LENGTH_TAG_SLUG),
+    }
+
+
+def clean_ingredient(record):
+    """Проверяет запись ингредиента."""
+    return {
+        'name': get_text(record, 'name', MAX_LENGTH_INGREDIENT_NAME),
+        'measurement_unit': get_text(
+            record,
+            'measurement_unit',
+            MAX_LENGTH_MEASUREMENT_UNIT
+        ),
+    }
+
+
+def clean_recipe(record):
+    """Проверяет запись рецепта и приводит вложенные поля CSV к спискам."""
+    tags = record.get('tags') or []
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    ingredients = record.get('ingredients') or []
+    if isinstance(ingredients, str):
+        try:
+            ingredients = json.loads(ingredients)
+        except ValueError:
+            raise CatalogError('Поле "ingredients" должно содержать JSON.')
+    if not isinstance(tags, list) or not isinstance(ingredients, list):
+        raise CatalogError('Поля "tags" и "ingredients" должны быть списками.')
+    cleaned_ingredients = {}
+    for ingredient in ingredients:
+        if not isinstance(ingredient, dict):
+            raise CatalogError('Ингредиент должен быть объектом.')
+        key = tuple(clean_ingredient(ingredient).values())
+        if key in cleaned_ingredients:
+            raise CatalogError(f'Ингредиент "{key[0]}" указан дважды.')
+        cleaned_ingredients[key] = get_number(
+            ingredient,
+            'amount',
+            MIN_VALUE_INGREDIENT_AMOUNT
+        )
+    if not cleaned_ingredients:
+        raise CatalogError('Рецепт должен содержать хотя бы один ингредиент.')
+    return {
+        'author': get_text(record, 'author', MAX_LENGTH_CHARFIELD_NAME),
+        'name': get_text(record, 'name', MAX_LENGTH_RECIPE_NAME),
+        'text': get_text(record, 'text'),
+        'cooking_time': get_number(
+            record,
+            'cooking_time',
+            MIN_VALUE_COOKING_TIME,
+            MAX_VALUE_COOKING_TIME
+        ),
+        'image': get_text(record, 'image'),
+        'tags': {slug.strip() for slug in tags if slug.strip()},
+        'ingredients': cleaned_ingredients,
+    }
+
+
+def get_tag_keys(records):
+    """Возвращает слаги тегов пачки, уже сохраненные в базе."""
+    return set(Tag.objects.filter(
+        slug__in={record['slug'] for _, record in records}
+    ).values_list('slug', flat=True))
+
+
+def get_ingredient_keys(records):
+    """Возвращает пары (название, единица) ингредиентов пачки из базы."""
+    keys = {tuple(record.values()) for _, record in records}
+    return keys & set(Ingredient.objects.filter(
+        name__in={name for name, _ in keys}
+    ).values_list('name', 'measurement_unit'))
+
+
+def save_tags(records, result):
+    """Создает недостающие теги, существующие слаги пропускаются."""
+    existing = get_tag_keys(records)
+    Tag.objects.bulk_create(
+        [Tag(**record) for _, record in records],
+        ignore_conflicts=True
+    )
+    # bulk_create не отправляет сигналы, версия справочника
+    # обновляется явно.
+    record_change('tag')
+    # С ignore_conflicts число вставленных строк неизвестно, созданные
+    # определяются сравнением ключей до и после вставки.
+    result.processed += len(records)
+    result.created += len(get_tag_keys(records) - existing)
+
+
+def save_ingredients(records, result):
+    """Создает недостающие ингредиенты."""
+    existing = get_ingredient_keys(records)
+    Ingredient.objects.bulk_create(
+        [Ingredient(**record) for _, record in records],
+        ignore_conflicts=True
+    )
+    record_change('ingredient')
+    result.processed += len(records)
+    result.created += len(get_ingredient_keys(records) - existing)
+
+
+def get_ingredient_ids(keys):
+    """Возвращает id ингредиентов по (название, единица), создавая новые."""
+    def find(names):
+        return {
+            (name, unit): pk for pk, name, unit in Ingredient.objects.filter(
+                name__in=names
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+
+    ingredient_ids = find({name for name, _ in keys})
+    missing = keys - ingredient_ids.keys()
+    if missing:
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in missing
+            ],
+            ignore_conflicts=True
+        )
+        record_change('ingredient')
+        ingredient_ids.update(find({name for name, _ in missing}))
+    return ingredient_ids
+
+
+def get_recipe_ids(keys):
+    """Возвращает id рецептов по паре (id автора, название)."""
+    return {
+        (author_id, name): pk for pk, author_id, name in Recipe.objects.filter(
+            author_id__in={author_id for author_id, _ in keys},
+            name__in={name for _, name in keys}
+        ).order_by('id').values_list('id', 'author_id', 'name')
+        if (author_id, name) in keys
+    }
+
+
+def save_recipes(records, result):
+    """Создает или обновляет рецепты пачки.
+
+    Рецепт определяется автором и названием. Теги должны существовать,
+    недостающие ингредиенты создаются. Теги и ингредиенты обновляемых
+    рецептов заменяются целиком.
+    """
+    authors = dict(User.objects.filter(
+        username__in={record['author'] for _, record in records}
+    ).values_list('username', 'id'))
+    tags = dict(Tag.objects.filter(
+        slug__in={slug for _, record in records for slug in record['tags']}
+    ).values_list('slug', 'id'))
+    ingredient_ids = get_ingredient_ids({
+        key for _, record in records for key in record['ingredients']
+    })
+
+    valid = {}
+    for number, record in records:
+        if record['author'] not in authors:
+            result.errors.append(
+                (number, f'Автор "{record["author"]}" не найден.')
+            )
+            continue
+        unknown_tags = record['tags'] - tags.keys()
+        if unknown_tags:
+            unknown_tags = ', '.join(sorted(unknown_tags))
+            result.errors.append((number, f'Теги не найдены: {unknown_tags}.'))
+            continue
+        valid[(authors[record['author']], record['name'])] = record
+    if not valid:
+        return
+
+    recipe_ids = get_recipe_ids(valid.keys())
+    now = timezone.now()
+    new_recipes = []
+    changed_recipes = []
+    for (author_id, name), record in valid.items():
+        recipe = Recipe(
+            pk=recipe_ids.get((author_id, name)),
+            author_id=author_id,
+            name=name,
+            text=record['text'],
+            cooking_time=record['cooking_time'],
+            image=record['image'],
+            updated_at=now
+        )
+        if recipe.pk is None:
+            new_recipes.append(recipe)
+        else:
+            changed_recipes.append(recipe)
+    previous_images = dict(Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in changed_recipes]
+    ).values_list('id', 'image'))
+    Recipe.objects.bulk_update(
+        changed_recipes,
+        ('text', 'cooking_time', 'image', 'updated_at')
+    )
+    Recipe.objects.bulk_create(new_recipes)
+    changed_ids = [recipe.pk for recipe in changed_recipes]
+    RecipeIngredient.objects.filter(recipe_id__in=changed_ids).delete()
+    Recipe.tags.through.objects.filter(recipe_id__in=changed_ids).delete()
+
+    recipe_ids = get_recipe_ids(valid.keys())
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe_id=recipe_ids[key],
+            ingredient_id=ingredient_ids[ingredient],
+            amount=amount
+        )
+        for key, record in valid.items()
+        for ingredient, amount in record['ingredients'].items()
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_ids[key], tag_id=tags[slug])
+        for key, record in valid.items()
+        for slug in record['tags']
+    )
+    # bulk_update и bulk_create не отправляют сигналы, поэтому
+    # замененные изображения освобождаются, а новые рецепты доставляются
+    # в ленты подписчиков явно.
+    replaced_images = [
+        previous_images[recipe.pk] for recipe in changed_recipes
+        if previous_images.get(recipe.pk)
+        and previous_images[recipe.pk] != recipe.image.name
+    ]
+    if replaced_images:
+        transaction.on_commit(lambda: release_files.delay(replaced_images))
+    new_ids = [
+        recipe_ids[(recipe.author_id, recipe.name)] for recipe in new_recipes
+    ]
+    if new_ids:
+        transaction.on_commit(lambda: deliver_recipes.delay(new_ids))
+    recipe_ids = list(recipe_ids.values())
+    update_search_index(recipe_ids)
+    ingredient_index.update(recipe_ids)
+    record_change('recipe', *recipe_ids)
+    schedule_similarities_rebuild()
+    result.processed += len(valid)
+    result.created += len(new_recipes)
+    result.updated += len(changed_recipes)
+
+
+IMPORTERS = {
+    'tags': (clean_tag, save_tags),
+    'ingredients': (clean_ingredient, save_ingredients),
+    'recipes': (clean_recipe, save_recipes),
+}
+
+
+def import_records(entity, rows, batch_size=CATALOG_BATCH_SIZE,
+                   progress=None):
+    """Импортирует записи пачками, каждая пачка в своей транзакции.
+
+    Записи с ошибками пропускаются и попадают в result.errors, остальные
+    записи пачки сохраняются. После каждой пачки вызывается progress.
+    """
+    clean, save = IMPORTERS[entity]
+    result = ImportResult()
+    for chunk in chunked(rows, batch_size):
+        records = []
+        for number, record in chunk:
+            try:
+                if isinstance(record, str):
+                    try:
+                        record = json.loads(record)
+                    except ValueError:
+                        raise CatalogError('Строка не является JSON.')
+                if not isinstance(record, dict):
+                    raise CatalogError('Запись должна быть объектом.')
+                records.append((number, clean(record)))
+            except ValueError as error:
+                result.errors.append((number, str(error)))
+        if records:
+            with transaction.atomic():
+                save(records, result)
+        if progress is not None:
+            progress(result)
+    result.errors.sort()
+    return result
@@ -0,0 +1,109 @@
+from heapq import merge
+
+from foodgram.constants import (FEED_BACKFILL_RECIPES_LIMIT, FEED_BATCH_SIZE,
+                                FEED_FAN_OUT_MAX_FOLLOWERS)
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+# Лента подписок строится по гибридной схеме. Пока у автора не больше
+# FEED_FAN_OUT_MAX_FOLLOWERS подписчиков с флагом fan_out, его новые рецепты
+# записываются в ленты подписчиков при публикации (fan-out on write).
+# Остальные подписки оформляются с fan_out=False, и рецепты таких авторов
+# подмешиваются в ленту при чтении (merge on read).
+
+
+def lock_author(author_id):
+    """Загружает автора и блокирует его строку до конца транзакции.
+
+    Подписки на одного автора оформляются по очереди, поэтому решение
+    has_fan_out_capacity не устаревает до вставки подписки, а автор не
+    может быть удален до нее. Возвращает None, если автора нет.
+    """
+    return User.objects.select_for_update().filter(pk=author_id).first()
+
+
+def has_fan_out_capacity(author_id):
+    """Проверяет, можно ли доставлять рецепты автора в ленту подписчика.
+
+    Вызывается в транзакции после lock_author.
+    """
+    return Subscription.objects.filter(
+        author_id=author_id,
+        fan_out=True
+    ).count() < FEED_FAN_OUT_MAX_FOLLOWERS
+
+
+def fill_feed(user_id, author_id, limit=FEED_BACKFILL_RECIPES_LIMIT):
+    """Добавляет последние рецепты автора в ленту подписчика."""
+    recipe_ids = Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-id').values_list('id', flat=True)[:limit]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, author_id=author_id, recipe_id=pk)
+            for pk in recipe_ids
+        ],
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def clear_feed(user_id, author_id):
+    """Удаляет рецепты автора из ленты бывшего подписчика."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def fan_out_recipe(recipe):
+    """Записывает новый рецепт в ленты подписчиков автора."""
+    follower_ids = Subscription.objects.filter(
+        author_id=recipe.author_id,
+        fan_out=True
+    ).values_list('user_id', flat=True).iterator()
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                author_id=recipe.author_id,
+                recipe_id=recipe.id
+            )
+            for user_id in follower_ids
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out_recipes(recipe_ids):
+    """Записывает новые рецепты в ленты подписчиков их авторов."""
+    for recipe in Recipe.objects.filter(pk__in=recipe_ids).only('author'):
+        fan_out_recipe(recipe)
+
+
+def get_feed_recipe_ids(user, before=None, limit=None):
+    """Возвращает id рецептов ленты пользователя по убыванию.
+
+    Объединяет записанную ленту и рецепты авторов, подписка на которых
+    оформлена без доставки в ленту. before — id последнего рецепта
+    предыдущей страницы.
+    """
+    timeline = FeedEntry.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        author__in=Subscription.objects.filter(
+            user=user,
+            fan_out=False
+        ).values('author')
+    )
+    if before is not None:
+        timeline = timeline.filter(recipe_id__lt=before)
+        pulled = pulled.filter(id__lt=before)
+    timeline = timeline.order_by('-recipe_id').values_list(
+        'recipe_id',
+        flat=True
+    )[:limit]
+    pulled = pulled.order_by('-id').values_list('id', flat=True)[:limit]
+
+    recipe_ids = []
+    for pk in merge(timeline, pulled, reverse=True):
+        if not recipe_ids or recipe_ids[-1] != pk:
+            recipe_ids.append(pk)
+    return recipe_ids[:limit]
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import FEED_BACKFILL_RECIPES_LIMIT
+from foodgram.db import stream
+from recipes.feed import fill_feed
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    """Команда заполнения лент подписок последними рецептами авторов."""
+
+    help = 'Заполняет ленты подписчиков рецептами авторов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id пользователя, ленту которого нужно заполнить'
+        )
+        parser.add_argument(
+            '--recipes-limit',
+            type=int,
+            default=FEED_BACKFILL_RECIPES_LIMIT,
+            help='Количество последних рецептов каждого автора'
+        )
+
+    def handle(self, *args, **options):
+        subscriptions = Subscription.objects.filter(fan_out=True)
+        if options['user']:
+            subscriptions = subscriptions.filter(user_id=options['user'])
+        count = 0
+        for user_id, author_id in stream(subscriptions.values_list(
+            'user_id',
+            'author_id'
+        )):
+            fill_feed(user_id, author_id, options['recipes_limit'])
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано подписок: {count}')
+        )
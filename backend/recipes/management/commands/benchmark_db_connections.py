@@ -0,0 +1,65 @@
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    """Команда замера стоимости открытия соединения с базой данных.
+
+    Сравнивает короткий запрос на новом соединении, как без CONN_MAX_AGE,
+    и на переиспользуемом соединении.
+    """
+
+    help = 'Сравнивает задержку запроса с новым и постоянным соединением.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Количество запросов в каждом режиме'
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Псевдоним базы данных'
+        )
+
+    def measure(self, conn, count, reconnect):
+        timings = []
+        for _ in range(count):
+            if reconnect:
+                conn.close()
+            started = perf_counter()
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            timings.append((perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        p50, p95 = (quantiles(timings, n=100)[index] for index in (49, 94))
+        self.stdout.write(
+            f'{label}: среднее {mean(timings):.2f} мс, '
+            f'p50 {p50:.2f} мс, p95 {p95:.2f} мс'
+        )
+        return mean(timings)
+
+    def handle(self, *args, **options):
+        conn = connections[options['database']]
+        count = options['requests']
+        fresh = self.report(
+            'Новое соединение',
+            self.measure(conn, count, reconnect=True)
+        )
+        conn.ensure_connection()
+        persistent = self.report(
+            'Постоянное соединение',
+            self.measure(conn, count, reconnect=False)
+        )
+        conn.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Экономия на запрос: {fresh - persistent:.2f} мс'
+        ))
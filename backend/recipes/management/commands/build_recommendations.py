@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import RECOMMENDATIONS_TOP_K
+from recipes.recommendations import build_similarities
+
+
+class Command(BaseCommand):
+    """Команда расчета похожих рецептов по избранному и покупкам."""
+
+    help = 'Пересчитывает таблицу похожих рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать все рецепты, а не только измененные'
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=RECOMMENDATIONS_TOP_K,
+            help='Количество похожих рецептов для каждого рецепта'
+        )
+
+    def handle(self, *args, **options):
+        count = build_similarities(
+            full=options['full'],
+            top_k=options['top_k']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано рецептов: {count}')
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.catalog import (FIELDS, CatalogError, dump_records,
+                             export_records, get_file_format)
+
+
+class Command(BaseCommand):
+    """Команда выгрузки тегов, ингредиентов или рецептов."""
+
+    help = 'Выгружает справочник в CSV или JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entity', choices=FIELDS)
+        parser.add_argument(
+            '--output',
+            help='Путь к файлу (.csv или .jsonl), по умолчанию stdout'
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'jsonl'),
+            help='Формат вывода, по умолчанию определяется по файлу'
+        )
+
+    def handle(self, *args, **options):
+        entity = options['entity']
+        file_format = options['format']
+        if file_format is None:
+            file_format = 'jsonl'
+            if options['output']:
+                try:
+                    file_format = get_file_format(options['output'])
+                except CatalogError as error:
+                    raise CommandError(error)
+        lines = dump_records(export_records(entity), entity, file_format)
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = -1 if file_format == 'csv' else 0
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f'Выгружено записей: {count}'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.constants import CATALOG_BATCH_SIZE
+from recipes.catalog import (FIELDS, CatalogError, get_file_format,
+                             import_records, load_records)
+
+
+class Command(BaseCommand):
+    """Команда загрузки тегов, ингредиентов или рецептов."""
+
+    help = (
+        'Загружает справочник из CSV или JSON Lines пачками, каждая пачка '
+        'в своей транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('entity', choices=FIELDS)
+        parser.add_argument('path', help='Путь к файлу .csv или .jsonl')
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'jsonl'),
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=CATALOG_BATCH_SIZE,
+            help='Количество записей в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        entity = options['entity']
+        file_format = options['format']
+        if file_format is None:
+            try:
+                file_format = get_file_format(options['path'])
+            except CatalogError as error:
+                raise CommandError(error)
+
+        def progress(result):
+            self.stdout.write(f'Обработано записей: {result.processed}')
+
+        with open(options['path'], encoding='utf-8', newline='') as file:
+            result = import_records(
+                entity,
+                load_records(file, entity, file_format),
+                batch_size=options['batch_size'],
+                progress=progress
+            )
+        for number, error in result.errors:
+            self.stderr.write(f'Строка {number}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Импорт завершен: {result}'))
@@ -0,0 +1,413 @@
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.management.commands.seed_load_data import (LOAD_EMAIL,
+                                                        LOAD_PASSWORD)
+
+COLLECTION_PATH = (
+    settings.BASE_DIR.parent
+    / 'postman_collection'
+    / 'foodgram.postman_collection.json'
+)
+# Папки коллекции с проверками ошибок, регистрацией и удалением рецептов
+# не отражают реальную нагрузку и пропускаются.
+SKIPPED_FOLDERS = (
+    'register_and_get_tokens',
+    'users/reset_password',
+    'users/set_avatars',
+    'users/delete_avatar',
+    'recipes/create_recipes',
+    'recipes/update_recipes',
+    'delete_requests/recipes',
+)
+VARIABLE_RE = re.compile(r'{{(\w+)}}')
+VARIABLE_SOURCES = (
+    (re.compile(r'RecipeId$'), 'recipes'),
+    (re.compile(r'(^u|U)serId$'), 'users'),
+    (re.compile(r'TagId$'), 'tags'),
+    (re.compile(r'TagSlug$'), 'tag_slugs'),
+    (re.compile(r'In(gre|dre)dientId$'), 'ingredients'),
+    (re.compile(r'^ingredientNameFirst'), 'ingredient_letters'),
+)
+HISTOGRAM_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+DISCOVERY_PAGES = 5
+SLOW_CLIENT_PATH = '/api/users/'
+SLOW_CLIENT_CHUNK = 1024
+
+
+class Route:
+    """Шаблон запроса из Postman-коллекции."""
+
+    def __init__(self, method, path, body, anonymous):
+        self.method = method
+        self.path = path
+        self.body = body
+        self.anonymous = anonymous
+        self.name = f'{method} {path}' + (' (аноним)' if anonymous else '')
+        self.variables = set(VARIABLE_RE.findall(path + (body or '')))
+        self.sources = {}
+
+
+def load_routes(path):
+    """Возвращает маршруты коллекции и их веса по числу повторений."""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    routes = {}
+    weights = Counter()
+
+    def walk(items, folder):
+        for item in items:
+            if 'item' in item:
+                name = f'{folder}/{item["name"]}'.strip('/')
+                if 'bad_requests' in name or name.startswith(
+                    SKIPPED_FOLDERS
+                ):
+                    continue
+                walk(item['item'], name)
+                continue
+            request = item['request']
+            url = request['url']
+            url = url['raw'] if isinstance(url, dict) else url
+            body = (request.get('body') or {}).get('raw') or None
+            route = Route(
+                request['method'],
+                url.replace('{{baseUrl}}', ''),
+                body,
+                (request.get('auth') or {}).get('type') == 'noauth'
+            )
+            routes.setdefault(route.name, route)
+            weights[route.name] += 1
+
+    walk(collection['item'], '')
+    return [routes[name] for name in weights], list(weights.values())
+
+
+class SlowClient(threading.Thread):
+    """Клиент, медленно отправляющий большое тело запроса.
+
+    Так ведут себя мобильные клиенты, загружающие изображение рецепта.
+    Пока тело не получено, синхронный воркер занят этим клиентом. После
+    ответа запрос повторяется до вызова stop.
+    """
+
+    def __init__(self, base_url, body_size, rate):
+        super().__init__(daemon=True)
+        url = urlsplit(base_url)
+        self.address = (url.hostname, url.port or 80)
+        self.host = url.netloc
+        self.body_size = body_size
+        self.delay = SLOW_CLIENT_CHUNK / rate
+        self.requests = 0
+        self._stop_event = threading.Event()
+
+    def get_body(self):
+        padding = 'x' * (self.body_size - len('{"email": "", "image": ""}'))
+        return json.dumps({'email': '', 'image': padding}).encode()
+
+    def run(self):
+        body = self.get_body()
+        head = (
+            f'POST {SLOW_CLIENT_PATH} HTTP/1.1\r\n'
+            f'Host: {self.host}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode()
+        while not self._stop_event.is_set():
+            try:
+                with socket.create_connection(self.address, 30) as sock:
+                    sock.sendall(head)
+                    for start in range(0, len(body), SLOW_CLIENT_CHUNK):
+                        if self._stop_event.wait(self.delay):
+                            return
+                        sock.sendall(body[start:start + SLOW_CLIENT_CHUNK])
+                    sock.recv(SLOW_CLIENT_CHUNK)
+            except OSError:
+                self._stop_event.wait(self.delay)
+            self.requests += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def percentile(values, fraction):
+    """Возвращает перцентиль отсортированного списка."""
+    return values[round(fraction * (len(values) - 1))] if values else 0
+
+
+class Command(BaseCommand):
+    """Команда нагрузочного тестирования по смеси запросов коллекции."""
+
+    help = (
+        'Отправляет на сервер запросы из Postman-коллекции с заданной '
+        'частотой и выводит пропускную способность, гистограммы задержек '
+        'и долю ошибок по маршрутам. Пользователи создаются командой '
+        'seed_load_data. С --slow-clients параллельно работают клиенты, '
+        'медленно загружающие большое тело запроса: запуск с одинаковыми '
+        'параметрами против сервера с SERVER_MODE=wsgi и SERVER_MODE=asgi '
+        'сравнивает, сколько запросов выдерживает воркер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--collection', default=str(COLLECTION_PATH))
+        parser.add_argument('--rps', type=float, default=20)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Длительность теста в секундах'
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20,
+            help='Количество пользователей load_user_N, получающих токены'
+        )
+        parser.add_argument('--password', default=LOAD_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--report', help='Файл для отчета в JSON')
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=0,
+            help='Количество клиентов, медленно отправляющих тело запроса'
+        )
+        parser.add_argument(
+            '--slow-body-kb',
+            type=int,
+            default=200,
+            help='Размер тела запроса медленного клиента в КБ'
+        )
+        parser.add_argument(
+            '--slow-rate',
+            type=int,
+            default=20000,
+            help='Скорость отправки медленного клиента в байтах в секунду'
+        )
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.rng = random.Random(options['seed'])
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+        try:
+            routes, weights = load_routes(options['collection'])
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать коллекцию: {error}')
+        self.values = self.discover()
+        self.tokens = self.get_tokens(options['users'], options['password'])
+        routes, weights = self.filter_routes(routes, weights)
+
+        interval = 1 / options['rps']
+        total = int(options['duration'] * options['rps'])
+        self.stdout.write(
+            f'Маршрутов: {len(routes)}, запросов: {total}, '
+            f'токенов: {len(self.tokens)}, '
+            f'медленных клиентов: {options["slow_clients"]}'
+        )
+        slow_clients = [
+            SlowClient(
+                self.base_url,
+                options['slow_body_kb'] * 1024,
+                options['slow_rate']
+            )
+            for _ in range(options['slow_clients'])
+        ]
+        for client in slow_clients:
+            client.start()
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                for number in range(total):
+                    scheduled = started + number * interval
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    route = self.rng.choices(routes, weights)[0]
+                    executor.submit(self.send, route, scheduled)
+            elapsed = time.perf_counter() - started
+        finally:
+            for client in slow_clients:
+                client.stop()
+        if slow_clients:
+            self.stdout.write(
+                'Медленных запросов отправлено: '
+                f'{sum(client.requests for client in slow_clients)}'
+            )
+        self.report(elapsed, options['report'])
+
+    def get_session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def discover(self):
+        """Собирает id и слаги существующих объектов через API."""
+        session = self.get_session()
+
+        def get(path):
+            try:
+                response = session.get(f'{self.base_url}{path}', timeout=30)
+            except requests.RequestException as error:
+                raise CommandError(f'Сервер недоступен: {error}')
+            return response.json() if response.ok else None
+
+        values = defaultdict(list)
+        for source in ('recipes', 'users'):
+            for page in range(1, DISCOVERY_PAGES + 1):
+                data = get(f'/api/{source}/?limit=100&page={page}')
+                if data is None:
+                    break
+                values[source] += [item['id'] for item in data['results']]
+        for tag in get('/api/tags/') or ():
+            values['tags'].append(tag['id'])
+            values['tag_slugs'].append(tag['slug'])
+        for ingredient in get('/api/ingredients/') or ():
+            values['ingredients'].append(ingredient['id'])
+            values['ingredient_letters'].append(ingredient['name'][0])
+        return values
+
+    def get_tokens(self, count, password):
+        """Получает токены пользователей через djoser."""
+        session = self.get_session()
+        tokens = []
+        for number in range(count):
+            response = session.post(
+                f'{self.base_url}/api/auth/token/login/',
+                json={
+                    'email': LOAD_EMAIL.format(number),
+                    'password': password
+                },
+                timeout=30
+            )
+            if response.ok:
+                tokens.append(response.json()['auth_token'])
+        if not tokens:
+            raise CommandError(
+                'Не удалось получить токены, выполните seed_load_data.'
+            )
+        return tokens
+
+    def filter_routes(self, routes, weights):
+        """Оставляет маршруты, для переменных которых есть значения."""
+        kept = []
+        for route, weight in zip(routes, weights):
+            sources = {}
+            for variable in route.variables:
+                source = next(
+                    (
+                        source for pattern, source in VARIABLE_SOURCES
+                        if pattern.search(variable)
+                    ),
+                    None
+                )
+                if source is None or not self.values[source]:
+                    self.stderr.write(
+                        f'Пропущен {route.name}: нет значений для {variable}'
+                    )
+                    break
+                sources[variable] = source
+            else:
+                route.sources = sources
+                kept.append((route, weight))
+        if not kept:
+            raise CommandError('В коллекции нет подходящих маршрутов.')
+        return [route for route, _ in kept], [weight for _, weight in kept]
+
+    def send(self, route, scheduled):
+        def substitute(match):
+            return str(self.rng.choice(
+                self.values[route.sources[match.group(1)]]
+            ))
+
+        headers = {}
+        if not route.anonymous:
+            headers['Authorization'] = f'Token {self.rng.choice(self.tokens)}'
+        body = route.body and VARIABLE_RE.sub(substitute, route.body)
+        if body:
+            headers['Content-Type'] = 'application/json'
+        try:
+            status = self.get_session().request(
+                route.method,
+                self.base_url + VARIABLE_RE.sub(substitute, route.path),
+                data=body and body.encode(),
+                headers=headers,
+                timeout=30,
+                allow_redirects=False
+            ).status_code
+        except requests.RequestException:
+            status = 'ошибка'
+        # Задержка считается от запланированного времени отправки, чтобы
+        # очередь перед перегруженным сервером тоже попадала в измерения.
+        latency = (time.perf_counter() - scheduled) * 1000
+        with self.lock:
+            self.latencies[route.name].append(latency)
+            self.statuses[route.name][status] += 1
+
+    def report(self, elapsed, path):
+        summary = {}
+        for name in sorted(
+            self.latencies,
+            key=lambda name: -len(self.latencies[name])
+        ):
+            latencies = sorted(self.latencies[name])
+            statuses = self.statuses[name]
+            failed = sum(
+                count for status, count in statuses.items()
+                if status == 'ошибка' or status >= 500
+            )
+            histogram = Counter(
+                next(bucket for bucket in HISTOGRAM_BUCKETS if value <= bucket)
+                for value in latencies
+            )
+            summary[name] = {
+                'requests': len(latencies),
+                'rps': round(len(latencies) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 0.5), 1),
+                'p95_ms': round(percentile(latencies, 0.95), 1),
+                'p99_ms': round(percentile(latencies, 0.99), 1),
+                'max_ms': round(latencies[-1], 1),
+                'error_rate': round(failed / len(latencies), 4),
+                'statuses': {
+                    str(status): count for status, count in statuses.items()
+                },
+                'histogram_ms': {
+                    str(bucket): histogram[bucket]
+                    for bucket in HISTOGRAM_BUCKETS if histogram[bucket]
+                },
+            }
+            self.stdout.write(
+                f'{name}\n'
+                f'  запросов {len(latencies)}, rps {summary[name]["rps"]}, '
+                f'p50 {summary[name]["p50_ms"]} мс, '
+                f'p95 {summary[name]["p95_ms"]} мс, '
+                f'p99 {summary[name]["p99_ms"]} мс, '
+                f'ошибок {summary[name]["error_rate"]:.2%}\n'
+                f'  статусы {dict(statuses)}\n'
+                f'  гистограмма (мс) {summary[name]["histogram_ms"]}'
+            )
+        total = sum(len(values) for values in self.latencies.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего запросов: {total} за {elapsed:.1f} с '
+            f'({total / elapsed:.1f} в секунду)'
+        ))
+        if path:
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(summary, file, ensure_ascii=False, indent=2)
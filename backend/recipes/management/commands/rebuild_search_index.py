@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_index
+
+
+class Command(BaseCommand):
+    """Команда пересборки поискового индекса рецептов."""
+
+    help = 'Пересобирает поисковый индекс всех рецептов.'
+
+    def handle(self, *args, **options):
+        update_search_index(Recipe.objects.values_list('id', flat=True))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Проиндексировано рецептов: {Recipe.objects.count()}'
+            )
+        )
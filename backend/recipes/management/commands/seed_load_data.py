@@ -0,0 +1,172 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import CATALOG_BATCH_SIZE
+from foodgram.invalidation import record_change
+from recipes.catalog import chunked, import_records, load_records
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscription, User
+
+LOAD_USERNAME = 'load_user_{}'
+LOAD_EMAIL = 'load_user_{}@example.com'
+LOAD_PASSWORD = 'LoadTest-Pa$$word'
+DEFAULT_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+)
+
+
+class Command(BaseCommand):
+    """Команда заполнения базы данными для нагрузочного тестирования."""
+
+    help = (
+        'Создает пользователей load_user_N, рецепты, избранное, корзины '
+        'и подписки. Повторный запуск дополняет существующие данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Рецептов в избранном у каждого пользователя'
+        )
+        parser.add_argument(
+            '--shopping-cart',
+            type=int,
+            default=5,
+            help='Рецептов в корзине у каждого пользователя'
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Подписок у каждого пользователя'
+        )
+        parser.add_argument('--password', default=LOAD_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.create_catalog()
+        user_ids = self.create_users(options['users'], options['password'])
+        recipe_ids = self.create_recipes(rng, options['recipes'], user_ids)
+        for model, per_user in (
+            (Favorite, options['favorites']),
+            (ShoppingCart, options['shopping_cart']),
+        ):
+            self.create_relations(
+                model,
+                'recipe_id',
+                rng,
+                user_ids,
+                recipe_ids,
+                per_user
+            )
+        self.create_relations(
+            Subscription,
+            'author_id',
+            rng,
+            user_ids,
+            user_ids,
+            options['subscriptions'],
+            skip_self=True
+        )
+        call_command('backfill_feed', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, рецептов: {len(recipe_ids)}'
+        ))
+
+    def create_catalog(self):
+        with open('data/ingredients.csv', encoding='utf-8') as file:
+            import_records(
+                'ingredients',
+                load_records(file, 'ingredients', 'csv')
+            )
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, slug=slug) for name, slug in DEFAULT_TAGS
+            )
+            record_change('tag')
+
+    def get_users(self):
+        return User.objects.filter(
+            username__startswith=LOAD_USERNAME.format('')
+        )
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        for numbers in chunked(range(count), CATALOG_BATCH_SIZE):
+            User.objects.bulk_create(
+                (
+                    User(
+                        username=LOAD_USERNAME.format(number),
+                        email=LOAD_EMAIL.format(number),
+                        first_name='Нагрузка',
+                        last_name=str(number),
+                        password=password
+                    )
+                    for number in numbers
+                ),
+                ignore_conflicts=True
+            )
+        return list(self.get_users().values_list('id', flat=True))
+
+    def create_recipes(self, rng, count, user_ids):
+        authors = dict(self.get_users().values_list('id', 'username'))
+        slugs = list(Tag.objects.values_list('slug', flat=True))
+        ingredients = list(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        recipes = Recipe.objects.filter(author__in=self.get_users())
+        existing = recipes.count()
+
+        def records():
+            for number in range(existing, count):
+                chosen = rng.sample(ingredients, rng.randint(2, 10))
+                yield number, {
+                    'author': authors[rng.choice(user_ids)],
+                    'name': f'Рецепт {number}: {chosen[0][0]}',
+                    'text': ' '.join(name for name, _ in chosen),
+                    'cooking_time': rng.randint(5, 180),
+                    'image': 'media/recipes/load.png',
+                    'tags': rng.sample(slugs, rng.randint(1, len(slugs))),
+                    'ingredients': [
+                        {
+                            'name': name,
+                            'measurement_unit': unit,
+                            'amount': rng.randint(1, 500),
+                        }
+                        for name, unit in chosen
+                    ],
+                }
+
+        import_records(
+            'recipes',
+            records(),
+            progress=lambda result: self.stdout.write(
+                f'Создано рецептов: {result.created}'
+            )
+        )
+        return list(recipes.values_list('id', flat=True))
+
+    def create_relations(self, model, field, rng, user_ids, target_ids,
+                         per_user, skip_self=False):
+        per_user = min(per_user, len(target_ids))
+        for users in chunked(user_ids, CATALOG_BATCH_SIZE):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, **{field: target_id})
+                    for user_id in users
+                    for target_id in rng.sample(target_ids, per_user)
+                    if not skip_self or target_id != user_id
+                ),
+                ignore_conflicts=True
+            )
+            record_change(model._meta.model_name, *users)
@@ -0,0 +1,239 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from threading import Lock, RLock, Thread
+from time import monotonic
+
+from django.db import connections, transaction
+
+from foodgram.constants import MATCH_INDEX_REBUILD_INTERVAL, MATCH_INDEX_TTL
+from foodgram.db import stream
+from foodgram.invalidation import get_versions
+from recipes.models import Recipe, RecipeIngredient
+
+
+class IngredientIndex:
+    """Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Для каждого ингредиента и тега хранится отсортированный массив id
+    рецептов. Индекс обновляется точечно при сохранении рецептов в этом
+    процессе и перестраивается целиком, когда меняется версия рецептов
+    или тегов в шине инвалидации, но не чаще раза в
+    MATCH_INDEX_REBUILD_INTERVAL секунд и не реже раза в MATCH_INDEX_TTL.
+
+    Устаревший индекс перестраивается в фоновом потоке, запросы тем
+    временем обслуживает прежний. Ждать построения приходится только
+    первым запросам процесса.
+    """
+
+    def __init__(self, ttl=MATCH_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = RLock()
+        # Удерживается на время перестроения, чтобы индекс строился
+        # одним потоком.
+        self._build_lock = Lock()
+        # Рецепты, измененные во время перестроения. Загруженный до их
+        # изменения снимок не содержит правок, они применяются повторно.
+        self._changed_during_rebuild = None
+        self._built_at = None
+        self._versions = None
+        self._ingredient_postings = {}
+        self._tag_postings = {}
+        self._recipe_ingredients = {}
+        self._recipe_tags = {}
+        self._cooking_times = {}
+
+    @staticmethod
+    def _load(recipe_ids=None):
+        recipes = Recipe.objects.all()
+        ingredients = RecipeIngredient.objects.all()
+        tags = Recipe.tags.through.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+            tags = tags.filter(recipe_id__in=recipe_ids)
+        recipe_ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in stream(ingredients.values_list(
+            'recipe_id',
+            'ingredient_id'
+        )):
+            recipe_ingredients[recipe_id].append(ingredient_id)
+        recipe_tags = defaultdict(list)
+        for recipe_id, slug in stream(tags.values_list(
+            'recipe_id',
+            'tag__slug'
+        )):
+            recipe_tags[recipe_id].append(slug)
+        cooking_times = dict(
+            stream(recipes.values_list('id', 'cooking_time'))
+        )
+        return cooking_times, recipe_ingredients, recipe_tags
+
+    def rebuild(self, versions=None):
+        """Перестраивает индекс целиком."""
+        with self._lock:
+            self._changed_during_rebuild = set()
+        cooking_times, recipe_ingredients, recipe_tags = self._load()
+        ingredient_postings = defaultdict(list)
+        tag_postings = defaultdict(list)
+        for recipe_id in sorted(cooking_times):
+            for ingredient_id in recipe_ingredients[recipe_id]:
+                ingredient_postings[ingredient_id].append(recipe_id)
+            for slug in recipe_tags[recipe_id]:
+                tag_postings[slug].append(recipe_id)
+        with self._lock:
+            self._ingredient_postings = {
+                key: array('q', ids)
+                for key, ids in ingredient_postings.items()
+            }
+            self._tag_postings = {
+                key: array('q', ids) for key, ids in tag_postings.items()
+            }
+            self._recipe_ingredients = {
+                recipe_id: tuple(recipe_ingredients[recipe_id])
+                for recipe_id in cooking_times
+            }
+            self._recipe_tags = {
+                recipe_id: tuple(recipe_tags[recipe_id])
+                for recipe_id in cooking_times
+            }
+            self._cooking_times = cooking_times
+            self._built_at = monotonic()
+            self._versions = versions
+            changed = self._changed_during_rebuild
+            self._changed_during_rebuild = None
+        if changed:
+            self.update(changed)
+
+    def _rebuild_in_background(self, versions):
+        try:
+            self.rebuild(versions)
+        finally:
+            self._build_lock.release()
+            connections.close_all()
+
+    def _ensure_fresh(self):
+        versions = get_versions(('recipe',), ('tag',))
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self.rebuild(versions)
+            return
+        age = monotonic() - self._built_at
+        is_stale = age > self.ttl or (
+            versions != self._versions
+            and age > MATCH_INDEX_REBUILD_INTERVAL
+        )
+        if is_stale and self._build_lock.acquire(blocking=False):
+            Thread(
+                target=self._rebuild_in_background,
+                args=(versions,),
+                name='ingredient-index',
+                daemon=True
+            ).start()
+
+    def warm(self):
+        """Строит индекс до первого запроса подбора."""
+        self._ensure_fresh()
+
+    @staticmethod
+    def _discard(postings, key, recipe_id):
+        ids = postings.get(key)
+        if ids is None:
+            return
+        position = bisect_left(ids, recipe_id)
+        if position < len(ids) and ids[position] == recipe_id:
+            del ids[position]
+        if not ids:
+            del postings[key]
+
+    def _adopt_versions(self, previous):
+        # Версия рецептов, опубликованная после фиксации изменений, уже
+        # учтена в индексе, и перестраивать его не нужно.
+        versions = get_versions(('recipe',), ('tag',))
+        with self._lock:
+            if self._versions == previous and versions[1] == previous[1]:
+                self._versions = versions
+
+    def update(self, recipe_ids):
+        """Переиндексирует указанные рецепты.
+
+        Версия рецептов, которую опубликует сохранение этих рецептов,
+        принимается индексом после фиксации транзакции.
+        """
+        if self._built_at is None:
+            return
+        previous = self._versions
+        cooking_times, recipe_ingredients, recipe_tags = self._load(
+            recipe_ids
+        )
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild.update(recipe_ids)
+            for recipe_id in set(recipe_ids):
+                for ingredient_id in self._recipe_ingredients.pop(
+                    recipe_id,
+                    ()
+                ):
+                    self._discard(
+                        self._ingredient_postings,
+                        ingredient_id,
+                        recipe_id
+                    )
+                for slug in self._recipe_tags.pop(recipe_id, ()):
+                    self._discard(self._tag_postings, slug, recipe_id)
+                self._cooking_times.pop(recipe_id, None)
+                if recipe_id not in cooking_times:
+                    continue
+                self._cooking_times[recipe_id] = cooking_times[recipe_id]
+                self._recipe_ingredients[recipe_id] = tuple(
+                    recipe_ingredients[recipe_id]
+                )
+                self._recipe_tags[recipe_id] = tuple(recipe_tags[recipe_id])
+                for ingredient_id in recipe_ingredients[recipe_id]:
+                    insort(
+                        self._ingredient_postings.setdefault(
+                            ingredient_id,
+                            array('q')
+                        ),
+                        recipe_id
+                    )
+                for slug in recipe_tags[recipe_id]:
+                    insort(
+                        self._tag_postings.setdefault(slug, array('q')),
+                        recipe_id
+                    )
+        transaction.on_commit(lambda: self._adopt_versions(previous))
+
+    def match(self, ingredients, tags=None, max_cooking_time=None):
+        """Ранжирует рецепты по доле имеющихся ингредиентов.
+
+        Возвращает список (доля, число совпавших ингредиентов, id рецепта)
+        по убыванию доли, затем числа совпадений и новизны рецепта.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            counts = Counter()
+            for ingredient_id in set(ingredients):
+                counts.update(self._ingredient_postings.get(ingredient_id, ()))
+            allowed = None
+            if tags:
+                allowed = set()
+                for slug in tags:
+                    allowed.update(self._tag_postings.get(slug, ()))
+            results = []
+            for recipe_id, matched in counts.items():
+                if allowed is not None and recipe_id not in allowed:
+                    continue
+                if (
+                    max_cooking_time is not None
+                    and self._cooking_times[recipe_id] > max_cooking_time
+                ):
+                    continue
+                coverage = matched / len(self._recipe_ingredients[recipe_id])
+                results.append((coverage, matched, recipe_id))
+        results.sort(reverse=True)
+        return results
+
+
+ingredient_index = IngredientIndex()
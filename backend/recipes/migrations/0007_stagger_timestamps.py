@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+TIMESTAMPED_MODELS = (
+    ('recipes', 'Recipe'),
+    ('recipes', 'Favorite'),
+    ('recipes', 'ShoppingCart'),
+    ('users', 'Subscription'),
+)
+
+
+def stagger_timestamps(apps, schema_editor):
+    """Упорядочивает даты существующих записей по их id.
+
+    Настоящая дата создания старых записей неизвестна, и все они получили
+    дату миграции. Сдвиг на микросекунды сохраняет порядок добавления
+    при сортировке по дате.
+    """
+    now = timezone.now()
+    for app_label, model_name in TIMESTAMPED_MODELS:
+        model = apps.get_model(app_label, model_name)
+        ids = model.objects.order_by('-id').values_list('id', flat=True)
+        objs = []
+        for offset, pk in enumerate(ids.iterator()):
+            stamp = now - timedelta(microseconds=offset)
+            objs.append(model(id=pk, created_at=stamp, updated_at=stamp))
+        model.objects.bulk_update(
+            objs,
+            ('created_at', 'updated_at'),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_auto_20261019_0850'),
+        ('users', '0006_auto_20261019_0850'),
+    ]
+
+    operations = [
+        migrations.RunPython(stagger_timestamps, migrations.RunPython.noop),
+    ]
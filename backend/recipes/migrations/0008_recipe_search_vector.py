@@ -0,0 +1,52 @@
+# Generated by Django 3.2.16 on 2026-10-19 05:52
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_INDEX_SQL = (
+    'CREATE INDEX recipe_search_idx ON recipes_recipe '
+    'USING gin (search_vector)'
+)
+DROP_INDEX_SQL = 'DROP INDEX IF EXISTS recipe_search_idx'
+FILL_VECTOR_SQL = """
+UPDATE recipes_recipe AS r SET search_vector =
+    setweight(to_tsvector('russian', coalesce(r.name, '')), 'A')
+    || setweight(to_tsvector('russian', coalesce(r.text, '')), 'B')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM recipes_recipeingredient AS ri
+        JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    ), '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """Создает GIN-индекс и заполняет поисковый вектор на PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(FILL_VECTOR_SQL)
+    schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    """Удаляет GIN-индекс поискового вектора."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_stagger_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
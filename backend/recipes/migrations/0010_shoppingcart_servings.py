@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-19 05:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipesimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1, 'Количество порций не может быть меньше 1'), django.core.validators.MaxValueValidator(100, 'Количество порций не может быть больше 100')], verbose_name='Количество порций'),
+        ),
+    ]
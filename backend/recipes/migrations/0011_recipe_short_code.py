@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppingcart_servings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(editable=False, max_length=16, null=True, unique=True, verbose_name='Код короткой ссылки'),
+        ),
+    ]
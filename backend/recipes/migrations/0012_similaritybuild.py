@@ -0,0 +1,24 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_short_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Начало расчета')),
+            ],
+            options={
+                'verbose_name': 'Расчет похожих рецептов',
+                'verbose_name_plural': 'Расчеты похожих рецептов',
+            },
+        ),
+    ]
@@ -1,12 +1,15 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 from foodgram.constants import (MAX_LENGTH_INGREDIENT_NAME,
                                 MAX_LENGTH_MEASUREMENT_UNIT,
-                                MAX_LENGTH_RECIPE_NAME, MAX_LENGTH_TAG_NAME,
-                                MAX_LENGTH_TAG_SLUG, MAX_VALUE_COOKING_TIME,
+                                MAX_LENGTH_RECIPE_NAME, MAX_LENGTH_SHORT_CODE,
+                                MAX_LENGTH_TAG_NAME, MAX_LENGTH_TAG_SLUG,
+                                MAX_VALUE_COOKING_TIME, MAX_VALUE_SERVINGS,
                                 MIN_VALUE_COOKING_TIME,
-                                MIN_VALUE_INGREDIENT_AMOUNT)
+                                MIN_VALUE_INGREDIENT_AMOUNT,
+                                MIN_VALUE_SERVINGS)
 from recipes.validators import validation_slug
 from users.models import User
 
@@ -119,9 +122,41 @@ class Recipe(models.Model):
         verbose_name='Ингредиенты рецепта',
         help_text='Ингредиенты рецепта'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата публикации'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    short_code = models.CharField(
+        max_length=MAX_LENGTH_SHORT_CODE,
+        unique=True,
+        null=True,
+        editable=False,
+        verbose_name='Код короткой ссылки'
+    )
+    # GIN-индекс создается миграцией только на PostgreSQL.
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_id_idx'
+            ),
+            models.Index(
+                fields=('name',),
+                name='recipe_name_idx'
+            )
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -186,6 +221,14 @@ class BaseUserRecipeModel(models.Model):
         related_name='%(class)ss',
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         abstract = True
@@ -206,7 +249,7 @@ class Favorite(BaseUserRecipeModel):
 
     _added_to: str = 'избранное'
 
-    class Meta:
+    class Meta(BaseUserRecipeModel.Meta):
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
 
@@ -216,6 +259,117 @@ class ShoppingCart(BaseUserRecipeModel):
 
     _added_to: str = 'список покупок'
 
-    class Meta:
+    servings = models.PositiveSmallIntegerField(
+        default=MIN_VALUE_SERVINGS,
+        validators=(
+            MinValueValidator(
+                MIN_VALUE_SERVINGS,
+                'Количество порций не может быть меньше 1'
+            ),
+            MaxValueValidator(
+                MAX_VALUE_SERVINGS,
+                'Количество порций не может быть больше 100'
+            ),
+        ),
+        verbose_name='Количество порций'
+    )
+
+    class Meta(BaseUserRecipeModel.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class FeedEntry(models.Model):
+    """Модель ленты рецептов авторов, на которых подписан пользователь."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        ordering = ('-recipe',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.recipe_id} в ленте {self.user_id}'
+
+
+class RecipeSimilarity(models.Model):
+    """Модель похожих рецептов, рассчитанных по избранному и покупкам."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Степень сходства')
+    computed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата расчета'
+    )
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_recipe_similarity'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similarity_recipe_score_idx'
+            )
+        ]
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}'
+
+
+class SimilarityBuild(models.Model):
+    """Модель отметки последнего расчета похожих рецептов.
+
+    Хранится одной строкой. Следующий расчет учитывает добавления в
+    избранное и покупки, сделанные после начала предыдущего.
+    """
+
+    started_at = models.DateTimeField(verbose_name='Начало расчета')
+
+    class Meta:
+        verbose_name = 'Расчет похожих рецептов'
+        verbose_name_plural = 'Расчеты похожих рецептов'
+
+    def __str__(self):
+        return f'{self.started_at:%Y-%m-%d %H:%M:%S}'
@@ -0,0 +1,200 @@
+from collections import defaultdict
+from datetime import timedelta
+from heapq import nlargest
+from math import sqrt
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from foodgram.constants import (RECOMMENDATIONS_LIMIT,
+                                RECOMMENDATIONS_MAX_USER_ITEMS,
+                                RECOMMENDATIONS_SHOPPING_CART_WEIGHT,
+                                RECOMMENDATIONS_TOP_K,
+                                RECOMMENDATIONS_WATERMARK_OVERLAP)
+from foodgram.db import stream
+from recipes.models import (Favorite, RecipeSimilarity, ShoppingCart,
+                            SimilarityBuild)
+
+INTERACTION_WEIGHTS = (
+    (ShoppingCart, RECOMMENDATIONS_SHOPPING_CART_WEIGHT),
+    (Favorite, 1.0),
+)
+SIMILARITY_BATCH_SIZE = 500
+
+
+class Interactions:
+    """Разреженная матрица «пользователь × рецепт» из избранного и покупок.
+
+    Вес пары — наибольший вес среди источников. Пользователи с числом
+    рецептов больше RECOMMENDATIONS_MAX_USER_ITEMS не учитываются:
+    они почти не несут информации о сходстве, а стоят квадратично.
+
+    С recipe_ids загружается только окрестность этих рецептов: их
+    пользователи, рецепты этих пользователей и все пользователи таких
+    рецептов. Этого достаточно, чтобы similar для recipe_ids вернул то
+    же, что и на полной матрице.
+    """
+
+    def __init__(self, recipe_ids=None):
+        user_ids = None
+        if recipe_ids is not None:
+            candidate_ids = get_user_recipe_ids(get_recipe_user_ids(
+                recipe_ids
+            ))
+            user_ids = get_recipe_user_ids(candidate_ids)
+        user_items = defaultdict(dict)
+        for model, weight in INTERACTION_WEIGHTS:
+            queryset = model.objects.all()
+            if user_ids is not None:
+                queryset = queryset.filter(user_id__in=user_ids)
+            for user_id, recipe_id in stream(queryset.values_list(
+                'user_id',
+                'recipe_id'
+            )):
+                items = user_items[user_id]
+                items[recipe_id] = max(items.get(recipe_id, 0), weight)
+        self.user_items = {
+            user_id: items for user_id, items in user_items.items()
+            if len(items) <= RECOMMENDATIONS_MAX_USER_ITEMS
+        }
+        self.item_users = defaultdict(list)
+        norms = defaultdict(float)
+        for user_id, items in self.user_items.items():
+            for recipe_id, weight in items.items():
+                self.item_users[recipe_id].append(user_id)
+                norms[recipe_id] += weight * weight
+        self.norms = {
+            recipe_id: sqrt(value) for recipe_id, value in norms.items()
+        }
+
+    def similar(self, recipe_id, top_k=RECOMMENDATIONS_TOP_K):
+        """Возвращает top_k пар (id рецепта, косинусное сходство)."""
+        scores = defaultdict(float)
+        for user_id in self.item_users.get(recipe_id, ()):
+            items = self.user_items[user_id]
+            weight = items[recipe_id]
+            for other_id, other_weight in items.items():
+                if other_id != recipe_id:
+                    scores[other_id] += weight * other_weight
+        norm = self.norms.get(recipe_id)
+        return nlargest(
+            top_k,
+            (
+                (other_id, score / (norm * self.norms[other_id]))
+                for other_id, score in scores.items()
+            ),
+            key=itemgetter(1)
+        )
+
+
+def get_recipe_user_ids(recipe_ids):
+    """Возвращает пользователей, добавивших любой из рецептов."""
+    user_ids = set()
+    for model, _ in INTERACTION_WEIGHTS:
+        user_ids.update(model.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('user_id', flat=True))
+    return user_ids
+
+
+def get_user_recipe_ids(user_ids):
+    """Возвращает рецепты, добавленные любым из пользователей."""
+    recipe_ids = set()
+    for model, _ in INTERACTION_WEIGHTS:
+        recipe_ids.update(model.objects.filter(
+            user_id__in=user_ids
+        ).values_list('recipe_id', flat=True))
+    return recipe_ids
+
+
+def get_changed_recipe_ids(since):
+    """Возвращает рецепты, строки сходства которых могли измениться.
+
+    Это все рецепты пользователей, добавивших что-либо после since.
+    """
+    user_ids = set()
+    for model, _ in INTERACTION_WEIGHTS:
+        user_ids.update(
+            model.objects.filter(
+                created_at__gte=since
+            ).values_list('user_id', flat=True)
+        )
+    return get_user_recipe_ids(user_ids)
+
+
+def build_similarities(full=False, top_k=RECOMMENDATIONS_TOP_K):
+    """Пересчитывает таблицу похожих рецептов.
+
+    Без full пересчитываются только строки рецептов, затронутых
+    добавлениями в избранное и покупки после прошлого расчета, и
+    загружается только их окрестность в матрице. Удаления учитываются
+    только при полном пересчете. Возвращает число строк.
+
+    Отметка времени берется до загрузки матрицы, поэтому добавления,
+    сделанные во время расчета, войдут в следующий.
+    """
+    started_at = timezone.now()
+    last_build = SimilarityBuild.objects.first()
+    if full or last_build is None:
+        interactions = Interactions()
+        recipe_ids = set(interactions.item_users)
+        RecipeSimilarity.objects.exclude(recipe_id__in=recipe_ids).delete()
+    else:
+        recipe_ids = get_changed_recipe_ids(
+            last_build.started_at
+            - timedelta(seconds=RECOMMENDATIONS_WATERMARK_OVERLAP)
+        )
+        interactions = Interactions(recipe_ids)
+
+    recipe_ids = sorted(recipe_ids)
+    for start in range(0, len(recipe_ids), SIMILARITY_BATCH_SIZE):
+        batch = recipe_ids[start:start + SIMILARITY_BATCH_SIZE]
+        rows = [
+            RecipeSimilarity(
+                recipe_id=recipe_id,
+                similar_id=similar_id,
+                score=score
+            )
+            for recipe_id in batch
+            for similar_id, score in interactions.similar(recipe_id, top_k)
+        ]
+        with transaction.atomic():
+            RecipeSimilarity.objects.filter(recipe_id__in=batch).delete()
+            RecipeSimilarity.objects.bulk_create(rows)
+    SimilarityBuild.objects.update_or_create(
+        pk=1,
+        defaults={'started_at': started_at}
+    )
+    return len(recipe_ids)
+
+
+def get_similar_recipe_ids(recipe_id, limit=RECOMMENDATIONS_TOP_K):
+    """Возвращает id рецептов, похожих на указанный."""
+    return list(
+        RecipeSimilarity.objects.filter(
+            recipe_id=recipe_id
+        ).order_by('-score').values_list('similar_id', flat=True)[:limit]
+    )
+
+
+def get_recommended_recipe_ids(user, limit=RECOMMENDATIONS_LIMIT):
+    """Возвращает до limit id рецептов, рекомендованных по избранному.
+
+    Сходства с каждым избранным рецептом суммируются, уже избранные
+    рецепты исключаются. База сортирует только limit лучших строк.
+    """
+    favorites = Favorite.objects.filter(user=user).values('recipe')
+    return list(
+        RecipeSimilarity.objects.filter(
+            recipe__in=favorites
+        ).exclude(
+            similar__in=favorites
+        ).values('similar').annotate(
+            total_score=Sum('score')
+        ).order_by('-total_score', '-similar').values_list(
+            'similar',
+            flat=True
+        )[:limit]
+    )
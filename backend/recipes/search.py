@@ -0,0 +1,266 @@
+import re
+from collections import defaultdict
+from threading import Lock
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank, SearchVector)
+from django.db import connection, transaction
+from django.db.models import (Case, F, FloatField, OuterRef, Subquery, Value,
+                              When)
+from django.db.models.functions import Replace
+from django.utils.html import escape
+
+from foodgram.constants import (SEARCH_CONFIG, SEARCH_HEADLINE_MAX_WORDS,
+                                SEARCH_MAX_RESULTS)
+from foodgram.db import stream
+from foodgram.invalidation import get_versions
+from recipes.models import Recipe, RecipeIngredient
+
+# Веса частей рецепта совпадают с весами ts_rank по умолчанию
+# для меток A, B и C.
+SEARCH_WEIGHTS = {
+    'name': ('A', 1.0),
+    'text': ('B', 0.4),
+    'ingredients': ('C', 0.2),
+}
+# ts_headline не экранирует текст, поэтому слова отмечаются управляющими
+# символами и заменяются тегами после экранирования в format_headline.
+HEADLINE_START_SEL = '\x02'
+HEADLINE_STOP_SEL = '\x03'
+
+
+def is_postgresql():
+    """Проверяет, поддерживает ли база данных полнотекстовый поиск."""
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(value):
+    """Разбивает строку на слова в нижнем регистре."""
+    return re.findall(r'\w+', value.lower().replace('ё', 'е'))
+
+
+def get_search_vector():
+    """Возвращает выражение tsvector по названию, описанию и ингредиентам."""
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', delimiter=' ')
+        ).values('names')
+    )
+    return (
+        SearchVector(
+            'name',
+            weight=SEARCH_WEIGHTS['name'][0],
+            config=SEARCH_CONFIG
+        )
+        + SearchVector(
+            'text',
+            weight=SEARCH_WEIGHTS['text'][0],
+            config=SEARCH_CONFIG
+        )
+        + SearchVector(
+            ingredient_names,
+            weight=SEARCH_WEIGHTS['ingredients'][0],
+            config=SEARCH_CONFIG
+        )
+    )
+
+
+class InvertedIndex:
+    """Инвертированный индекс рецептов в памяти процесса.
+
+    Заменяет tsvector на базах данных, отличных от PostgreSQL.
+    Строится из базы при первом поиске, обновляется при сохранении
+    рецептов в этом процессе и перестраивается, когда версия рецептов
+    или ингредиентов в шине инвалидации меняется.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._loaded = False
+        self._versions = None
+        self._lock = Lock()
+
+    def _get_documents(self, recipe_ids=None):
+        recipes = Recipe.objects.all()
+        ingredients = RecipeIngredient.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        ingredient_names = defaultdict(list)
+        for recipe_id, name in stream(ingredients.values_list(
+            'recipe_id',
+            'ingredient__name'
+        )):
+            ingredient_names[recipe_id].append(name)
+        for recipe_id, name, text in stream(recipes.values_list(
+            'id',
+            'name',
+            'text'
+        )):
+            yield recipe_id, {
+                'name': name,
+                'text': text,
+                'ingredients': ' '.join(ingredient_names[recipe_id]),
+            }
+
+    def _remove(self, recipe_id):
+        for token in self._documents.pop(recipe_id, ()):
+            postings = self._postings[token]
+            postings.pop(recipe_id, None)
+            if not postings:
+                del self._postings[token]
+
+    def _add(self, recipe_id, document):
+        weights = defaultdict(float)
+        for part, value in document.items():
+            for token in tokenize(value):
+                weights[token] += SEARCH_WEIGHTS[part][1]
+        for token, weight in weights.items():
+            self._postings[token][recipe_id] = weight
+        self._documents[recipe_id] = tuple(weights)
+
+    def _ensure_loaded(self):
+        versions = get_versions(('recipe',), ('ingredient',))
+        if self._loaded and versions == self._versions:
+            return
+        with self._lock:
+            if self._loaded and versions == self._versions:
+                return
+            index = InvertedIndex()
+            for recipe_id, document in self._get_documents():
+                index._add(recipe_id, document)
+            self._postings = index._postings
+            self._documents = index._documents
+            self._versions = versions
+            self._loaded = True
+
+    def warm(self):
+        """Загружает индекс до первого поискового запроса."""
+        self._ensure_loaded()
+
+    def _adopt_versions(self, previous):
+        # Версия рецептов, опубликованная после фиксации изменений, уже
+        # учтена в индексе, и перестраивать его не нужно.
+        versions = get_versions(('recipe',), ('ingredient',))
+        with self._lock:
+            if self._versions == previous and versions[1] == previous[1]:
+                self._versions = versions
+
+    def update(self, recipe_ids):
+        """Переиндексирует указанные рецепты.
+
+        Версия рецептов, которую опубликует сохранение этих рецептов,
+        принимается индексом после фиксации транзакции.
+        """
+        if not self._loaded:
+            return
+        previous = self._versions
+        recipe_ids = set(recipe_ids)
+        documents = dict(self._get_documents(recipe_ids))
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+                if recipe_id in documents:
+                    self._add(recipe_id, documents[recipe_id])
+        transaction.on_commit(lambda: self._adopt_versions(previous))
+
+    def search(self, query):
+        """Возвращает {id рецепта: ранг} для рецептов со всеми словами."""
+        self._ensure_loaded()
+        tokens = set(tokenize(query))
+        if not tokens:
+            return {}
+        postings = sorted(
+            (self._postings.get(token, {}) for token in tokens),
+            key=len
+        )
+        ranks = dict(postings[0])
+        for posting in postings[1:]:
+            ranks = {
+                recipe_id: rank + posting[recipe_id]
+                for recipe_id, rank in ranks.items()
+                if recipe_id in posting
+            }
+        return ranks
+
+
+search_index = InvertedIndex()
+
+
+def update_search_index(recipe_ids):
+    """Обновляет поисковый индекс для указанных рецептов."""
+    if is_postgresql():
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            search_vector=get_search_vector()
+        )
+    else:
+        search_index.update(recipe_ids)
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует их по релевантности."""
+    if is_postgresql():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query),
+            search_headline=SearchHeadline(
+                Replace(
+                    Replace('text', Value(HEADLINE_START_SEL)),
+                    Value(HEADLINE_STOP_SEL)
+                ),
+                search_query,
+                config=SEARCH_CONFIG,
+                start_sel=HEADLINE_START_SEL,
+                stop_sel=HEADLINE_STOP_SEL,
+                max_words=SEARCH_HEADLINE_MAX_WORDS
+            )
+        ).order_by('-search_rank', '-id')
+
+    ranks = sorted(
+        search_index.search(query).items(),
+        key=lambda item: (-item[1], -item[0])
+    )[:SEARCH_MAX_RESULTS]
+    if not ranks:
+        return queryset.none()
+    return queryset.filter(id__in=[pk for pk, _ in ranks]).annotate(
+        search_rank=Case(
+            *(When(id=pk, then=Value(rank)) for pk, rank in ranks),
+            output_field=FloatField()
+        )
+    ).order_by('-search_rank', '-id')
+
+
+def format_headline(headline):
+    """Экранирует фрагмент и заменяет отметки слов тегами <b>."""
+    return escape(headline).replace(
+        HEADLINE_START_SEL,
+        '<b>'
+    ).replace(HEADLINE_STOP_SEL, '</b>')
+
+
+def get_headline(text, query):
+    """Выделяет слова запроса во фрагменте описания рецепта.
+
+    Возвращает HTML: текст описания экранирован.
+    """
+    text = text.replace(HEADLINE_START_SEL, '').replace(HEADLINE_STOP_SEL, '')
+    tokens = set(tokenize(query))
+    words = text.split()
+    start = next(
+        (
+            index for index, word in enumerate(words)
+            if set(tokenize(word)) & tokens
+        ),
+        0
+    )
+    start = max(start - SEARCH_HEADLINE_MAX_WORDS // 2, 0)
+    fragment = []
+    for word in words[start:start + SEARCH_HEADLINE_MAX_WORDS]:
+        if set(tokenize(word)) & tokens:
+            word = f'{HEADLINE_START_SEL}{word}{HEADLINE_STOP_SEL}'
+        fragment.append(word)
+    return format_headline(' '.join(fragment))
@@ -0,0 +1,50 @@
+import secrets
+from functools import lru_cache
+
+from django.db import IntegrityError, transaction
+from rest_framework.generics import get_object_or_404
+
+from foodgram.constants import (SHORT_CODE_ALPHABET, SHORT_CODE_LENGTH,
+                                SHORT_LINK_CACHE_SIZE)
+from recipes.models import Recipe
+
+
+def generate_short_code():
+    """Возвращает случайный код короткой ссылки."""
+    return ''.join(
+        secrets.choice(SHORT_CODE_ALPHABET) for _ in range(SHORT_CODE_LENGTH)
+    )
+
+
+def get_short_code(recipe_id):
+    """Возвращает код короткой ссылки рецепта, выдавая его при отсутствии.
+
+    Читается и обновляется только поле кода, сам рецепт не загружается.
+    """
+    codes = Recipe.objects.values_list('short_code', flat=True)
+    code = get_object_or_404(codes, pk=recipe_id)
+    while code is None:
+        code = generate_short_code()
+        try:
+            with transaction.atomic():
+                issued = Recipe.objects.filter(
+                    pk=recipe_id,
+                    short_code__isnull=True
+                ).update(short_code=code)
+        except IntegrityError:
+            code = None
+            continue
+        if not issued:
+            code = get_object_or_404(codes, pk=recipe_id)
+    return code
+
+
+@lru_cache(maxsize=SHORT_LINK_CACHE_SIZE)
+def resolve_short_code(code):
+    """Возвращает id рецепта по коду короткой ссылки.
+
+    Найденные коды кешируются в памяти процесса, коды не меняются.
+    Для неизвестного кода вызывается Recipe.DoesNotExist, такой
+    результат не кешируется.
+    """
+    return Recipe.objects.values_list('pk', flat=True).get(short_code=code)
@@ -0,0 +1,65 @@
+from django.db import transaction
+
+from foodgram.constants import (JOB_HIGH_PRIORITY, JOB_LOW_PRIORITY,
+                                RECOMMENDATIONS_REBUILD_DELAY)
+from jobs.queue import task
+from recipes.feed import fan_out_recipe, fan_out_recipes
+from recipes.models import Recipe
+from recipes.recommendations import build_similarities
+from recipes.search import is_postgresql, update_search_index
+
+
+@task(priority=JOB_HIGH_PRIORITY)
+def update_search_vectors(recipe_ids):
+    """Пересчитывает поисковые векторы рецептов."""
+    update_search_index(recipe_ids)
+
+
+@task(priority=JOB_HIGH_PRIORITY)
+def deliver_recipe(recipe_id):
+    """Записывает рецепт в ленты подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only('author').first()
+    if recipe is not None:
+        fan_out_recipe(recipe)
+
+
+@task(priority=JOB_HIGH_PRIORITY)
+def deliver_recipes(recipe_ids):
+    """Записывает пачку рецептов в ленты подписчиков авторов."""
+    fan_out_recipes(recipe_ids)
+
+
+def deliver_new_recipe(sender, instance, created, raw=False, **kwargs):
+    """Доставляет в ленты рецепт, созданный через API, админку или ORM.
+
+    Рецепты из bulk_create сигналов не отправляют и доставляются
+    deliver_recipes.
+    """
+    if created and not raw:
+        transaction.on_commit(lambda: deliver_recipe.delay(instance.pk))
+
+
+@task(priority=JOB_LOW_PRIORITY)
+def rebuild_similarities():
+    """Пересчитывает похожие рецепты, затронутые новыми действиями."""
+    build_similarities()
+
+
+def schedule_search_index_update(recipe_ids):
+    """Обновляет поисковый индекс рецептов.
+
+    Индекс в памяти процесса, который заменяет tsvector вне
+    PostgreSQL, недоступен воркерам и обновляется сразу.
+    """
+    if is_postgresql():
+        update_search_vectors.delay(list(recipe_ids))
+    else:
+        update_search_index(recipe_ids)
+
+
+def schedule_similarities_rebuild():
+    """Планирует один отложенный пересчет на серию изменений."""
+    rebuild_similarities.schedule(
+        key='rebuild_similarities',
+        countdown=RECOMMENDATIONS_REBUILD_DELAY
+    )
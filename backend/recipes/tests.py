@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from recipes import recommendations
+from recipes.models import Favorite, Recipe, RecipeSimilarity, SimilarityBuild
+from users.models import User
+
+
+class BuildSimilaritiesTests(TestCase):
+    """Инкрементальный пересчет похожих рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Автор',
+            password='author-password'
+        )
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='Пользователь',
+                last_name='Пользователь',
+                password='user-password'
+            )
+            for number in range(2)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/test.png'
+            )
+            for number in range(3)
+        ]
+        for recipe in cls.recipes[:2]:
+            Favorite.objects.create(user=cls.users[0], recipe=recipe)
+
+    def test_build_without_changes_advances_watermark(self):
+        recommendations.build_similarities(full=True)
+        first = SimilarityBuild.objects.get().started_at
+        recommendations.build_similarities()
+        self.assertGreater(SimilarityBuild.objects.get().started_at, first)
+
+    def test_changes_during_build_are_picked_up(self):
+        recommendations.build_similarities(full=True)
+        load = recommendations.Interactions
+
+        def load_and_add(*args, **kwargs):
+            # Добавление фиксируется, пока расчет уже идет.
+            interactions = load(*args, **kwargs)
+            for recipe in self.recipes[1:]:
+                Favorite.objects.create(user=self.users[1], recipe=recipe)
+            return interactions
+
+        with mock.patch.object(
+            recommendations,
+            'Interactions',
+            side_effect=load_and_add
+        ):
+            recommendations.build_similarities(full=True)
+        self.assertFalse(RecipeSimilarity.objects.filter(
+            recipe=self.recipes[2]
+        ).exists())
+        recommendations.build_similarities()
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            recipe=self.recipes[2],
+            similar=self.recipes[1]
+        ).exists())
@@ -1,15 +1,21 @@
-from django.shortcuts import reverse
-from django.views.decorators.http import require_GET
-from rest_framework.exceptions import ValidationError
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponseNotAllowed
+from django.shortcuts import redirect
 
 from recipes.models import Recipe
+from recipes.short_links import resolve_short_code
 
 
-@require_GET
-def get_short_link(request, pk):
-    """Переадресация на страницу рецепта."""
+async def get_short_link(request, code):
+    """Переадресация на страницу рецепта.
+
+    Асинхронное представление: при запуске через ASGI ожидание клиента
+    не занимает поток воркера.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
     try:
-        Recipe.objects.get(pk=pk)
-        return reverse('recipes', args=[pk])
-    except Exception:
-        raise ValidationError(f'Рецепт с ID "{pk}" не найден.')
+        pk = await sync_to_async(resolve_short_code)(code)
+    except Recipe.DoesNotExist:
+        raise Http404(f'Короткая ссылка "{code}" не найдена.')
+    return redirect(f'/recipes/{pk}')
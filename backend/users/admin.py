@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 
+from foodgram.admin import AutocompleteFilter, EstimatedCountPaginator
 from users.models import Subscription, User
 
 
@@ -18,12 +19,13 @@ class UserAdmin(UserAdmin):
         'last_name',
     )
     list_filter = (
-        'email',
-        'username',
-        'first_name'
+        'is_staff',
+        'is_active'
     )
     list_display_links = ('username',)
     search_fields = ('email', 'username')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
@@ -37,9 +39,18 @@ class SubscriptionAdmin(admin.ModelAdmin):
         'author'
     )
     search_fields = (
-        'user',
-        'author'
+        'user__username',
+        'author__username'
+    )
+    list_filter = (
+        ('user', AutocompleteFilter),
+        ('author', AutocompleteFilter)
     )
+    Media = AutocompleteFilter.Media
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
     def save_model(self, request, obj, form, change):
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20250304_1552'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='fan_out',
+            field=models.BooleanField(default=True, help_text='Новые рецепты автора записываются в ленту подписчика. Иначе они подмешиваются при чтении ленты.', verbose_name='Доставка рецептов в ленту'),
+        ),
+    ]
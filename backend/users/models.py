@@ -82,6 +82,22 @@ class Subscription(models.Model):
         related_name='following',
         verbose_name='Автор'
     )
+    fan_out = models.BooleanField(
+        default=True,
+        verbose_name='Доставка рецептов в ленту',
+        help_text=(
+            'Новые рецепты автора записываются в ленту подписчика. '
+            'Иначе они подмешиваются при чтении ленты.'
+        )
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата подписки'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         ordering = ('author',)